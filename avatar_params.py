@@ -0,0 +1,165 @@
+"""Avatar 参数输出：把心率、硬件占用、歌曲进度等数值映射到 /avatar/parameters/<name>。"""
+
+import threading
+import time
+
+AVATAR_PARAM_PREFIX = "/avatar/parameters/"
+
+# 可映射的数据来源，键与 collect 回调返回的字典一致。
+PARAM_SOURCES = {
+    "hr": "心率 (BPM)",
+    "hr_connected": "心率设备已连接",
+    "cpu": "CPU 占用 (%)",
+    "ram": "RAM 占用 (%)",
+    "gpu": "GPU 占用 (%)",
+    "song_progress": "歌曲进度 (0-1)",
+    "song_playing": "正在播放",
+}
+
+
+class ParameterMapping:
+    """把一个数据源的数值映射到一个 Avatar 参数，各自有死区和最大更新频率。
+
+    float: 把 [low, high] 线性归一化到 0-1；int: 截断到 [low, high] 后取整（再限制在 0-255）；
+    bool: 来源本身是布尔值时原样使用，否则数值 > low 时为 True。
+    """
+
+    def __init__(self, name, source, kind="float", low=0.0, high=1.0, deadband=0.0, max_rate=5.0,
+                 enabled=True):
+        self.name = name
+        self.source = source
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.deadband = deadband
+        self.max_rate = max_rate
+        self.enabled = enabled
+        self.address = AVATAR_PARAM_PREFIX + name
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.last_value = None
+        self.last_sent = float("-inf")
+        self.sent = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d["name"],
+            d["source"],
+            d.get("type", "float"),
+            float(d.get("min", 0.0)),
+            float(d.get("max", 1.0)),
+            float(d.get("deadband", 0.0)),
+            float(d.get("max_rate", 5.0)),
+            d.get("enabled", True),
+        )
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "source": self.source,
+            "type": self.kind,
+            "min": self.low,
+            "max": self.high,
+            "deadband": self.deadband,
+            "max_rate": self.max_rate,
+            "enabled": self.enabled,
+        }
+
+    def convert(self, raw):
+        if self.kind == "bool":
+            if isinstance(raw, bool):
+                return raw
+            return float(raw) > self.low
+        if self.kind == "int":
+            return max(0, min(255, round(min(max(float(raw), self.low), self.high))))
+        span = self.high - self.low
+        if span <= 0:
+            return 0.0
+        return min(max((float(raw) - self.low) / span, 0.0), 1.0)
+
+    def changed(self, value):
+        # 死区按输出单位比较：bool 任意变化都算，数值需超过阈值。
+        if self.last_value is None:
+            return True
+        if self.kind == "bool":
+            return value != self.last_value
+        return abs(value - self.last_value) > self.deadband
+
+
+class AvatarParameterSink:
+    """轮询数据源数值，把有意义的变化通过 OscTransport 发送到 Avatar 参数。"""
+
+    def __init__(self, transport, mappings=(), clock=time.monotonic):
+        self.transport = transport
+        self.mappings = list(mappings)
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread = None
+        self.interval = 0.1
+
+    def set_mappings(self, mappings):
+        self.mappings = [m if isinstance(m, ParameterMapping) else ParameterMapping.from_dict(m)
+                         for m in mappings]
+
+    def update(self, values):
+        """用一组最新数值刷新所有映射，只发送超过死区且未超频率上限的变化。"""
+        now = self._clock()
+        for m in self.mappings:
+            if not m.enabled:
+                continue
+            raw = values.get(m.source)
+            if raw is None:
+                continue
+            try:
+                value = m.convert(raw)
+            except (TypeError, ValueError):
+                continue
+            if not m.changed(value):
+                continue
+            # 超频的变化不丢弃：下次轮询时若仍超过死区会再次尝试。
+            if now - m.last_sent < m.min_interval:
+                m.skipped += 1
+                continue
+            self.transport.submit_value(m.address, value)
+            m.last_value = value
+            m.last_sent = now
+            m.sent += 1
+
+    def start(self, collect, interval=None):
+        """在后台线程中按 interval 调用 collect() 取值并刷新参数；运行中可修改 self.interval。
+
+        返回线程是否在运行；上一个线程停止后仍未退出时拒绝启动并返回 False，避免两个线程同时发送。
+        """
+        if interval is not None:
+            self.interval = interval
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return not self._stop.is_set()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(collect,), daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=1.0):
+        """通知线程退出并等待其结束；返回线程是否已退出。"""
+        self._stop.set()
+        thread = self._thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        if thread.is_alive():
+            return False
+        self._thread = None
+        return True
+
+    def _run(self, collect):
+        while not self._stop.is_set():
+            try:
+                self.update(collect())
+            except Exception as e:
+                print(f"Avatar 参数更新错误: {e}")
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        return [{"name": m.name, "sent": m.sent, "skipped": m.skipped} for m in self.mappings]
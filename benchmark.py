@@ -0,0 +1,182 @@
+"""性能基准脚本：python benchmark.py [名称 ...]，不带参数时运行全部。"""
+
+import socket
+import sys
+import time
+import tracemalloc
+
+from osc_transport import ChatboxEncoder
+from template_engine import compile_template
+from word_filter import WordFilter
+
+SAMPLE_TEXT = "[时间:21:30] 今天也在VRChat摸鱼❀[在听: 晴天 - 周杰伦]\n[CPU: 12%, RAM: 48%, GPU: 30%]"
+SAMPLE_TEMPLATE = "{time} {message}\\n{music}\\n{hardware} {heart_rate}"
+SAMPLE_VALUES = {
+    "message": "今天也在VRChat摸鱼❀",
+    "time": "[时间:21:30]",
+    "music": "[在听: 晴天 - 周杰伦]",
+    "hardware": "[CPU: 12%, RAM: 48%, GPU: 30%]",
+    "heart_rate": "[❤️:88 BPM]",
+}
+
+
+def _measure(fn, n):
+    # 返回 (每次耗时微秒, 单次调用的峰值临时分配字节数)。
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    per_call = (time.perf_counter() - start) / n * 1e6
+
+    tracemalloc.start()
+    fn()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    fn()
+    allocated = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return per_call, allocated
+
+
+def _report(name, per_call, allocated):
+    print(f"  {name:<28} {per_call:8.2f} us/次  峰值分配 {allocated:8.1f} B/次")
+
+
+def bench_chatbox_encoder(n=50000):
+    """对比 pythonosc 构建器与预分配 ChatboxEncoder 的编码+发送开销。"""
+    print("chatbox_encoder:")
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    addr = receiver.getsockname()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+
+    def send(data):
+        try:
+            sock.sendto(data, addr)
+        except BlockingIOError:
+            pass
+
+    encoder = ChatboxEncoder(notify=False)
+    _report("ChatboxEncoder", *_measure(lambda: send(encoder.encode(SAMPLE_TEXT)), n))
+
+    try:
+        from pythonosc.osc_message_builder import OscMessageBuilder
+    except ImportError:
+        print("  (未安装 python-osc，跳过对照组)")
+    else:
+        def build():
+            builder = OscMessageBuilder(address="/chatbox/input")
+            for arg in (SAMPLE_TEXT, True, False):
+                builder.add_arg(arg)
+            send(builder.build().dgram)
+
+        _report("pythonosc OscMessageBuilder", *_measure(build, n))
+
+    sock.close()
+    receiver.close()
+
+
+def bench_template(n=100000):
+    """对比逐个 str.replace 的旧模板替换与预编译模板的渲染开销。"""
+    print("template:")
+    names = ("message", "time", "window", "idle", "music", "hardware", "heart_rate", "scheduled")
+
+    def replace_chain():
+        result = SAMPLE_TEMPLATE
+        for name in names:
+            result = result.replace("{" + name + "}", SAMPLE_VALUES.get(name, ""))
+        return result.replace('\\n', '\n')
+
+    compiled = compile_template(SAMPLE_TEMPLATE)
+    assert compiled.render(SAMPLE_VALUES) == replace_chain()
+    _report("str.replace 链", *_measure(replace_chain, n))
+    _report("CompiledTemplate.render", *_measure(lambda: compiled.render(SAMPLE_VALUES), n))
+
+    sections = compile_template("{time}{#music}❀{music|truncate(30)}{/music}{#window}❀{window}{/window}"
+                                "\\n{#heart_rate}{heart_rate}{/heart_rate}{message:>4}")
+    _report("区段+过滤器+格式说明", *_measure(lambda: sections.render(SAMPLE_VALUES), n))
+
+
+def bench_format_output(n=100000):
+    """对比每次重建进度条和时间字符串的旧 format_output 与预编译的 OutputFormatter。"""
+    print("format_output:")
+    try:
+        from config import Config, SongState
+        from osc_sender import format_output, get_lyric
+    except ImportError as e:
+        print(f"  (缺少依赖 {e.name}，跳过)")
+        return
+    cfg = Config()
+    state = SongState(song="晴天", artist="周杰伦", cur=95, dur=269, play=True)
+    lyrics = [(t * 4.0, f"第{t}行歌词") for t in range(80)]
+    song_key = f"{state.song}-{state.artist}"
+
+    def legacy():
+        c, d, w = state.cur, state.dur, cfg.bar_width
+        pos = int(w * c / d) if d else 0
+        bar = cfg.bar_filled * pos + cfg.bar_thumb + cfg.bar_empty * (w - pos)
+        l1, l2 = state.lyric1, state.lyric2
+        if not l1 and lyrics and song_key == f"{state.song}-{state.artist}":
+            l1, l2 = get_lyric(lyrics, c)
+        l1, l2 = l1 or "纯音乐，请欣赏", l2 or ""
+        try:
+            return cfg.template.format(song=state.song[:20], artist=state.artist[:25], bar=bar,
+                                       time=f"{c // 60}:{c % 60:02d}/{d // 60}:{d % 60:02d}", lyric1=l1, lyric2=l2)
+        except Exception:
+            return f"🎵 {state.song[:20]} - {state.artist[:25]}\n{bar}\n{l1}"
+
+    assert legacy() == format_output(cfg, state, lyrics, song_key)
+    _report("str.format 每次重建", *_measure(legacy, n))
+    _report("OutputFormatter", *_measure(lambda: format_output(cfg, state, lyrics, song_key), n))
+
+
+# 屏蔽词计时用的样例文本，覆盖窗口标题、歌名、歌词与中英文混排；过滤结果的正确性见 tests/test_word_filter.py
+WORD_FILTER_RULES = {"坏词": None, "badword": None, "Secret Project": "[保密]", "真名": "某人", "bad": "***"}
+WORD_FILTER_TEXTS = (
+    "Secret Project - Visual Studio Code",
+    "[在听: 坏词之歌 - 某歌手]",
+    "这句歌词里有坏词也有真名",
+    "BADWORD in caps and badword in lower",
+    "bad badge",
+    "完全正常的一行歌词",
+    "👨‍👩‍👧 坏词 ❀",
+)
+
+
+def bench_word_filter(n=20000, vocabulary=5000):
+    """对比逐词 str.replace 与 Aho-Corasick 自动机在数千条屏蔽词下的过滤开销。"""
+    print("word_filter:")
+    # 追加数千条不会命中的词，模拟大词表
+    rules = dict(WORD_FILTER_RULES)
+    rules.update((f"屏蔽{i:05d}x", None) for i in range(vocabulary))
+    start = time.perf_counter()
+    word_filter = WordFilter(rules)
+    print(f"  构建 {len(rules)} 条词的自动机: {(time.perf_counter() - start) * 1000:.1f} ms")
+    texts = WORD_FILTER_TEXTS
+
+    def naive():
+        for text in texts:
+            for word, rep in rules.items():
+                if word in text:
+                    text = text.replace(word, "*" * len(word) if rep is None else rep)
+
+    def automaton():
+        for text in texts:
+            word_filter.filter(text)
+
+    _report(f"逐词 replace（{len(rules)} 词）", *_measure(naive, max(1, n // 100)))
+    _report(f"Aho-Corasick（{len(rules)} 词）", *_measure(automaton, n))
+
+
+BENCHMARKS = {
+    "chatbox_encoder": bench_chatbox_encoder,
+    "template": bench_template,
+    "format_output": bench_format_output,
+    "word_filter": bench_word_filter,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
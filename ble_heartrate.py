@@ -18,6 +18,7 @@ class HeartRateMonitor:
         self.is_connected = False
         self.device_name = None
         self._running = False
+        self.paused = False
         self._thread = None
         self._queue = Queue()
 
@@ -32,6 +33,13 @@ class HeartRateMonitor:
         self.is_connected = False
         self.current_hr = 0
 
+    def pause(self):
+        """省电模式：断开设备并暂停扫描，线程保持存活以便快速恢复。"""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
     def _run_async_loop(self):
         # 单独开事件循环，避免阻塞 Tkinter 主线程。
         loop = asyncio.new_event_loop()
@@ -40,6 +48,10 @@ class HeartRateMonitor:
 
     async def _main_loop(self):
         while self._running:
+            if self.paused:
+                self.is_connected = False
+                await asyncio.sleep(1)
+                continue
             try:
                 await self._scan_and_connect()
             except Exception as e:
@@ -57,7 +69,7 @@ class HeartRateMonitor:
             timeout=10.0,
         )
 
-        if not device or not self._running:
+        if not device or not self._running or self.paused:
             await asyncio.sleep(3)
             return
 
@@ -82,7 +94,7 @@ class HeartRateMonitor:
 
                 await client.start_notify(hrm, on_notify)
 
-                while client.is_connected and self._running:
+                while client.is_connected and self._running and not self.paused:
                     await asyncio.sleep(2)
 
         except Exception as e:
@@ -0,0 +1,223 @@
+"""聊天框发送策略：重复内容抑制、令牌桶限流与多来源仲裁。"""
+
+import threading
+import time
+
+from osc_transport import CHATBOX_INPUT
+
+
+class ChatboxSendFilter:
+    """跳过重复的聊天框内容，只在气泡消失前补发一次保活。"""
+
+    def __init__(self, keepalive=25.0, margin=1.0, clock=time.monotonic):
+        # keepalive <= 0 表示关闭抑制，每次都发送。
+        self.keepalive = keepalive
+        self.margin = margin
+        self._clock = clock
+        # 保存上次发送的文本本身而不是哈希，哈希碰撞不会把真正的变化当成重复
+        self._last_text = None
+        self._last_sent = 0.0
+        self.sent = 0
+        self.suppressed = 0
+
+    def should_send(self, text):
+        """判断本次内容是否需要发送；返回 True 时视为已发送并记录。"""
+        now = self._clock()
+        if (
+            self.keepalive > 0
+            and text == self._last_text
+            and now < self._last_sent + self.keepalive - self.margin
+        ):
+            self.suppressed += 1
+            return False
+        self._last_text = text
+        self._last_sent = now
+        self.sent += 1
+        return True
+
+    def reset(self):
+        """清除上次内容记录，下一次调用必定发送。"""
+        self._last_text = None
+
+    def stats(self):
+        return {"sent": self.sent, "suppressed": self.suppressed}
+
+
+class ChatboxRateLimiter:
+    """按 VRChat 对 /chatbox/input 的节流规则建模的令牌桶。
+
+    capacity 为允许的突发条数，refill_interval 为恢复一个令牌所需秒数。
+    configure() 在界面线程调用，reserve() 在 OSC 发送线程调用，状态修改都在锁内进行。
+    """
+
+    def __init__(self, capacity=3, refill_interval=1.5, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.capacity = capacity
+        self.refill_interval = refill_interval
+        self.tokens = float(capacity)
+        self._last_refill = clock()
+        self.allowed = 0
+        self.deferred = 0
+        self.deferred_total = 0.0
+        self.deferred_max = 0.0
+
+    def configure(self, capacity, refill_interval):
+        with self._lock:
+            self._refill()
+            self.capacity = capacity
+            self.refill_interval = refill_interval
+            self.tokens = min(self.tokens, float(capacity))
+
+    def _refill(self):
+        now = self._clock()
+        if self.refill_interval > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) / self.refill_interval)
+        else:
+            self.tokens = float(self.capacity)
+        self._last_refill = now
+
+    def reserve(self):
+        """尝试取一个令牌：成功返回 0，否则返回距离下一个令牌的秒数（不消耗）。"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.allowed += 1
+                return 0.0
+            return (1 - self.tokens) * self.refill_interval
+
+    def record_deferral(self, waited):
+        """记录一次因限流被推迟的发送及其等待时长。"""
+        with self._lock:
+            self.deferred += 1
+            self.deferred_total += waited
+            self.deferred_max = max(self.deferred_max, waited)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "deferred": self.deferred,
+                "avg_deferred_ms": self.deferred_total / self.deferred * 1000 if self.deferred else 0.0,
+                "max_deferred_ms": self.deferred_max * 1000,
+            }
+
+
+class _Producer:
+    def __init__(self, name, priority, ttl, notify):
+        self.name = name
+        self.priority = priority
+        self.ttl = ttl
+        self.notify = notify
+        self.text = None
+        self.updated = 0.0
+        self.submitted = 0
+        self.sent = 0
+        self.suppressed = 0
+        self.preempted = 0
+
+
+class ChatboxArbiter:
+    """/chatbox/input 的唯一出口，合并多个带名称和优先级的来源的内容。
+
+    每个来源只保留最新内容；优先级最高且未过期（ttl 秒内有更新）的来源获得聊天框，
+    其余来源的提交只记录不发送。所有输出共用一个重复抑制器，经同一个 OscTransport 发出。
+    """
+
+    def __init__(self, transport, address=CHATBOX_INPUT, send_filter=None, clock=time.monotonic):
+        self.transport = transport
+        self.address = address
+        self.filter = send_filter or ChatboxSendFilter(clock=clock)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._producers = {}
+        self._active = None
+
+    def register(self, name, priority=0, ttl=None, notify=None):
+        """登记来源；ttl 为 None 表示内容一直有效，直到 release()。重复登记只更新参数。"""
+        with self._lock:
+            producer = self._producers.get(name)
+            if producer is None:
+                producer = self._producers[name] = _Producer(name, priority, ttl, notify)
+            else:
+                producer.priority, producer.ttl, producer.notify = priority, ttl, notify
+            return producer
+
+    def _winner(self, now):
+        best = None
+        for p in self._producers.values():
+            if p.text is None or (p.ttl is not None and now - p.updated > p.ttl):
+                continue
+            if best is None or p.priority > best.priority:
+                best = p
+        return best
+
+    def _emit(self, producer):
+        # 调用方持有锁；返回是否真正交给了传输层。
+        self._active = producer.name
+        if not self.filter.should_send(producer.text):
+            producer.suppressed += 1
+            return False
+        self.transport.submit(producer.text, self.address, notify=producer.notify)
+        producer.sent += 1
+        return True
+
+    def submit(self, name, text):
+        """提交来源的最新内容；仅当该来源当前获胜时才发送，返回是否实际发出。"""
+        with self._lock:
+            producer = self._producers.get(name) or self._producers.setdefault(
+                name, _Producer(name, 0, None, None))
+            now = self._clock()
+            producer.text = text
+            producer.updated = now
+            producer.submitted += 1
+            winner = self._winner(now)
+            if winner is not producer:
+                producer.preempted += 1
+                return False
+            if self._active != name:
+                # 聊天框易主时强制发送，不受重复抑制影响
+                self.filter.reset()
+            return self._emit(producer)
+
+    def release(self, name):
+        """撤下来源的内容；若它正占用聊天框，立即改发下一个有效来源的最新内容。"""
+        with self._lock:
+            producer = self._producers.get(name)
+            if producer is None or producer.text is None:
+                return
+            producer.text = None
+            if self._active != name:
+                return
+            self._active = None
+            winner = self._winner(self._clock())
+            if winner is not None:
+                self.filter.reset()
+                self._emit(winner)
+
+    def set_target(self, ip, port):
+        """热更新主目标地址，下一条报文即发往新地址，无需重建客户端。"""
+        self.transport.set_target(ip, port)
+
+    def reset(self):
+        """清除重复抑制记录，下一次提交必定发送。"""
+        with self._lock:
+            self.filter.reset()
+
+    @property
+    def active(self):
+        return self._active
+
+    def stats(self):
+        with self._lock:
+            return {
+                p.name: {
+                    "priority": p.priority,
+                    "submitted": p.submitted,
+                    "sent": p.sent,
+                    "suppressed": p.suppressed,
+                    "preempted": p.preempted,
+                }
+                for p in self._producers.values()
+            }
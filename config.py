@@ -27,6 +27,11 @@ class Config(BaseModel):
     ncm_port: int = 9222
     ncm_path: str = ""
     refresh_interval: float = 3.0
+    poll_interval: float = 0.3
+    lyric_lead: float = 0.3
+    chatbox_keepalive: float = 25.0
+    chatbox_burst: int = 3
+    chatbox_refill_interval: float = 1.5
     bar_width: int = 8
     bar_filled: str = "▓"
     bar_empty: str = "░"
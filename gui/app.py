@@ -3,21 +3,40 @@
 import asyncio
 import tkinter as tk
 
+from avatar_params import AvatarParameterSink
 from ble_heartrate import HeartRateMonitor
+from chatbox import ChatboxArbiter, ChatboxRateLimiter, ChatboxSendFilter
 from config import CONFIG_FILE, Config, SharedState
-from pythonosc import udp_client
+from osc_sender import LyricAligner
+from osc_transport import CHATBOX_INPUT, OscTransport
+from oscquery import VRChatDiscovery
+from playlist import MessagePlaylist
+from presence import MODE_LOW_POWER, VRChatPresence
+from scheduler import DeadlineScheduler
+from snapshot import EMPTY_FRAME
+from text_layout import ChatboxPaginator, SegmentRotator
+from timed_messages import TimedMessageScheduler
+from word_filter import WordFilter
 
 from .config_panel import ConfigMixin
-from .message_logic import MessageMixin
+from .message_logic import GUI_PRIORITY, GUI_PRODUCER, MessageMixin
+from .osc_input import DEFAULT_OSC_ACTIONS, OscInputMixin
 from .settings_panel import SettingsMixin
 from .widgets import WidgetsMixin
 
+# VRChat 进程检测间隔（毫秒）
+PRESENCE_CHECK_MS = 5000
+# 正常/省电模式下各轮询的间隔：调试面板(毫秒)、网易云页面轮询(秒)、Avatar 参数(秒)、最短发送间隔(秒)
+NORMAL_PROFILE = {"debug_ms": 1000, "ncm_poll": 0.3, "avatar_params": 0.1, "send_interval": 0}
+LOW_POWER_PROFILE = {"debug_ms": 10000, "ncm_poll": 3.0, "avatar_params": 2.0, "send_interval": 30}
+
 
 class VRChatAutoChat(
     ConfigMixin,
     WidgetsMixin,
     SettingsMixin,
     MessageMixin,
+    OscInputMixin,
 ):
 
     def __init__(self, root):
@@ -25,11 +44,71 @@ class VRChatAutoChat(
         self.root = root
         self.osc_ip = tk.StringVar(value="127.0.0.1")
         self.osc_port = tk.IntVar(value=9000)
-        self.osc_client = udp_client.SimpleUDPClient(self.osc_ip.get(), self.osc_port.get())
+        # OSC 发送统一交给独立 I/O 线程，界面线程只负责投递文本。
+        self.osc_transport = OscTransport(self.osc_ip.get(), self.osc_port.get())
+        # 额外 OSC 目标（本地路由、第二客户端、日志接收端等），与主目标共用同一个套接字
+        self.osc_extra_targets = []
+
+        # Avatar 参数输出：数值直接驱动模型参数，不占用聊天框
+        self.avatar_params_enabled = tk.BooleanVar(value=False)
+        self.avatar_param_mappings = []
+        self.avatar_param_sink = AvatarParameterSink(self.osc_transport)
+
+        # OSC 接收：响应 VRChat 发出的事件（AFK、切换模型等）
+        self.osc_listen_enabled = tk.BooleanVar(value=False)
+        self.osc_listen_port = tk.IntVar(value=9001)
+        self.osc_actions = [dict(a) for a in DEFAULT_OSC_ACTIONS]
+        self.osc_server = None
+        self.osc_paused = False
+
+        # OSCQuery：广播接收地址空间，并自动发现 VRChat 的 OSC 端口
+        self.oscquery_enabled = tk.BooleanVar(value=False)
+        self.oscquery_server = None
+        self.mdns_responder = None
+        self.vrchat_discovery = VRChatDiscovery()
+
+        # 重复内容抑制：内容不变时只在保活时间到期前补发。
+        self.chatbox_keepalive = tk.IntVar(value=25)
+        self.chatbox_filter = ChatboxSendFilter()
+        # 聊天框限流：所有聊天框内容都经过令牌桶，令牌耗尽时合并为最新内容延后发送
+        self.chatbox_rate_burst = tk.IntVar(value=3)
+        self.chatbox_rate_interval_ms = tk.IntVar(value=1500)
+        self.chatbox_limiter = ChatboxRateLimiter()
+        self.osc_transport.set_rate_limiter(CHATBOX_INPUT, self.chatbox_limiter)
+        # 聊天框仲裁：界面消息与网易云歌词等来源按优先级合并为一路输出
+        self.chatbox_arbiter = ChatboxArbiter(self.osc_transport, send_filter=self.chatbox_filter)
+        self.chatbox_arbiter.register(GUI_PRODUCER, GUI_PRIORITY)
+
         self.is_sending = False
         self.scheduled_event = None
+        # 定时发送按绝对截止时间推进，倒计时和调试面板都读取同一个截止时间
+        self.send_scheduler = DeadlineScheduler()
+        # 按内容变化发送：时间、挂机、歌词等可预测的变化到点立即发送，不必等整个周期；
+        # 发送间隔是最长周期，两次发送之间不短于最短发送间隔（默认与限流恢复间隔相同）
+        self.change_driven_send = tk.BooleanVar(value=False)
+        self.min_send_interval_ms = tk.IntVar(value=1500)
+        self.countdown_job = None
         self.history_max_items = 20
         self.max_message_length = 144
+        # 超长消息分页：按行/词/字素切页后随定时发送轮播
+        self.chatbox_paging = tk.BooleanVar(value=False)
+        self.chatbox_paginator = ChatboxPaginator(self.max_message_length)
+        # 附加项轮播：每项可设权重与最短显示时间，消息内容始终保留
+        self.segment_rotation = tk.BooleanVar(value=False)
+        self.segment_settings = {}
+        self.segment_rotator = SegmentRotator(self.max_message_length, pinned=["消息内容"])
+        # 定时消息：指定时刻、周期显示与倒计时，按下一次触发时间存放在最小堆中
+        self.timed_messages = []
+        self.timed_scheduler = TimedMessageScheduler()
+        # 消息列表：多条消息按顺序/随机/权重轮换，每次定时发送切换一条
+        self.playlist_enabled = tk.BooleanVar(value=False)
+        self.playlist_mode = tk.StringVar(value="sequential")
+        self.playlist_entries = []
+        self.message_playlist = MessagePlaylist()
+        # 屏蔽词：规则为 词 -> 替换文本（None 表示用 * 遮盖），按内容来源单独开关
+        self.word_filter_rules = {}
+        self.word_filter_sources = ["window", "music", "lyrics"]
+        self.word_filter = WordFilter()
         self.history_list = []
         self.root.minsize(900, 625)
 
@@ -58,6 +137,7 @@ class VRChatAutoChat(
         self.ncm_stop_event = None
         self.ncm_shared_state = SharedState()
         self.ncm_config = Config(ncm_path="", ncm_port=9222)
+        self.ncm_lyric_aligner = LyricAligner(self.ncm_config.lyric_lead)
         self.ncm_launch_thread = None
         self.ncm_launch_event = None
 
@@ -72,21 +152,33 @@ class VRChatAutoChat(
         self.auto_start_countdown_remaining = 0
 
         self.debug_update_interval = 1000
+        # 省电模式：未检测到 VRChat 时放慢所有轮询、暂停蓝牙扫描
+        self.power_save_enabled = tk.BooleanVar(value=True)
+        self.vrchat_presence = VRChatPresence()
+        self.power_mode = None
         self.debug_update_job = None
         self.debug_labels = {}
+        # 窗口最小化/隐藏或调试面板收起时不刷新标签，也不采集仅用于显示的数据
+        self.window_visible = True
+        self.debug_panel_visible = False
         self.last_send_time = 0
 
         # 硬件读数缓存，保证一次发送周期内 OSC 消息和调试面板显示一致
         self._cached_cpu = None
         self._cached_ram = None
         self._cached_gpu = None
+        # 最近一次发送采集的数据快照
+        self.last_frame = EMPTY_FRAME
+        # 字数提示的附加内容长度缓存，设置或快照变化时才重新计算
+        self._additional_length_key = None
+        self._additional_length = 0
 
         self.original_wrap_state = False
 
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
 
-        self.order_options = ["时间", "消息内容", "挂机状态", "窗口标题", "心率", "硬件监测", "音乐信息"]
+        self.order_options = ["时间", "消息内容", "挂机状态", "窗口标题", "心率", "硬件监测", "音乐信息", "定时消息"]
 
         self.cpu_custom_label = tk.StringVar(value="")
         self.ram_custom_label = tk.StringVar(value="")
@@ -99,6 +191,21 @@ class VRChatAutoChat(
 
         # 先读配置，再搭界面，避免控件初始值错位。
         self.load_config()
+        self.update_osc_client()
+        self.update_chatbox_rate_limit()
+        self.apply_segment_settings()
+        self.apply_timed_messages()
+        self.apply_playlist()
+        self.apply_word_filter()
+        self.osc_transport.set_extra_targets(self.osc_extra_targets)
+        self.osc_transport.start()
+        self.avatar_param_sink.set_mappings(self.avatar_param_mappings)
+        if self.avatar_params_enabled.get():
+            self.avatar_param_sink.start(self.collect_avatar_param_values)
+        if self.osc_listen_enabled.get() and not self.start_osc_server():
+            self.osc_listen_enabled.set(False)
+        self.discover_vrchat()
+        self.root.after(0, self.check_vrchat_presence)
 
         self.root.title("VRChat常驻消息工具")
         self.root.geometry("850x600")
@@ -130,12 +237,34 @@ class VRChatAutoChat(
         # 添加对窗口焦点变化的监听
         self.root.bind("<FocusIn>", self.on_focus_in)
         self.root.bind("<FocusOut>", self.on_focus_out)
+        self.root.bind("<Map>", self.on_map)
+        self.root.bind("<Unmap>", self.on_unmap)
     def on_focus_in(self, event=None):
         """当主窗口获得焦点时的处理"""
         pass
     def on_focus_out(self, event=None):
         """当主窗口失去焦点时的处理"""
         pass
+    def on_unmap(self, event=None):
+        """主窗口最小化或隐藏时停止所有界面刷新，只保留发送"""
+        # 子控件的 Map/Unmap 也会冒泡到根窗口绑定，这里只处理根窗口自身
+        if event is not None and event.widget is not self.root:
+            return
+        self.window_visible = False
+        self.stop_debug_update()
+        if self.countdown_job:
+            self.root.after_cancel(self.countdown_job)
+            self.countdown_job = None
+    def on_map(self, event=None):
+        """窗口恢复时立即补一次刷新"""
+        if event is not None and event.widget is not self.root:
+            return
+        if self.window_visible:
+            return
+        self.window_visible = True
+        self.start_debug_update()
+        if self.is_sending and not self.countdown_job:
+            self.update_countdown()
     def start_auto_send(self):
         """开机自启：检查条件后自动开始发送"""
         self.auto_start_countdown_var.set("")  # 清除倒计时提示
@@ -168,7 +297,7 @@ class VRChatAutoChat(
     def check_start_button_state(self, event=None):
         """检查开始按钮状态"""
         message_content = self.text_input.get("1.0", "end-1c").strip()
-        has_message = bool(message_content)
+        has_message = bool(message_content) or (self.playlist_enabled.get() and len(self.message_playlist) > 0)
 
         # 检查是否有启用的功能
         has_enabled_feature = (
@@ -196,7 +325,39 @@ class VRChatAutoChat(
     def update_osc_client(self):
         ip = self.osc_ip.get()
         port = self._safe_int_get(self.osc_port, 'osc_port', 9000)
-        self.osc_client = udp_client.SimpleUDPClient(ip, port)
+        self.chatbox_arbiter.set_target(ip, port)
+    def check_vrchat_presence(self):
+        """定期检测 VRChat 进程并切换正常/省电模式"""
+        self.check_vrchat_presence_now()
+        self.root.after(PRESENCE_CHECK_MS, self.check_vrchat_presence)
+    def check_vrchat_presence_now(self):
+        """设置变化后立即按当前状态切换模式"""
+        mode = self.vrchat_presence.poll() if self.power_save_enabled.get() else None
+        if mode != self.power_mode:
+            self.apply_power_mode(mode)
+    def apply_power_mode(self, mode):
+        low_power = mode == MODE_LOW_POWER
+        self.power_mode = mode
+        profile = LOW_POWER_PROFILE if low_power else NORMAL_PROFILE
+        self.debug_update_interval = profile["debug_ms"]
+        self.ncm_config.poll_interval = profile["ncm_poll"]
+        self.avatar_param_sink.interval = profile["avatar_params"]
+        if low_power:
+            self.heart_rate_monitor.pause()
+        else:
+            self.heart_rate_monitor.resume()
+        if mode is not None:
+            print("未检测到 VRChat，进入省电模式" if low_power else "检测到 VRChat，恢复正常模式")
+    def send_interval(self):
+        """当前定时发送间隔（秒）；省电模式下不短于省电配置的间隔"""
+        interval = self._safe_int_get(self.interval_var, 'interval', 3)
+        if self.power_mode == MODE_LOW_POWER:
+            interval = max(interval, LOW_POWER_PROFILE["send_interval"])
+        return interval
+    def update_chatbox_rate_limit(self):
+        burst = max(1, self._safe_int_get(self.chatbox_rate_burst, 'chatbox_rate_burst', 3))
+        interval_ms = self._safe_int_get(self.chatbox_rate_interval_ms, 'chatbox_rate_interval_ms', 1500)
+        self.chatbox_limiter.configure(burst, interval_ms / 1000)
     @staticmethod
     def _validate_digits(P):
         """验证输入是否全为数字（用于 Spinbox/Entry 的 validatecommand）"""
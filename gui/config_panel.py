@@ -36,8 +36,31 @@ class ConfigMixin:
                 self.window_title_limit.set(config.get('window_title_limit', 20))
                 self.music_title_limit.set(config.get('music_title_limit', 30))
                 self.music_artist_limit.set(config.get('music_artist_limit', 30))
+                self.chatbox_paging.set(config.get('chatbox_paging', False))
+                self.segment_rotation.set(config.get('segment_rotation', False))
+                self.segment_settings = config.get('segment_settings', {})
+                self.timed_messages = config.get('timed_messages', [])
+                self.playlist_enabled.set(config.get('playlist_enabled', False))
+                self.playlist_mode.set(config.get('playlist_mode', 'sequential'))
+                self.playlist_entries = config.get('playlist', [])
+                self.word_filter_rules = config.get('word_filter_rules', {})
+                self.word_filter_sources = config.get('word_filter_sources', ["window", "music", "lyrics"])
                 self.osc_ip.set(config.get('osc_ip', '127.0.0.1'))
                 self.osc_port.set(config.get('osc_port', 9000))
+                self.chatbox_keepalive.set(config.get('chatbox_keepalive', 25))
+                self.chatbox_rate_burst.set(config.get('chatbox_rate_burst', 3))
+                self.chatbox_rate_interval_ms.set(config.get('chatbox_rate_interval_ms', 1500))
+                self.change_driven_send.set(config.get('change_driven_send', False))
+                self.min_send_interval_ms.set(config.get('min_send_interval_ms',
+                                                         config.get('chatbox_rate_interval_ms', 1500)))
+                self.power_save_enabled.set(config.get('power_save_enabled', True))
+                self.osc_extra_targets = config.get('osc_targets', [])
+                self.avatar_params_enabled.set(config.get('avatar_params_enabled', False))
+                self.avatar_param_mappings = config.get('avatar_params', [])
+                self.osc_listen_enabled.set(config.get('osc_listen_enabled', False))
+                self.osc_listen_port.set(config.get('osc_listen_port', 9001))
+                self.osc_actions = config.get('osc_actions', self.osc_actions)
+                self.oscquery_enabled.set(config.get('oscquery_enabled', False))
 
                 # 加载自动附加项状态
                 self.auto_time.set(config.get('auto_time', False))
@@ -60,6 +83,7 @@ class ConfigMixin:
                 self.ncm_config.bar_filled = config.get('ncm_bar_filled', '▓')
                 self.ncm_config.bar_thumb = config.get('ncm_bar_thumb', '◘')
                 self.ncm_config.bar_empty = config.get('ncm_bar_empty', '░')
+                self.ncm_config.lyric_lead = config.get('ncm_lyric_lead', 0.3)
                 self.ncm_config.template = config.get('ncm_template',
                                                       '🎵 {song} - {artist}\n{bar} {time}\n{lyric1}\n{lyric2}')
 
@@ -94,8 +118,31 @@ class ConfigMixin:
                 'window_title_limit': self._safe_int_get(self.window_title_limit, 'window_title_limit', 20),
                 'music_title_limit': self._safe_int_get(self.music_title_limit, 'music_title_limit', 30),
                 'music_artist_limit': self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 30),
+                'chatbox_paging': self.chatbox_paging.get(),
+                'segment_rotation': self.segment_rotation.get(),
+                'segment_settings': self.segment_settings,
+                'timed_messages': self.timed_messages,
+                'playlist_enabled': self.playlist_enabled.get(),
+                'playlist_mode': self.playlist_mode.get(),
+                'playlist': self.playlist_entries,
+                'word_filter_rules': self.word_filter_rules,
+                'word_filter_sources': self.word_filter_sources,
                 'osc_ip': self.osc_ip.get(),
                 'osc_port': self._safe_int_get(self.osc_port, 'osc_port', 9000),
+                'chatbox_keepalive': self._safe_int_get(self.chatbox_keepalive, 'chatbox_keepalive', 25),
+                'chatbox_rate_burst': self._safe_int_get(self.chatbox_rate_burst, 'chatbox_rate_burst', 3),
+                'chatbox_rate_interval_ms': self._safe_int_get(self.chatbox_rate_interval_ms,
+                                                               'chatbox_rate_interval_ms', 1500),
+                'change_driven_send': self.change_driven_send.get(),
+                'min_send_interval_ms': self._safe_int_get(self.min_send_interval_ms, 'min_send_interval_ms', 1500),
+                'power_save_enabled': self.power_save_enabled.get(),
+                'osc_targets': self.osc_extra_targets,
+                'avatar_params_enabled': self.avatar_params_enabled.get(),
+                'avatar_params': self.avatar_param_mappings,
+                'osc_listen_enabled': self.osc_listen_enabled.get(),
+                'osc_listen_port': self._safe_int_get(self.osc_listen_port, 'osc_listen_port', 9001),
+                'osc_actions': self.osc_actions,
+                'oscquery_enabled': self.oscquery_enabled.get(),
                 'auto_time': self.auto_time.get(),
                 'auto_window': self.auto_window.get(),
                 'auto_wrap': self.auto_wrap.get(),
@@ -114,6 +161,7 @@ class ConfigMixin:
                 'ncm_bar_filled': self.ncm_config.bar_filled,
                 'ncm_bar_thumb': self.ncm_config.bar_thumb,
                 'ncm_bar_empty': self.ncm_config.bar_empty,
+                'ncm_lyric_lead': self.ncm_config.lyric_lead,
                 'ncm_template': self.ncm_config.template,
                 'use_template_mode': self.use_template_mode.get(),
                 'template_string': self.template_string.get(),
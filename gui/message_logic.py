@@ -1,5 +1,6 @@
 """消息逻辑模块"""
 
+import math
 import re
 import time
 import tkinter as tk
@@ -10,12 +11,57 @@ import psutil
 import win32api
 import win32gui
 from hardware_monitor import get_gpu_usage
-from osc_sender import format_output
+from osc_sender import format_output, next_output_change
+from presence import MODE_ACTIVE, MODE_LOW_POWER
+from snapshot import capture_frame
+from template_engine import compile_template_lenient
+from text_layout import BudgetRule, allocate_budget, truncate_graphemes
 from winsdk.windows.media.control import (
     GlobalSystemMediaTransportControlsSessionManager as MediaManager,
     GlobalSystemMediaTransportControlsSessionPlaybackStatus,
 )
 
+# 界面消息在聊天框仲裁中的来源名与优先级（高于网易云歌词线程）
+GUI_PRODUCER = "gui"
+GUI_PRIORITY = 10
+# 按内容变化发送时在变化时刻之后多等的秒数，保证取到的是新值
+CHANGE_MARGIN = 0.05
+# 传统模式附加项 -> 快照中的数据源名（与模板变量同名）
+ADDITION_PROVIDERS = {
+    "挂机状态": "idle",
+    "时间": "time",
+    "窗口标题": "window",
+    "心率": "heart_rate",
+    "音乐信息": "music",
+    "硬件监测": "hardware",
+    "定时消息": "scheduled",
+}
+# 超出聊天框上限时各附加项的让位规则：优先级低的先截断，截到最短长度以下则整项去掉
+SEGMENT_BUDGET_RULES = {
+    "消息内容": BudgetRule(priority=100, min_length=8),
+    "定时消息": BudgetRule(priority=80),
+    "心率": BudgetRule(priority=60, min_length=None),
+    "时间": BudgetRule(priority=50, min_length=None),
+    "挂机状态": BudgetRule(priority=40, min_length=None),
+    "硬件监测": BudgetRule(priority=30, min_length=10),
+    "音乐信息": BudgetRule(priority=20, min_length=10),
+    "窗口标题": BudgetRule(priority=10, min_length=8),
+}
+# 字数提示中还没有采集过的附加项按最坏情况估算宽度（窗口标题和音乐由长度上限决定）
+WORST_CASE_WIDTHS = {
+    "time": len("[时间:00:00]"),
+    "idle": len("[已挂机: 999分99秒]"),
+    "heart_rate": len("[❤️:120 BPM]"),
+    "hardware": len("[CPU: 100%, RAM: 100%, GPU: 100%]"),
+    "scheduled": 0,
+    "cpu": len("100.0"),
+    "ram": len("100.0"),
+    "gpu": len("100.0"),
+    "hr": len("120"),
+}
+# 模板中依赖硬件读数缓存的变量，采集前先统一刷新一次读数
+HARDWARE_VARIABLES = frozenset(("hardware", "cpu", "ram", "gpu"))
+
 
 class MessageMixin:
     """Compose outgoing messages and drive the sending lifecycle."""
@@ -43,15 +89,28 @@ class MessageMixin:
                 state = self.ncm_shared_state.data.copy()
                 lyrics = list(self.ncm_shared_state.lyrics)
                 song_key = self.ncm_shared_state.song_key
+                last_update = self.ncm_shared_state.last_update
+            # 歌词按外推位置加提前量取行，抵消网络和显示延迟
+            aligner = self.ncm_lyric_aligner
+            aligner.lead = self.ncm_config.lyric_lead
+            lyric_pos = None
+            if state.play and aligner.timed(state, lyrics, song_key):
+                pos = aligner.position(state, last_update)
+                # 记录本次采集相对歌词行开始时间的对齐误差，调试面板显示
+                aligner.line_changed(lyrics, pos)
+                lyric_pos = pos + aligner.lead
+            elif not state.play:
+                aligner.reset()
             formatted_output = format_output(self.ncm_config, state, lyrics, song_key, self._safe_int_get(self.music_title_limit, 'music_title_limit', 20),
-                                             self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25))
+                                             self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25),
+                                             lyric_pos, self.word_filter)
             return formatted_output
         else:
             try:
                 music_info = self.loop.run_until_complete(self._get_media_info_async())
                 if music_info:
-                    title = music_info['title'][:self._safe_int_get(self.music_title_limit, 'music_title_limit', 20)]
-                    artist = music_info['artist'][:self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25)]
+                    title = truncate_graphemes(self.word_filter.apply("music", music_info['title']), self._safe_int_get(self.music_title_limit, 'music_title_limit', 20), "")
+                    artist = truncate_graphemes(self.word_filter.apply("music", music_info['artist']), self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25), "")
                     return f"[在听: {title} - {artist}]"
             except:
                 pass
@@ -62,12 +121,58 @@ class MessageMixin:
                 if "网易云音乐" in title:
                     match = re.match(r"(.+?)\s*-\s*(.+?)\s*-\s*.+?\s*网易云音乐", title)
                     if match:
-                        title = match.group(1)[:self._safe_int_get(self.music_title_limit, 'music_title_limit', 20)]
-                        artist = match.group(2)[:self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25)]
+                        title = truncate_graphemes(self.word_filter.apply("music", match.group(1)), self._safe_int_get(self.music_title_limit, 'music_title_limit', 20), "")
+                        artist = truncate_graphemes(self.word_filter.apply("music", match.group(2)), self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25), "")
                         return f"[在听: {title} - {artist}]"
             except:
                 pass
             return ""
+    def next_change_delay(self):
+        """估算消息中可预测的显示内容距离下一次变化的秒数；都无法预测时返回 None"""
+        template = self.template_string.get() if self.use_template_mode.get() else None
+        variables = compile_template_lenient(template).variables if template is not None else None
+
+        def shown(var, name):
+            return var.get() and (variables is None or name in variables)
+
+        delays = []
+        if shown(self.auto_time, 'time'):
+            # 时间精确到分钟
+            now = datetime.utcnow()
+            delays.append(60 - now.second - now.microsecond / 1e6)
+        if shown(self.auto_idle, 'idle'):
+            # 挂机时长每秒变化；未到阈值时在到达阈值那一刻出现
+            idle_sec = self.get_idle_duration()
+            threshold = self._safe_int_get(self.idle_threshold, 'idle_threshold', 30)
+            delays.append(1.0 if idle_sec >= threshold else threshold - idle_sec)
+        if shown(self.auto_music, 'music') and self.advanced_music_enabled.get() and self.ncm_sync_running:
+            with self.ncm_shared_state.lock:
+                state = self.ncm_shared_state.data.copy()
+                lyrics = list(self.ncm_shared_state.lyrics)
+                song_key = self.ncm_shared_state.song_key
+                last_update = self.ncm_shared_state.last_update
+            aligner = self.ncm_lyric_aligner
+            aligner.lead = self.ncm_config.lyric_lead
+            pos = aligner.position(state, last_update)
+            timed = state.play and aligner.timed(state, lyrics, song_key)
+            # 有时间轴歌词时换行时刻交给对齐器（已含提前量），这里只看进度条和播放时间，
+            # 否则同一行会在提前量处和真实开始时刻各触发一次发送
+            music_delay = next_output_change(self.ncm_config, state, () if timed else lyrics, pos)
+            if music_delay is not None:
+                delays.append(music_delay)
+            if timed:
+                # 歌词行提前 lead 秒发送
+                line_delay = aligner.until_next_line(lyrics, pos)
+                if line_delay is not None:
+                    delays.append(line_delay)
+        next_timed = self.timed_scheduler.next_deadline()
+        if next_timed is not None and (variables is None or 'scheduled' in variables):
+            # 定时消息开始、结束或倒计时跨分钟
+            delays.append(max(0.0, next_timed - time.time()))
+        return min(delays) if delays else None
+    def get_scheduled_text(self):
+        """当前处于显示时段的定时消息，多条用空格连接"""
+        return " ".join(self.timed_scheduler.poll())
     def get_idle_duration(self):
         try:
             last_input = win32api.GetLastInputInfo()
@@ -84,12 +189,21 @@ class MessageMixin:
     def update_char_count(self, event=None):
         current = len(self.text_input.get("1.0", "end-1c"))
         remaining = self.max_message_length - current - self.calculate_additional_length()
+        if remaining < 0 and self.chatbox_paging.get():
+            self.chars_remaining_label.configure(foreground="orange")
+            self.chars_remaining_var.set(f"超出 {-remaining} 字符，将分页发送")
+            return
         color = "green" if remaining >= 20 else "orange" if remaining >= 0 else "red"
         self.chars_remaining_label.configure(foreground=color)
         self.chars_remaining_var.set(f"可用字符: {remaining}/{self.max_message_length}")
     def on_paste(self, event):
         try:
             text = self.root.clipboard_get()
+            if self.chatbox_paging.get():
+                # 分页模式下超长内容会分页发送，不截断粘贴内容
+                self.text_input.insert(tk.INSERT, text)
+                self.update_char_count()
+                return "break"
             current = self.text_input.get("1.0", "end-1c")
             available = self.max_message_length - len(current) - self.calculate_additional_length()
 
@@ -105,260 +219,215 @@ class MessageMixin:
         return (datetime.utcnow() + timedelta(hours=8)).strftime("[时间:%H:%M]")
     def get_formatted_window_title(self):
         try:
-            title = win32gui.GetWindowText(win32gui.GetForegroundWindow())
-            return f"[在看:{title[:self._safe_int_get(self.window_title_limit, 'window_title_limit', 15)]}]"
+            # 先过滤完整标题再截断，屏蔽词不会因为被截断而漏掉
+            title = self.word_filter.apply("window", win32gui.GetWindowText(win32gui.GetForegroundWindow()))
+            return f"[在看:{truncate_graphemes(title, self._safe_int_get(self.window_title_limit, 'window_title_limit', 15), '')}]"
         except:
             return ""
-    def calculate_additional_length(self):
-        # 预估附加内容长度，用于输入框右上角字数提示。
-        total = 0
+    def format_hardware(self):
+        # 组合硬件监测文本，如 [CPU: 12%, RAM: 40%]；未启用或没有数据时返回空字符串。
+        if not self.auto_hardware.get():
+            return ''
+        hardware_parts = []
+        if self.auto_cpu.get():
+            cpu_usage = self.get_cpu_usage()
+            if cpu_usage != "N/A":
+                if self.cpu_custom_label.get():
+                    hardware_parts.append(f"CPU({self.cpu_custom_label.get()}): {cpu_usage:.0f}%")
+                else:
+                    hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
+        if self.auto_ram.get():
+            ram_usage = self.get_ram_usage()
+            if ram_usage != "N/A":
+                if self.ram_custom_label.get():
+                    hardware_parts.append(f"RAM({self.ram_custom_label.get()}): {ram_usage:.0f}%")
+                else:
+                    hardware_parts.append(f"RAM: {ram_usage:.0f}%")
+        if self.auto_gpu.get():
+            gpu_usage = self.get_gpu_usage()
+            if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
+                if self.gpu_custom_label.get():
+                    hardware_parts.append(f"GPU({self.gpu_custom_label.get()}): {gpu_usage}")
+                else:
+                    hardware_parts.append(f"GPU: {gpu_usage}")
+        return f"[{', '.join(hardware_parts)}]" if hardware_parts else ''
+
+    def format_idle(self):
+        # 挂机时长只读取一次；未到阈值时返回空字符串。
+        idle_sec = self.get_idle_duration()
+        if idle_sec >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30):
+            return f"[已挂机: {self.format_duration(idle_sec)}]"
+        return ''
+
+    def heart_rate_value(self):
+        monitor = self.heart_rate_monitor
+        if monitor.is_connected and monitor.current_hr > 0:
+            return monitor.current_hr
+        return None
 
-        if self.use_template_mode.get():
-            # 在模板模式下，计算模板字符串的长度
-            template = self.template_string.get()
-            # 替换模板变量为实际内容
-            replacements = {
-                '{message}': self.text_input.get("1.0", "end-1c").rstrip('\n'),
-                '{time}': self.get_formatted_time() if self.auto_time.get() else '',
-                '{window}': self.get_formatted_window_title() if self.auto_window.get() else '',
-                '{idle}': f"[已挂机: {self.format_duration(self.get_idle_duration())}]" if self.auto_idle.get() and self.get_idle_duration() >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30) else '',
-                '{music}': self.get_formatted_music_info() if self.auto_music.get() else '',
-                '{heart_rate}': f"[❤️:{self.heart_rate_monitor.current_hr} BPM]" if self.auto_heart_rate.get() and self.heart_rate_monitor.is_connected and self.heart_rate_monitor.current_hr > 0 else '',
-            }
-
-            # 处理硬件监测
-            hardware_parts = []
-            if self.auto_hardware.get():
-                if self.auto_cpu.get():
-                    cpu_usage = self.get_cpu_usage()
-                    if cpu_usage != "N/A":
-                        if self.cpu_custom_label.get():
-                            custom_label = self.cpu_custom_label.get()
-                            hardware_parts.append(f"CPU({custom_label}): {cpu_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
-                if self.auto_ram.get():
-                    ram_usage = self.get_ram_usage()
-                    if ram_usage != "N/A":
-                        if self.ram_custom_label.get():
-                            custom_label = self.ram_custom_label.get()
-                            hardware_parts.append(f"RAM({custom_label}): {ram_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"RAM: {ram_usage:.0f}%")
-                if self.auto_gpu.get():
-                    gpu_usage = self.get_gpu_usage()
-                    if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
-                        if self.gpu_custom_label.get():
-                            custom_label = self.gpu_custom_label.get()
-                            hardware_parts.append(f"GPU({custom_label}): {gpu_usage}")
-                        else:
-                            hardware_parts.append(f"GPU: {gpu_usage}")
+    def format_heart_rate(self):
+        hr = self.heart_rate_value()
+        return f"[❤️:{hr} BPM]" if hr is not None else ''
 
-            if hardware_parts:
-                hardware_str = f"[{', '.join(hardware_parts)}]"
-            else:
-                hardware_str = ''
+    def refresh_sensors(self):
+        # 快照中的第一个数据源：刷新一次硬件读数缓存，后面的硬件相关变量都读缓存
+        self._refresh_hardware_cache()
+        return ''
 
-            replacements['{hardware}'] = hardware_str
+    @staticmethod
+    def _usage_number(value):
+        # 硬件读数转为数值供模板格式说明使用（如 {cpu:.0f}），无法获取时返回 None
+        try:
+            return float(str(value).rstrip("%"))
+        except ValueError:
+            return None
 
-            # 替换模板变量
-            result = template
-            for var, replacement in replacements.items():
-                result = result.replace(var, replacement)
+    def frame_providers(self):
+        """当前启用的数据源：数据源名 -> 无参采集函数"""
+        providers = {}
+        if self.auto_time.get():
+            providers["time"] = self.get_formatted_time
+        if self.auto_window.get():
+            providers["window"] = self.get_formatted_window_title
+        if self.auto_idle.get():
+            providers["idle"] = self.format_idle
+        if self.auto_music.get():
+            providers["music"] = self.get_formatted_music_info
+        if self.auto_hardware.get():
+            providers["sensors"] = self.refresh_sensors
+            providers["hardware"] = self.format_hardware
+            if self.auto_cpu.get():
+                providers["cpu"] = lambda: self._usage_number(self._cached_cpu)
+            if self.auto_ram.get():
+                providers["ram"] = lambda: self._usage_number(self._cached_ram)
+            if self.auto_gpu.get():
+                providers["gpu"] = lambda: self._usage_number(self._cached_gpu)
+        if self.auto_heart_rate.get():
+            providers["heart_rate"] = self.format_heart_rate
+            providers["hr"] = self.heart_rate_value
+        providers["scheduled"] = self.get_scheduled_text
+        return providers
+
+    def active_template(self, entry=None):
+        """本次使用的编译后模板：消息列表条目预编译的模板优先，其次是全局模板；未使用模板时返回 None。"""
+        if entry is not None and entry.compiled is not None:
+            return entry.compiled
+        if self.use_template_mode.get():
+            return compile_template_lenient(self.template_string.get())
+        return None
 
-            # 替换换行符
-            result = result.replace('\\n', '\n')
+    def capture_frame(self, entry=None):
+        """采集本次发送的数据快照，只查询最终文本会用到的数据源。"""
+        template = self.active_template(entry)
+        if template is not None:
+            needed = set(template.variables)
+        elif entry is not None and entry.items is not None:
+            needed = {ADDITION_PROVIDERS[name] for name in entry.items if name in ADDITION_PROVIDERS}
+        else:
+            needed = set(ADDITION_PROVIDERS.values())
+        if needed & HARDWARE_VARIABLES:
+            needed.add("sensors")
+        providers = {name: fn for name, fn in self.frame_providers().items() if name in needed}
+        self.last_frame = capture_frame(providers)
+        return self.last_frame
 
-            total = len(result)
+    def calculate_additional_length(self):
+        # 预估附加内容长度，用于输入框右上角字数提示。
+        # 只使用上次发送的快照和缓存的最坏宽度，不查询任何数据源；设置和快照都没变时直接返回缓存值。
+        providers = self.frame_providers()
+        template = self.template_string.get() if self.use_template_mode.get() else None
+        key = (
+            self.last_frame.created, template, tuple(providers), self.auto_wrap.get(),
+            self._safe_int_get(self.window_title_limit, 'window_title_limit', 15),
+            self._safe_int_get(self.music_title_limit, 'music_title_limit', 20),
+            self._safe_int_get(self.music_artist_limit, 'music_artist_limit', 25),
+        )
+        if key == self._additional_length_key:
+            return self._additional_length
+
+        widths = dict(WORST_CASE_WIDTHS)
+        widths["window"] = len("[在看:]") + key[4]
+        widths["music"] = len("[在听:  - ]") + key[5] + key[6]
+        # 上次快照中已有的附加项用实际长度
+        widths.update((name, len(str(value))) for name, value in self.last_frame.values.items())
+
+        if template is not None:
+            # 模板模式：模板字面量加各变量宽度，消息本身由调用方单独计算
+            total = compile_template_lenient(template).measure({name: widths.get(name, 0) for name in providers})
         else:
-            # 传统模式下的计算
-            if self.auto_idle.get() and self.get_idle_duration() >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30):
-                total += len("[已挂机: 999分99秒]")
-            if self.auto_time.get():
-                total += len(self.get_formatted_time())
-            if self.auto_window.get():
-                window_str = self.get_formatted_window_title()
-                if window_str:
-                    total += len(window_str)
-            if self.auto_music.get():
-                music_str = self.get_formatted_music_info()
-                if music_str:
-                    total += len(music_str)
-            if self.auto_hardware.get():
-                hardware_parts = []
-                if self.auto_cpu.get():
-                    cpu_usage = self.get_cpu_usage()
-                    if cpu_usage != "N/A":
-                        if self.cpu_custom_label.get():  # 如果有自定义标签
-                            # 格式: CPU(标签): 占用率%
-                            custom_label = self.cpu_custom_label.get()
-                            hardware_parts.append(f"CPU({custom_label}): {cpu_usage:.0f}%")
-                        else:  # 使用默认格式
-                            hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
-                if self.auto_ram.get():
-                    ram_usage = self.get_ram_usage()
-                    if ram_usage != "N/A":
-                        if self.ram_custom_label.get():
-                            custom_label = self.ram_custom_label.get()
-                            hardware_parts.append(f"RAM({custom_label}): {ram_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"RAM: {ram_usage:.0f}%")
-                if self.auto_gpu.get():
-                    gpu_usage = self.get_gpu_usage()
-                    if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
-                        if self.gpu_custom_label.get():
-                            custom_label = self.gpu_custom_label.get()
-                            hardware_parts.append(f"GPU({custom_label}): {gpu_usage}")
-                        else:
-                            hardware_parts.append(f"GPU: {gpu_usage}")
-                if hardware_parts:
-                    total += len(f"[{', '.join(hardware_parts)}]")
-            if self.auto_heart_rate.get() and self.heart_rate_monitor.is_connected:
-                total += len("[❤️:120 BPM]")
+            # 传统模式：每个附加项另加一个分隔符
+            total = sum(widths[name] + 1 for name in ADDITION_PROVIDERS.values() if name in providers and widths[name])
 
+        self._additional_length_key = key
+        self._additional_length = total
         return total
-    def process_message(self, raw_message):
-        # 把用户输入和自动附加项组合成最终发送文本。
-        if self.use_template_mode.get():
-            # 使用模板字符串模式
-            template = self.template_string.get()
-
-            # 准备替换内容
-            replacements = {
-                '{message}': raw_message.rstrip('\n'),
-                '{time}': self.get_formatted_time() if self.auto_time.get() else '',
-                '{window}': self.get_formatted_window_title() if self.auto_window.get() else '',
-                '{idle}': f"[已挂机: {self.format_duration(self.get_idle_duration())}]" if self.auto_idle.get() and self.get_idle_duration() >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30) else '',
-                '{music}': self.get_formatted_music_info() if self.auto_music.get() else '',
-                '{heart_rate}': f"[❤️:{self.heart_rate_monitor.current_hr} BPM]" if self.auto_heart_rate.get() and self.heart_rate_monitor.is_connected and self.heart_rate_monitor.current_hr > 0 else '',
-            }
-
-            # 处理硬件监测
-            hardware_parts = []
-            if self.auto_hardware.get():
-                if self.auto_cpu.get():
-                    cpu_usage = self.get_cpu_usage()
-                    if cpu_usage != "N/A":
-                        if self.cpu_custom_label.get():
-                            custom_label = self.cpu_custom_label.get()
-                            hardware_parts.append(f"CPU({custom_label}): {cpu_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
-                if self.auto_ram.get():
-                    ram_usage = self.get_ram_usage()
-                    if ram_usage != "N/A":
-                        if self.ram_custom_label.get():
-                            custom_label = self.ram_custom_label.get()
-                            hardware_parts.append(f"RAM({custom_label}): {ram_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"RAM: {ram_usage:.0f}%")
-                if self.auto_gpu.get():
-                    gpu_usage = self.get_gpu_usage()
-                    if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
-                        if self.gpu_custom_label.get():
-                            custom_label = self.gpu_custom_label.get()
-                            hardware_parts.append(f"GPU({custom_label}): {gpu_usage}")
-                        else:
-                            hardware_parts.append(f"GPU: {gpu_usage}")
-
-            if hardware_parts:
-                hardware_str = f"[{', '.join(hardware_parts)}]"
-            else:
-                hardware_str = ''
-
-            replacements['{hardware}'] = hardware_str
-
-            # 替换模板变量
-            result = template
-            for var, replacement in replacements.items():
-                result = result.replace(var, replacement)
-
-            # 替换换行符
-            result = result.replace('\\n', '\n')
 
+    def process_message(self, raw_message, entry=None, frame=None):
+        # 把用户输入和自动附加项组合成最终发送文本。
+        if frame is None:
+            frame = self.capture_frame(entry)
+        return self.render_frame(raw_message, frame, entry, fit=True)
+
+    def render_frame(self, raw_message, frame, entry=None, fit=False):
+        """从快照渲染消息文本；发送和历史记录共用同一份快照，两者内容一致
+
+        fit 为 True 时（发送）把结果压进聊天框上限：轮播或按优先级截断；开启分页时保留全文交给分页。
+        """
+        message = self.word_filter.apply("message", raw_message.rstrip('\n'))
+        template = self.active_template(entry)
+        if template is not None:
+            # 使用模板字符串模式（消息列表条目可覆盖模板）
+            values = dict(frame.values)
+            values["message"] = message
+            result = template.render(values)
+            if fit and not self.chatbox_paging.get():
+                # 模板中各变量与字面量混排，只能整体按字素截断
+                result = truncate_graphemes(result, self.max_message_length)
             return result
-        else:
-            # 传统模式
-            additions = {}
-            wrap_char = "\n" if self.auto_wrap.get() else " "
-
-            # 收集所有附加项
-            if self.auto_idle.get():
-                idle_sec = self.get_idle_duration()
-                if idle_sec >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30):
-                    additions["挂机状态"] = f"[已挂机: {self.format_duration(idle_sec)}]"
-
-            if self.auto_time.get():
-                additions["时间"] = self.get_formatted_time()
-
-            if self.auto_window.get():
-                window_title = self.get_formatted_window_title()
-                if window_title:
-                    additions["窗口标题"] = window_title
-
-            if self.auto_heart_rate.get() and self.heart_rate_monitor.is_connected:
-                hr = self.heart_rate_monitor.current_hr
-                if hr > 0:
-                    additions["心率"] = f"[❤️:{hr} BPM]"
-
-            if self.auto_music.get():
-                music_info = self.get_formatted_music_info()
-                if music_info:
-                    additions["音乐信息"] = music_info
 
-            hardware_parts = []
-            if self.auto_hardware.get():
-                if self.auto_cpu.get():
-                    cpu_usage = self.get_cpu_usage()
-                    if cpu_usage != "N/A":
-                        # 修复后的硬件标签逻辑
-                        if self.cpu_custom_label.get():  # 如果有自定义标签
-                            # 格式: CPU(标签): 占用率%
-                            custom_label = self.cpu_custom_label.get()
-                            hardware_parts.append(f"CPU({custom_label}): {cpu_usage:.0f}%")
-                        else:  # 使用默认格式
-                            hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
-                if self.auto_ram.get():
-                    ram_usage = self.get_ram_usage()
-                    if ram_usage != "N/A":
-                        if self.ram_custom_label.get():
-                            custom_label = self.ram_custom_label.get()
-                            hardware_parts.append(f"RAM({custom_label}): {ram_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"RAM: {ram_usage:.0f}%")
-                if self.auto_gpu.get():
-                    gpu_usage = self.get_gpu_usage()
-                    if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
-                        if self.gpu_custom_label.get():
-                            custom_label = self.gpu_custom_label.get()
-                            hardware_parts.append(f"GPU({custom_label}): {gpu_usage}")
-                        else:
-                            hardware_parts.append(f"GPU: {gpu_usage}")
+        # 传统模式
+        wrap_char = "\n" if self.auto_wrap.get() else " "
+        additions = {name: frame.get(key) for name, key in ADDITION_PROVIDERS.items() if frame.get(key)}
+
+        # 消息列表条目可限定本条显示哪些附加项
+        if entry is not None and entry.items is not None:
+            additions = {k: v for k, v in additions.items() if k in entry.items}
+
+        # 按照设置的顺序组织附加项和消息内容
+        ordered_parts = []
+        sorted_items = sorted(self.order_vars.items(), key=lambda x: self._safe_order_int(x[1]))
+
+        for item_name, _ in sorted_items:
+            if item_name == "消息内容":
+                # 添加用户输入的消息内容
+                ordered_parts.append((item_name, message))
+            elif item_name in additions:
+                ordered_parts.append((item_name, additions[item_name]))
+
+        # 轮播模式：放不下的附加项按权重轮流出现，而不是被 144 字符上限截掉
+        if fit and self.segment_rotation.get():
+            self.segment_rotator.limit = self.max_message_length
+            ordered_parts = self.segment_rotator.pack(ordered_parts, wrap_char)
+        if fit and not self.chatbox_paging.get():
+            # 仍然超出上限时按优先级分配预算，在字素边界截断，不会拆开表情或组合符号
+            ordered_parts = allocate_budget(ordered_parts, SEGMENT_BUDGET_RULES, self.max_message_length, wrap_char)
+        ordered_parts = [text for _, text in ordered_parts]
+
+        # 组合最终消息
+        if ordered_parts:
+            full_message = wrap_char.join(ordered_parts)
+        else:
+            full_message = message
 
-            if hardware_parts:
-                additions["硬件监测"] = f"[{', '.join(hardware_parts)}]"
-
-            # 按照设置的顺序组织附加项和消息内容
-            ordered_parts = []
-            sorted_items = sorted(self.order_vars.items(), key=lambda x: self._safe_order_int(x[1]))
-
-            for item_name, _ in sorted_items:
-                if item_name == "消息内容":
-                    # 添加用户输入的消息内容
-                    ordered_parts.append(raw_message.rstrip('\n'))
-                elif item_name in additions:
-                    ordered_parts.append(additions[item_name])
-
-            # 组合最终消息
-            if ordered_parts:
-                full_message = wrap_char.join(ordered_parts)
-            else:
-                full_message = raw_message.rstrip('\n')
+        return full_message.strip()
 
-            return full_message.strip()
     def send_message(self):
         # 发送前先校验，再构造文本并写入历史。
-        raw_message = self.text_input.get("1.0", "end-1c").rstrip('\n')
+        entry = self.message_playlist.current() if self.playlist_enabled.get() else None
+        if entry is not None:
+            raw_message = entry.message
+        else:
+            raw_message = self.text_input.get("1.0", "end-1c").rstrip('\n')
 
         # 检查是否有启用的功能或消息内容
         has_enabled_feature = (
@@ -374,162 +443,41 @@ class MessageMixin:
             messagebox.showwarning("提示", "请先输入消息内容或启用至少一个功能！")
             return False
 
+        # 游戏内触发了暂停，保持定时循环但跳过本次发送
+        if self.osc_paused:
+            return True
+
         try:
-            # 一次性采集硬件读数，保证 OSC 消息和调试面板显示一致
-            self._refresh_hardware_cache()
-            final_message = self.process_message(raw_message)
-            self.osc_client.send_message("/chatbox/input", [final_message, True])
+            # 每次发送只采集一次快照，发送文本和历史记录都从它渲染
+            frame = self.capture_frame(entry)
+            if "sensors" not in frame:
+                # 消息未用到硬件监测时仍刷新读数，供 Avatar 参数和调试面板使用
+                self._refresh_hardware_cache()
+            full_message = self.process_message(raw_message, entry, frame)
+            final_message = self.chatbox_paginator.next_page(full_message) if self.chatbox_paging.get() else full_message
+            self.last_send_time = time.time()
+
+            # 内容未变化且未到保活时间时跳过本次发送，也不重复写入历史
+            self.chatbox_filter.keepalive = self._safe_int_get(self.chatbox_keepalive, 'chatbox_keepalive', 25)
+            if not self.chatbox_arbiter.submit(GUI_PRODUCER, final_message):
+                return True
 
             # 记录到历史记录的消息（按设置的顺序）
-            history_msg = self.process_history_message(raw_message)
+            history_msg = self.process_history_message(raw_message, entry, frame)
 
             self.send_to_history(history_msg)
             self.update_char_count()
-            self.last_send_time = time.time()
             return True
         except Exception as e:
             messagebox.showerror("错误", f"消息发送失败: {str(e)}")
             return False
-    def process_history_message(self, raw_message):
+    def process_history_message(self, raw_message, entry=None, frame=None):
         """处理历史记录消息，按照设置的顺序排列"""
-        # 历史记录尽量保持和实际发送内容一致，方便回看。
-        if self.use_template_mode.get():
-            # 使用模板字符串模式
-            template = self.template_string.get()
-
-            # 准备替换内容
-            replacements = {
-                '{message}': raw_message.rstrip('\n'),
-                '{time}': self.get_formatted_time() if self.auto_time.get() else '',
-                '{window}': self.get_formatted_window_title() if self.auto_window.get() else '',
-                '{idle}': f"[已挂机: {self.format_duration(self.get_idle_duration())}]" if self.auto_idle.get() and self.get_idle_duration() >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30) else '',
-                '{music}': self.get_formatted_music_info() if self.auto_music.get() else '',
-                '{heart_rate}': f"[❤️:{self.heart_rate_monitor.current_hr} BPM]" if self.auto_heart_rate.get() and self.heart_rate_monitor.is_connected and self.heart_rate_monitor.current_hr > 0 else '',
-            }
-
-            # 处理硬件监测
-            hardware_parts = []
-            if self.auto_hardware.get():
-                if self.auto_cpu.get():
-                    cpu_usage = self.get_cpu_usage()
-                    if cpu_usage != "N/A":
-                        if self.cpu_custom_label.get():
-                            custom_label = self.cpu_custom_label.get()
-                            hardware_parts.append(f"CPU({custom_label}): {cpu_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
-                if self.auto_ram.get():
-                    ram_usage = self.get_ram_usage()
-                    if ram_usage != "N/A":
-                        if self.ram_custom_label.get():
-                            custom_label = self.ram_custom_label.get()
-                            hardware_parts.append(f"RAM({custom_label}): {ram_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"RAM: {ram_usage:.0f}%")
-                if self.auto_gpu.get():
-                    gpu_usage = self.get_gpu_usage()
-                    if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
-                        if self.gpu_custom_label.get():
-                            custom_label = self.gpu_custom_label.get()
-                            hardware_parts.append(f"GPU({custom_label}): {gpu_usage}")
-                        else:
-                            hardware_parts.append(f"GPU: {gpu_usage}")
-
-            if hardware_parts:
-                hardware_str = f"[{', '.join(hardware_parts)}]"
-            else:
-                hardware_str = ''
-
-            replacements['{hardware}'] = hardware_str
-
-            # 替换模板变量
-            result = template
-            for var, replacement in replacements.items():
-                result = result.replace(var, replacement)
+        # 历史记录使用发送时的同一份快照，只是不做轮播，显示全部附加项。
+        if frame is None:
+            frame = self.last_frame
+        return self.render_frame(raw_message, frame, entry)
 
-            # 替换换行符
-            result = result.replace('\\n', '\n')
-
-            return result
-        else:
-            # 传统模式
-            additions = {}
-            wrap_char = "\n" if self.auto_wrap.get() else " "
-
-            # 收集所有附加项
-            if self.auto_idle.get():
-                idle_sec = self.get_idle_duration()
-                if idle_sec >= self._safe_int_get(self.idle_threshold, 'idle_threshold', 30):
-                    additions["挂机状态"] = f"[已挂机: {self.format_duration(idle_sec)}]"
-
-            if self.auto_time.get():
-                additions["时间"] = self.get_formatted_time()
-
-            if self.auto_window.get():
-                window_title = self.get_formatted_window_title()
-                if window_title:
-                    additions["窗口标题"] = window_title
-
-            if self.auto_heart_rate.get() and self.heart_rate_monitor.is_connected:
-                hr = self.heart_rate_monitor.current_hr
-                if hr > 0:
-                    additions["心率"] = f"[❤️:{hr} BPM]"
-
-            if self.auto_music.get():
-                music_info = self.get_formatted_music_info()
-                if music_info:
-                    additions["音乐信息"] = music_info
-
-            hardware_parts = []
-            if self.auto_hardware.get():
-                if self.auto_cpu.get():
-                    cpu_usage = self.get_cpu_usage()
-                    if cpu_usage != "N/A":
-                        # 修复后的硬件标签逻辑
-                        if self.cpu_custom_label.get():  # 如果有自定义标签
-                            # 格式: CPU(标签): 占用率%
-                            custom_label = self.cpu_custom_label.get()
-                            hardware_parts.append(f"CPU({custom_label}): {cpu_usage:.0f}%")
-                        else:  # 使用默认格式
-                            hardware_parts.append(f"CPU: {cpu_usage:.0f}%")
-                if self.auto_ram.get():
-                    ram_usage = self.get_ram_usage()
-                    if ram_usage != "N/A":
-                        if self.ram_custom_label.get():
-                            custom_label = self.ram_custom_label.get()
-                            hardware_parts.append(f"RAM({custom_label}): {ram_usage:.0f}%")
-                        else:
-                            hardware_parts.append(f"RAM: {ram_usage:.0f}%")
-                if self.auto_gpu.get():
-                    gpu_usage = self.get_gpu_usage()
-                    if gpu_usage and gpu_usage not in ("无法获取GPU数据", "无法获取AMD GPU数据", "AMD库未安装"):
-                        if self.gpu_custom_label.get():
-                            custom_label = self.gpu_custom_label.get()
-                            hardware_parts.append(f"GPU({custom_label}): {gpu_usage}")
-                        else:
-                            hardware_parts.append(f"GPU: {gpu_usage}")
-
-            if hardware_parts:
-                additions["硬件监测"] = f"[{', '.join(hardware_parts)}]"
-
-            # 按照设置的顺序组织附加项和消息内容
-            ordered_parts = []
-            sorted_items = sorted(self.order_vars.items(), key=lambda x: self._safe_order_int(x[1]))
-
-            for item_name, _ in sorted_items:
-                if item_name == "消息内容":
-                    # 添加用户输入的消息内容
-                    ordered_parts.append(raw_message.rstrip('\n'))
-                elif item_name in additions:
-                    ordered_parts.append(additions[item_name])
-
-            # 组合最终消息
-            if ordered_parts:
-                full_message = wrap_char.join(ordered_parts)
-            else:
-                full_message = raw_message.rstrip('\n')
-
-            return full_message.strip()
     def send_to_history(self, message):
         current_time = datetime.now().strftime('%H:%M:%S')
         formatted_message = f"[{len(self.history_list) + 1}] ({current_time}):\n"
@@ -556,6 +504,8 @@ class MessageMixin:
     def toggle_sending(self):
         if not self.is_sending:
             raw_message = self.text_input.get("1.0", "end-1c").strip()
+            if self.playlist_enabled.get() and len(self.message_playlist) > 0:
+                raw_message = self.message_playlist.current().message
             has_enabled_feature = (
                     self.auto_time.get() or
                     self.auto_window.get() or
@@ -578,11 +528,15 @@ class MessageMixin:
         # 首次发送成功后，切进定时发送循环。
         self.is_sending = True
         self.status_var.set("正在自动发送消息...")
-        interval = self._safe_int_get(self.interval_var, 'interval', 3)
+        self.chatbox_arbiter.reset()
+        self.chatbox_paginator.reset()
+        self.message_playlist.reset()
+        self.discover_vrchat()
+        self.send_scheduler.start(self.send_interval())
         success = self.send_message()
         if success:
-            self.scheduled_event = self.root.after(interval * 1000, self.scheduled_send_status)
-            self.update_countdown(interval)
+            self._arm_send_timer()
+            self.update_countdown()
             self.start_debug_update()
         else:
             # 如果第一次发送就失败了，停止发送并更新UI
@@ -595,7 +549,10 @@ class MessageMixin:
             self.root.after_cancel(self.debug_update_job)
             self.debug_update_job = None
     def update_debug_info(self):
-        # 定时刷新调试区，显示当前拼接状态。
+        # 定时刷新调试区，显示当前拼接状态；窗口或面板不可见时停止，恢复时由 start_debug_update 补刷。
+        if not (self.window_visible and self.debug_panel_visible):
+            self.debug_update_job = None
+            return
         try:
             # 一次性采集硬件读数，让调试面板用和发送一致的缓存值
             if self.auto_hardware.get():
@@ -612,9 +569,11 @@ class MessageMixin:
             idle_sec = self.get_idle_duration()
             self.debug_labels['idle_time'].config(text=self.format_duration(idle_sec))
 
-            if self.is_sending:
-                remaining = self._safe_int_get(self.interval_var, 'interval', 3) - (time.time() - self.last_send_time)
-                self.debug_labels['next_send'].config(text=f"{max(0, int(remaining))}秒")
+            if self.is_sending and self.send_scheduler.running:
+                sched = self.send_scheduler.stats()
+                self.debug_labels['next_send'].config(
+                    text=f"{math.ceil(self.send_scheduler.remaining())}秒 | 抖动 {sched['avg_jitter_ms']:.1f}ms"
+                         f" | 错过 {sched['missed']} | 提前 {sched['pulled']} | 推迟 {sched['deferred']}")
             else:
                 self.debug_labels['next_send'].config(text="未启用")
 
@@ -669,6 +628,34 @@ class MessageMixin:
             self.debug_labels['ram_usage'].config(text=ram_message)
             self.debug_labels['gpu_usage'].config(text=gpu_message)
 
+            osc_stats = self.osc_transport.stats()
+            self.debug_labels['osc_stats'].config(
+                text=f"队列 {osc_stats['depth']} | 丢弃 {osc_stats['dropped']} | 延迟 {osc_stats['avg_latency_ms']:.1f}ms"
+                     f" | 抑制 {self.chatbox_filter.suppressed} | 限流 {self.chatbox_limiter.deferred}"
+                     f" | 来源 {self.chatbox_arbiter.active or '-'} | 屏蔽 {self.word_filter.replaced}")
+
+            frame = self.last_frame
+            if frame.timings:
+                slowest, slowest_ms = frame.slowest()
+                self.debug_labels['frame_timing'].config(
+                    text=f"{frame.total_ms:.1f}ms | 最慢 {slowest} {slowest_ms:.1f}ms"
+                         f" | {time.strftime('%H:%M:%S', time.localtime(frame.created))}")
+            else:
+                self.debug_labels['frame_timing'].config(text="未采集")
+
+            if self.advanced_music_enabled.get() and self.ncm_sync_running:
+                align = self.ncm_lyric_aligner.stats()
+                self.debug_labels['lyric_align'].config(
+                    text=f"{align['lines']} 行 | 平均 {align['avg_error_ms']:.0f}ms | 最大 {align['max_error_ms']:.0f}ms")
+            else:
+                self.debug_labels['lyric_align'].config(text="未启用")
+
+            presence = self.vrchat_presence.stats()
+            mode_text = {MODE_ACTIVE: "正常", MODE_LOW_POWER: "省电"}.get(self.power_mode, "未启用省电")
+            self.debug_labels['power_mode'].config(
+                text=f"{mode_text} | 正常 {self.format_duration(int(presence['active_s']))}"
+                     f" | 省电 {self.format_duration(int(presence['low_power_s']))}")
+
         except Exception as e:
             print(f"调试更新错误: {str(e)}")
 
@@ -697,26 +684,57 @@ class MessageMixin:
     def stop_sending(self):
         if self.scheduled_event:
             self.root.after_cancel(self.scheduled_event)
+            self.scheduled_event = None
+        if self.countdown_job:
+            self.root.after_cancel(self.countdown_job)
+            self.countdown_job = None
+        self.send_scheduler.stop()
         self.is_sending = False
+        # 让出聊天框，其他来源（如网易云歌词）可立即接管
+        self.chatbox_arbiter.release(GUI_PRODUCER)
         self.status_var.set("已停止发送")
         self.countdown_var.set("")
         self.stop_debug_update()
         # 更新按钮文本为"开始发送"
         self.start_btn.config(text="开始发送")
-    def update_countdown(self, remaining_seconds):
-        if remaining_seconds >= 0 and self.is_sending:
-            self.countdown_var.set(f"下次发送还剩 {remaining_seconds} 秒")
-            if remaining_seconds > 0:
-                self.root.after(1000, self.update_countdown, remaining_seconds - 1)
-        else:
+    def update_countdown(self):
+        # 倒计时直接读取调度器的截止时间，在整秒边界刷新，不单独累计
+        self.countdown_job = None
+        if not self.window_visible:
+            return
+        remaining = self.send_scheduler.remaining()
+        if remaining is None or not self.is_sending:
             self.countdown_var.set("")
+            return
+        self.countdown_var.set(f"下次发送还剩 {math.ceil(remaining)} 秒")
+        delay = int((remaining - math.floor(remaining)) * 1000) or 1000
+        self.countdown_job = self.root.after(delay, self.update_countdown)
+    def _arm_send_timer(self):
+        # 每次按"到截止时间还剩多少"重新挂定时器，发送耗时不会累加到周期里
+        if self.change_driven_send.get():
+            delay = self.next_change_delay()
+            if delay is not None:
+                # 发送间隔是最长周期；提前发送时两次发送之间不短于最短发送间隔，
+                # 没变化的内容由重复抑制器丢弃，只在保活到期前补发
+                min_interval = self._safe_int_get(self.min_send_interval_ms, 'min_send_interval_ms', 1500)
+                self.send_scheduler.min_interval = max(1.0, min_interval / 1000)
+                if not self.send_scheduler.pull_in(delay + CHANGE_MARGIN):
+                    # 变化紧跟在原定发送之后时推迟这次发送，避免发送后最短间隔未到而错过变化
+                    self.send_scheduler.defer(delay + CHANGE_MARGIN)
+        self.scheduled_event = self.root.after(self.send_scheduler.delay_ms(), self.scheduled_send_status)
     def scheduled_send_status(self):
+        self.scheduled_event = None
         if self.is_sending:
-            interval = self._safe_int_get(self.interval_var, 'interval', 3)
+            self.send_scheduler.set_interval(self.send_interval())
+            self.send_scheduler.tick()
+            if self.playlist_enabled.get():
+                self.message_playlist.advance()
             success = self.send_message()
             if success:
-                self.scheduled_event = self.root.after(interval * 1000, self.scheduled_send_status)
-                self.update_countdown(interval)
+                self._arm_send_timer()
+                if self.countdown_job:
+                    self.root.after_cancel(self.countdown_job)
+                self.update_countdown()
             else:
                 # 如果发送失败，停止发送并更新UI状态
                 self.stop_sending()
@@ -762,9 +780,11 @@ class MessageMixin:
 
         if any_enabled:
             self.debug_frame.pack(pady=10, padx=5, fill=tk.X)
+            self.debug_panel_visible = True
             self.start_debug_update()
         else:
             self.debug_frame.pack_forget()
+            self.debug_panel_visible = False
             self.stop_debug_update()
 
         # 更新开始按钮状态
@@ -779,6 +799,8 @@ class MessageMixin:
         self.stop_sending()
         self.stop_debug_update()
         self.heart_rate_monitor.stop()  # 停止心率监测
+        self.avatar_param_sink.stop()
+        self.stop_osc_server()
 
         # 检查并停止网易云同步，防止访问不存在的UI元素
         if self.ncm_sync_running:
@@ -801,7 +823,7 @@ class MessageMixin:
         self.save_config()
 
         try:
-            self.osc_client.close()
+            self.osc_transport.stop()
             self.loop.close()
         except:
             pass
@@ -822,6 +844,30 @@ class MessageMixin:
         except Exception:
             self._cached_gpu = "N/A"
 
+    def collect_avatar_param_values(self):
+        """汇总 Avatar 参数可用的数值（在参数线程中调用，只读取普通属性，不访问 Tk 变量）。"""
+        monitor = self.heart_rate_monitor
+        values = {
+            "hr": monitor.current_hr if monitor.is_connected and monitor.current_hr > 0 else None,
+            "hr_connected": monitor.is_connected,
+        }
+        for key, cached in (("cpu", self._cached_cpu), ("ram", self._cached_ram), ("gpu", self._cached_gpu)):
+            try:
+                values[key] = float(str(cached).rstrip("%"))
+            except ValueError:
+                values[key] = None
+
+        if self.ncm_sync_running:
+            with self.ncm_shared_state.lock:
+                state = self.ncm_shared_state.data
+                cur, dur, play = state.cur, state.dur, state.play
+                last_update = self.ncm_shared_state.last_update
+            if play and last_update > 0:
+                cur = min(cur + time.time() - last_update, dur) if dur else cur
+            values["song_progress"] = cur / dur if dur else None
+            values["song_playing"] = play
+        return values
+
     def get_cpu_usage(self):
         """返回 CPU 使用率，优先使用缓存值。"""
         if self._cached_cpu is not None:
@@ -0,0 +1,188 @@
+"""OSC 接收逻辑模块：响应 VRChat 发出的事件，并通过 OSCQuery 广播与发现"""
+
+import tkinter as tk
+from tkinter import messagebox
+
+from osc_transport import OscServer
+from oscquery import (
+    OSC_SERVICE,
+    OSCJSON_SERVICE,
+    MdnsResponder,
+    OscQueryServer,
+    random_instance_name,
+)
+
+# 可用的事件动作
+OSC_ACTIONS = {
+    "pause": "参数为真时暂停发送，为假时恢复",
+    "send_now": "立即发送一次",
+    "preset": "切换消息内容为指定文本并立即发送",
+}
+
+DEFAULT_OSC_ACTIONS = [
+    {"address": "/avatar/parameters/AFK", "action": "pause", "value": None, "text": ""},
+    {"address": "/avatar/change", "action": "send_now", "value": None, "text": ""},
+]
+
+
+class OscInputMixin:
+    """接收 VRChat 发出的 OSC 事件，并映射为发送相关的操作。"""
+
+    def start_osc_server(self):
+        """按当前配置启动 OSC 接收服务"""
+        self.stop_osc_server()
+        # 启用 OSCQuery 时由系统分配空闲端口，VRChat 通过 mDNS 找到本工具，避免多个 OSC 程序抢 9001
+        if self.oscquery_enabled.get():
+            port = 0
+        else:
+            port = self._safe_int_get(self.osc_listen_port, 'osc_listen_port', 9001)
+        server = OscServer("127.0.0.1", port)
+        for action in self.osc_actions:
+            server.map(action["address"], lambda address, *args, a=action: self._on_osc_event(a, args))
+        try:
+            server.start()
+        except OSError as e:
+            print(f"OSC 接收端口 {port} 启动失败: {e}")
+            return False
+        self.osc_server = server
+        if self.oscquery_enabled.get():
+            self.start_oscquery_advertisement(server.port)
+        return True
+    def stop_osc_server(self):
+        self.stop_oscquery_advertisement()
+        if self.osc_server:
+            self.osc_server.stop()
+            self.osc_server = None
+    def start_oscquery_advertisement(self, osc_port):
+        """启动 OSCQuery HTTP 服务并通过 mDNS 广播本工具的接收地址空间"""
+        name = random_instance_name()
+        addresses = [a["address"] for a in self.osc_actions]
+        self.oscquery_server = OscQueryServer(name, osc_port, addresses)
+        try:
+            self.oscquery_server.start()
+            self.mdns_responder = MdnsResponder(name)
+            self.mdns_responder.advertise(name, OSCJSON_SERVICE, self.oscquery_server.http_port)
+            self.mdns_responder.advertise(name, OSC_SERVICE, osc_port)
+            self.mdns_responder.start()
+        except OSError as e:
+            print(f"OSCQuery 广播启动失败: {e}")
+            self.stop_oscquery_advertisement()
+    def stop_oscquery_advertisement(self):
+        if self.mdns_responder:
+            self.mdns_responder.stop()
+            self.mdns_responder = None
+        if self.oscquery_server:
+            self.oscquery_server.stop()
+            self.oscquery_server = None
+    def discover_vrchat(self):
+        """查询 VRChat 的 OSCQuery 服务；结果带 TTL 缓存，过期时在后台刷新，不阻塞界面"""
+        if not self.oscquery_enabled.get():
+            return
+        cached = self.vrchat_discovery.get(
+            on_result=lambda result: self.root.after(0, self._apply_vrchat_discovery, result))
+        if cached:
+            self._apply_vrchat_discovery(cached)
+    def _apply_vrchat_discovery(self, result):
+        # 发现 VRChat 后自动把主目标指向它实际监听的 OSC 地址
+        if not result or not self.oscquery_enabled.get():
+            return
+        if (self.osc_ip.get(), self._safe_int_get(self.osc_port, 'osc_port', 9000)) != (
+                result["osc_ip"], result["osc_port"]):
+            print(f"OSCQuery 发现 {result['name']}: {result['osc_ip']}:{result['osc_port']}")
+            self.osc_ip.set(result["osc_ip"])
+            self.osc_port.set(result["osc_port"])
+            self.update_osc_client()
+    def toggle_oscquery(self):
+        """切换 OSCQuery：重启接收服务以更换端口，并立即尝试发现 VRChat"""
+        if self.osc_server:
+            self.start_osc_server()
+        self.discover_vrchat()
+    def _on_osc_event(self, action, args):
+        # 在接收线程中调用，只做匹配判断，界面相关操作交回 Tk 主线程。
+        value = args[0] if args else None
+        expected = action.get("value")
+        if expected is not None and action["action"] != "pause" and value != expected:
+            return
+        self.root.after(0, self._run_osc_action, action, value)
+    def _run_osc_action(self, action, value):
+        kind = action["action"]
+        if kind == "pause":
+            expected = action.get("value")
+            self.set_osc_paused(bool(value) if expected is None else value == expected)
+        elif kind == "send_now":
+            self.send_now()
+        elif kind == "preset":
+            self.text_input.delete("1.0", tk.END)
+            self.text_input.insert("1.0", action.get("text", ""))
+            self.update_char_count()
+            self.check_start_button_state()
+            self.send_now()
+    def set_osc_paused(self, paused):
+        """由游戏内状态暂停/恢复发送；恢复时立即补发一次"""
+        if paused == self.osc_paused:
+            return
+        self.osc_paused = paused
+        if not self.is_sending:
+            return
+        if paused:
+            self.status_var.set("已暂停发送（游戏内触发）")
+        else:
+            self.status_var.set("正在自动发送消息...")
+            self.send_now()
+    def send_now(self):
+        """立即发送一次，不等待下一次定时发送"""
+        if self.is_sending and not self.osc_paused:
+            self.chatbox_arbiter.reset()
+            self.send_message()
+    def toggle_osc_server(self):
+        """切换 OSC 接收服务"""
+        if self.osc_listen_enabled.get():
+            if not self.start_osc_server():
+                self.osc_listen_enabled.set(False)
+                messagebox.showerror("错误", "OSC 接收端口启动失败，可能已被其他程序占用")
+        else:
+            self.stop_osc_server()
+            self.set_osc_paused(False)
+    @staticmethod
+    def format_osc_actions(actions):
+        """把事件动作配置转换为设置窗口中的文本"""
+        lines = []
+        for a in actions:
+            value = a.get("value")
+            value_text = "*" if value is None else str(value).lower() if isinstance(value, bool) else str(value)
+            line = f"{a['address']} {a['action']} {value_text}"
+            if a.get("text"):
+                line += f" {a['text']}"
+            lines.append(line)
+        return "\n".join(lines)
+    @staticmethod
+    def _parse_osc_value(text):
+        if text == "*":
+            return None
+        if text.lower() in ("true", "false"):
+            return text.lower() == "true"
+        for cast in (int, float):
+            try:
+                return cast(text)
+            except ValueError:
+                pass
+        return text
+    def update_osc_actions(self, widget):
+        """解析事件动作文本，并在接收服务运行时重新注册"""
+        actions = []
+        for line in widget.get("1.0", "end-1c").splitlines():
+            fields = line.strip().split(maxsplit=3)
+            if not fields:
+                continue
+            if len(fields) < 2 or fields[1] not in OSC_ACTIONS:
+                messagebox.showerror("错误", f"无效的事件动作: {line}")
+                return
+            actions.append({
+                "address": fields[0],
+                "action": fields[1],
+                "value": self._parse_osc_value(fields[2]) if len(fields) > 2 else None,
+                "text": fields[3] if len(fields) > 3 else "",
+            })
+        self.osc_actions = actions
+        if self.osc_server:
+            self.start_osc_server()
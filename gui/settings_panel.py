@@ -1,10 +1,22 @@
 """设置窗口GUI"""
 
+import re
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 
+from avatar_params import PARAM_SOURCES, ParameterMapping
 from netease_sync import launch_netease, netease_thread
+from osc_sender import check_output_template
+from playlist import PLAYLIST_MODES, PlaylistEntry
+from template_engine import TemplateError, compile_template
+from timed_messages import TIMED_KINDS, TimedMessage
+from word_filter import FILTER_SOURCES, format_rules, parse_rules
+
+from .osc_input import OSC_ACTIONS
+
+# 消息列表每行的分列符：花括号外的 |（模板过滤器中的 | 不分列）
+_PLAYLIST_FIELD_SEP = re.compile(r"\|(?![^{]*\})")
 
 
 class SettingsMixin:
@@ -52,6 +64,20 @@ class SettingsMixin:
             if option not in current_order:
                 order_listbox.insert(tk.END, option)
 
+        rotation_frame = ttk.LabelFrame(order_frame, text="附加项轮播")
+        rotation_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Checkbutton(
+            rotation_frame,
+            text="超出144字符时附加项轮流显示（消息内容始终保留）",
+            variable=self.segment_rotation
+        ).pack(anchor="w", pady=2)
+        ttk.Label(rotation_frame, text="每行一个: 附加项 权重 最短显示秒数，未列出的按 1 0 处理",
+                  foreground="gray").pack(anchor="w", pady=2)
+        segment_text = scrolledtext.ScrolledText(rotation_frame, height=3, font=('Arial', 10))
+        segment_text.pack(fill=tk.X, padx=5, pady=2)
+        segment_text.insert(tk.END, self.format_segment_settings(self.segment_settings))
+        segment_text.bind("<FocusOut>", lambda e: self.update_segment_settings(segment_text))
+
         move_up_btn = ttk.Button(order_frame, text="上移", command=lambda: self.move_item(order_listbox, -1))
         move_up_btn.pack(side=tk.LEFT, padx=5)
 
@@ -126,6 +152,13 @@ class SettingsMixin:
                                               validatecommand=(self.root.register(self._validate_digits), '%P'))
         music_artist_limit_spin.pack(side=tk.LEFT, padx=5)
 
+        ttk.Checkbutton(
+            limit_frame,
+            text="超出144字符时分页轮播发送（不再截断输入）",
+            variable=self.chatbox_paging,
+            command=self.update_char_count
+        ).pack(anchor="w", padx=10, pady=5)
+
         # 高级音乐信息设置标签页
         advanced_music_frame = ttk.Frame(notebook)
         notebook.add(advanced_music_frame, text="进阶音乐信息")
@@ -208,6 +241,17 @@ class SettingsMixin:
         self.empty_entry.pack(side=tk.LEFT, padx=5)
         self.empty_entry.bind("<FocusOut>", lambda e: self.update_ncm_config(self.empty_entry, "bar_empty"))
 
+        lead_frame = ttk.Frame(bar_frame)
+        lead_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(lead_frame, text="歌词提前量(毫秒):").pack(side=tk.LEFT)
+        self.lyric_lead_var = tk.StringVar(value=str(int(self.ncm_config.lyric_lead * 1000)))
+        lyric_lead_entry = ttk.Entry(lead_frame, textvariable=self.lyric_lead_var, width=6,
+                                     validate="key", validatecommand=(self.root.register(self._validate_digits), '%P'))
+        lyric_lead_entry.pack(side=tk.LEFT, padx=5)
+        lyric_lead_entry.bind("<FocusOut>", lambda e: self.update_ncm_config(lyric_lead_entry, "lyric_lead"))
+        ttk.Label(lead_frame, text="在歌词换行前提前发送，抵消网络与显示延迟",
+                  foreground="gray").pack(side=tk.LEFT)
+
         # 添加"当前播放"标签
         playing_frame = ttk.Frame(advanced_music_frame)
         playing_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -257,6 +301,89 @@ class SettingsMixin:
         port_spinbox.pack(side=tk.LEFT, padx=5)
         ttk.Label(port_frame, text="示例: 9000").pack(side=tk.LEFT)
 
+        keepalive_frame = ttk.Frame(send_frame)
+        keepalive_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(keepalive_frame, text="重复内容保活(秒):").pack(side=tk.LEFT)
+        ttk.Spinbox(
+            keepalive_frame,
+            from_=0,
+            to=300,
+            textvariable=self.chatbox_keepalive,
+            width=10,
+            validate="key",
+            validatecommand=(self.root.register(self._validate_digits), '%P')
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(keepalive_frame, text="(0 = 每次都发送)").pack(side=tk.LEFT)
+
+        rate_frame = ttk.Frame(send_frame)
+        rate_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(rate_frame, text="聊天框限流 突发条数:").pack(side=tk.LEFT)
+        rate_burst_spin = ttk.Spinbox(
+            rate_frame,
+            from_=1,
+            to=20,
+            textvariable=self.chatbox_rate_burst,
+            width=4,
+            command=self.update_chatbox_rate_limit,
+            validate="key",
+            validatecommand=(self.root.register(self._validate_digits), '%P')
+        )
+        rate_burst_spin.pack(side=tk.LEFT, padx=5)
+        rate_burst_spin.bind("<FocusOut>", lambda e: self.update_chatbox_rate_limit())
+        rate_burst_spin.bind("<Return>", lambda e: self.update_chatbox_rate_limit())
+        ttk.Label(rate_frame, text="恢复间隔(毫秒):").pack(side=tk.LEFT)
+        rate_interval_spin = ttk.Spinbox(
+            rate_frame,
+            from_=0,
+            to=10000,
+            increment=100,
+            textvariable=self.chatbox_rate_interval_ms,
+            width=6,
+            command=self.update_chatbox_rate_limit,
+            validate="key",
+            validatecommand=(self.root.register(self._validate_digits), '%P')
+        )
+        rate_interval_spin.pack(side=tk.LEFT, padx=5)
+        rate_interval_spin.bind("<FocusOut>", lambda e: self.update_chatbox_rate_limit())
+        rate_interval_spin.bind("<Return>", lambda e: self.update_chatbox_rate_limit())
+
+        ttk.Checkbutton(
+            send_frame,
+            text="内容变化时提前发送（时间、挂机、歌词、进度条到点即发；发送间隔作为最长周期）",
+            variable=self.change_driven_send
+        ).pack(anchor="w", padx=10, pady=5)
+
+        min_interval_frame = ttk.Frame(send_frame)
+        min_interval_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(min_interval_frame, text="最短发送间隔(毫秒):").pack(side=tk.LEFT)
+        ttk.Spinbox(
+            min_interval_frame,
+            from_=1000,
+            to=60000,
+            increment=100,
+            textvariable=self.min_send_interval_ms,
+            width=6,
+            validate="key",
+            validatecommand=(self.root.register(self._validate_digits), '%P')
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(min_interval_frame, text="(提前发送时两次发送之间至少间隔)").pack(side=tk.LEFT)
+
+        ttk.Checkbutton(
+            send_frame,
+            text="未运行 VRChat 时进入省电模式（放慢发送与轮询、暂停蓝牙扫描）",
+            variable=self.power_save_enabled,
+            command=self.check_vrchat_presence_now
+        ).pack(anchor="w", padx=10, pady=5)
+
+        targets_frame = ttk.LabelFrame(send_frame, text="额外发送目标")
+        targets_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(targets_frame, text="每行一个: IP:端口 [地址前缀...]，行首 # 表示禁用",
+                  foreground="gray").pack(anchor="w", pady=2)
+        targets_text = scrolledtext.ScrolledText(targets_frame, height=3, font=('Arial', 10))
+        targets_text.pack(fill=tk.X, padx=5, pady=2)
+        targets_text.insert(tk.END, self.format_osc_targets(self.osc_extra_targets))
+        targets_text.bind("<FocusOut>", lambda e: self.update_osc_targets(targets_text))
+
         save_config_btn = ttk.Button(send_frame, text="保存配置", command=self.save_config)
         save_config_btn.pack(pady=10)
 
@@ -285,6 +412,118 @@ class SettingsMixin:
         ).pack(side=tk.LEFT, padx=5)
         ttk.Label(delay_frame, text="(0 = 立即启动)").pack(side=tk.LEFT)
 
+        avatar_frame = ttk.Frame(notebook)
+        notebook.add(avatar_frame, text="Avatar参数")
+
+        ttk.Checkbutton(
+            avatar_frame,
+            text="启用 Avatar 参数输出",
+            variable=self.avatar_params_enabled,
+            command=self.toggle_avatar_params
+        ).pack(anchor="w", pady=5)
+        ttk.Label(avatar_frame, text="每行一个: 参数名 来源 类型(int/float/bool) 最小 最大 死区 最大频率(次/秒)\n"
+                                     "行首 # 表示禁用，float 会把 [最小, 最大] 归一化到 0-1",
+                  foreground="gray").pack(anchor="w", padx=10)
+        ttk.Label(avatar_frame, text="可用来源: " + ", ".join(f"{k}={v}" for k, v in PARAM_SOURCES.items()),
+                  foreground="gray", wraplength=400).pack(anchor="w", padx=10, pady=2)
+        params_text = scrolledtext.ScrolledText(avatar_frame, height=8, font=('Arial', 10))
+        params_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        params_text.insert(tk.END, self.format_avatar_params(self.avatar_param_mappings))
+        params_text.bind("<FocusOut>", lambda e: self.update_avatar_params(params_text))
+
+        listen_frame = ttk.Frame(notebook)
+        notebook.add(listen_frame, text="OSC接收")
+
+        ttk.Checkbutton(
+            listen_frame,
+            text="接收 VRChat 的 OSC 事件",
+            variable=self.osc_listen_enabled,
+            command=self.toggle_osc_server
+        ).pack(anchor="w", pady=5)
+        listen_port_frame = ttk.Frame(listen_frame)
+        listen_port_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(listen_port_frame, text="接收端口:").pack(side=tk.LEFT)
+        ttk.Spinbox(
+            listen_port_frame,
+            from_=1000,
+            to=65535,
+            textvariable=self.osc_listen_port,
+            width=10,
+            validate="key",
+            validatecommand=(self.root.register(self._validate_digits), '%P')
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(listen_port_frame, text="(默认: 9001，修改后重新勾选生效)").pack(side=tk.LEFT)
+        ttk.Checkbutton(
+            listen_frame,
+            text="启用 OSCQuery（自动发现 VRChat 端口，接收端口自动分配）",
+            variable=self.oscquery_enabled,
+            command=self.toggle_oscquery
+        ).pack(anchor="w", padx=10, pady=2)
+        ttk.Label(listen_frame, text="每行一个: OSC地址 动作 [匹配值，* 表示任意] [文本]\n地址以 * 结尾表示前缀匹配",
+                  foreground="gray").pack(anchor="w", padx=10)
+        ttk.Label(listen_frame, text="\n".join(f"{k}: {v}" for k, v in OSC_ACTIONS.items()),
+                  foreground="gray").pack(anchor="w", padx=10, pady=2)
+        actions_text = scrolledtext.ScrolledText(listen_frame, height=6, font=('Arial', 10))
+        actions_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        actions_text.insert(tk.END, self.format_osc_actions(self.osc_actions))
+        actions_text.bind("<FocusOut>", lambda e: self.update_osc_actions(actions_text))
+
+        timed_frame = ttk.Frame(notebook)
+        notebook.add(timed_frame, text="定时消息")
+
+        ttk.Label(timed_frame, text="定时消息设置:", font=("Arial", 10, "bold")).pack(pady=5)
+        ttk.Label(timed_frame, text="每行一条: 类型 时间 显示秒数 文本，行首 # 表示禁用",
+                  foreground="gray").pack(anchor="w", padx=10, pady=2)
+        for kind, desc in TIMED_KINDS.items():
+            ttk.Label(timed_frame, text=f"{kind}: {desc}", foreground="gray").pack(anchor="w", padx=20)
+        ttk.Label(timed_frame, text="示例: at 22:00 30 该睡觉啦 / every 15 30 记得喝水 / "
+                                    "countdown 2026-12-31T23:59 0 距离新年还有{remaining}",
+                  foreground="gray").pack(anchor="w", padx=10, pady=2)
+        timed_text = scrolledtext.ScrolledText(timed_frame, height=6, font=('Arial', 10))
+        timed_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        timed_text.insert(tk.END, self.format_timed_messages(self.timed_messages))
+        timed_text.bind("<FocusOut>", lambda e: self.update_timed_messages(timed_text))
+
+        playlist_frame = ttk.Frame(notebook)
+        notebook.add(playlist_frame, text="消息列表")
+
+        ttk.Checkbutton(
+            playlist_frame,
+            text="启用消息列表（代替输入框中的消息，每次定时发送切换一条）",
+            variable=self.playlist_enabled,
+            command=self.check_start_button_state
+        ).pack(anchor="w", padx=10, pady=5)
+        mode_frame = ttk.Frame(playlist_frame)
+        mode_frame.pack(fill=tk.X, padx=10, pady=2)
+        ttk.Label(mode_frame, text="轮换方式:").pack(side=tk.LEFT)
+        for mode, label in PLAYLIST_MODES.items():
+            ttk.Radiobutton(mode_frame, text=label, value=mode, variable=self.playlist_mode,
+                            command=self.apply_playlist).pack(side=tk.LEFT, padx=5)
+        ttk.Label(playlist_frame, text="每行一条: 消息 | 权重 | 模板 | 附加项1,附加项2（后三项可省略，留空沿用全局设置）",
+                  foreground="gray").pack(anchor="w", padx=10, pady=2)
+        playlist_text = scrolledtext.ScrolledText(playlist_frame, height=8, font=('Arial', 10))
+        playlist_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        playlist_text.insert(tk.END, self.format_playlist(self.playlist_entries))
+        playlist_text.bind("<FocusOut>", lambda e: self.update_playlist(playlist_text))
+
+        filter_frame = ttk.Frame(notebook)
+        notebook.add(filter_frame, text="屏蔽词")
+
+        ttk.Label(filter_frame, text="对以下内容启用屏蔽词:", font=("Arial", 10, "bold")).pack(anchor="w", padx=10, pady=5)
+        sources_frame = ttk.Frame(filter_frame)
+        sources_frame.pack(fill=tk.X, padx=10)
+        for source, label in FILTER_SOURCES.items():
+            var = tk.BooleanVar(value=source in self.word_filter_sources)
+            ttk.Checkbutton(sources_frame, text=label, variable=var,
+                            command=lambda s=source, v=var: self.toggle_word_filter_source(s, v.get())
+                            ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text="每行一条: 词（替换为 *）或 词 => 替换文本，# 开头为注释，英文不区分大小写",
+                  foreground="gray").pack(anchor="w", padx=10, pady=2)
+        filter_text = scrolledtext.ScrolledText(filter_frame, height=8, font=('Arial', 10))
+        filter_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        filter_text.insert(tk.END, format_rules(self.word_filter_rules))
+        filter_text.bind("<FocusOut>", lambda e: self.update_word_filter(filter_text))
+
         advanced_frame = ttk.Frame(notebook)
         notebook.add(advanced_frame, text="(高级)发送顺序")
 
@@ -316,6 +555,9 @@ class SettingsMixin:
             command=self.save_template_string
         )
         save_template_btn.pack(pady=5)
+        ttk.Label(advanced_frame, text="{#变量}...{/变量} 变量非空时才显示中间内容；{变量:>3} 格式说明；"
+                                       "{变量|upper|truncate(10)|default(无)} 过滤器",
+                  foreground="gray", wraplength=520).pack(anchor="w", padx=10)
 
         # 附加项快捷按钮区域
         quick_buttons_frame = ttk.LabelFrame(advanced_frame, text="快速插入附加项")
@@ -330,6 +572,10 @@ class SettingsMixin:
             ("音乐信息", "{music}"),
             ("硬件监测", "{hardware}"),
             ("心率", "{heart_rate}"),
+            ("定时消息", "{scheduled}"),
+            ("CPU 数值", "{cpu:.0f}"),
+            ("心率数值", "{hr:>3}"),
+            ("音乐区段", "{#music}❀{music}{/music}"),
             ("换行", "\\n")
         ]
 
@@ -358,6 +604,10 @@ class SettingsMixin:
         """定时更新当前播放信息"""
         if settings_window and not settings_window.winfo_exists():  # 检查窗口是否存在
             return
+        if settings_window and not settings_window.winfo_viewable():
+            # 设置窗口最小化或随主窗口隐藏时不刷新，恢复后下一秒补刷
+            self.root.after(1000, lambda: self.update_current_playing_info(settings_window))
+            return
         if self.ncm_sync_running:
             with self.ncm_shared_state.lock:
                 state = self.ncm_shared_state.data
@@ -382,6 +632,199 @@ class SettingsMixin:
     def close_settings_window(self, settings_window):
         """关闭设置窗口并停止更新播放信息"""
         settings_window.destroy()
+    @staticmethod
+    def format_osc_targets(targets):
+        """把目标配置列表转换为设置窗口中的文本"""
+        lines = []
+        for t in targets:
+            line = f"{t.get('ip', '127.0.0.1')}:{t.get('port', 9000)}"
+            if t.get('filter'):
+                line += " " + " ".join(t['filter'])
+            lines.append(line if t.get('enabled', True) else "#" + line)
+        return "\n".join(lines)
+    def update_osc_targets(self, widget):
+        """解析额外目标文本并立即应用到发送线程"""
+        targets = []
+        for line in widget.get("1.0", "end-1c").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            enabled = not line.startswith("#")
+            fields = line.lstrip("#").split()
+            if not fields:
+                continue
+            host, _, port = fields[0].rpartition(":")
+            if not host or not port.isdigit():
+                messagebox.showerror("错误", f"无效的目标地址: {fields[0]}")
+                return
+            targets.append({"ip": host, "port": int(port), "enabled": enabled, "filter": fields[1:]})
+        self.osc_extra_targets = targets
+        self.osc_transport.set_extra_targets(targets)
+    @staticmethod
+    def format_segment_settings(settings):
+        """把附加项轮播配置转换为设置窗口中的文本"""
+        return "\n".join(f"{name} {s.get('weight', 1)} {s.get('min_display', 0)}" for name, s in settings.items())
+    def update_segment_settings(self, widget):
+        """解析附加项轮播文本并立即应用"""
+        settings = {}
+        for line in widget.get("1.0", "end-1c").splitlines():
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] not in self.order_options or fields[0] == "消息内容":
+                messagebox.showerror("错误", f"无效的附加项: {fields[0]}")
+                return
+            try:
+                weight = float(fields[1]) if len(fields) > 1 else 1.0
+                min_display = float(fields[2]) if len(fields) > 2 else 0.0
+            except ValueError:
+                messagebox.showerror("错误", f"无效的轮播设置: {line}")
+                return
+            settings[fields[0]] = {"weight": weight, "min_display": min_display}
+        self.segment_settings = settings
+        self.apply_segment_settings()
+    def apply_segment_settings(self):
+        for name in self.order_options:
+            s = self.segment_settings.get(name, {})
+            self.segment_rotator.configure(name, s.get('weight', 1.0), s.get('min_display', 0.0))
+    @staticmethod
+    def format_playlist(entries):
+        """把消息列表配置转换为设置窗口中的文本"""
+        lines = []
+        for e in entries:
+            weight = e.get('weight', 1)
+            fields = [e.get('text', ''), "" if weight == 1 else f"{weight:g}", e.get('template', ''),
+                      ",".join(e.get('items') or [])]
+            # 省略末尾沿用默认值的字段
+            while len(fields) > 1 and not fields[-1]:
+                fields.pop()
+            lines.append(" | ".join(fields))
+        return "\n".join(lines)
+    def update_playlist(self, widget):
+        """解析消息列表文本并立即应用"""
+        entries = []
+        for line in widget.get("1.0", "end-1c").splitlines():
+            if not line.strip():
+                continue
+            # 模板中的过滤器也用 |，只按花括号外的 | 分列
+            fields = [f.strip() for f in _PLAYLIST_FIELD_SEP.split(line)]
+            try:
+                weight = float(fields[1]) if len(fields) > 1 and fields[1] else 1.0
+            except ValueError:
+                messagebox.showerror("错误", f"无效的权重: {line}")
+                return
+            template = fields[2] if len(fields) > 2 and fields[2] else None
+            if template:
+                try:
+                    compile_template(template)
+                except TemplateError as e:
+                    messagebox.showerror("模板错误", f"{line}\n{e}")
+                    return
+            items = None
+            if len(fields) > 3 and fields[3]:
+                items = [i.strip() for i in fields[3].split(",") if i.strip()]
+                unknown = [i for i in items if i not in self.order_options]
+                if unknown:
+                    messagebox.showerror("错误", f"未知的附加项: {', '.join(unknown)}")
+                    return
+            entries.append(PlaylistEntry(fields[0], weight, template, items).to_dict())
+        self.playlist_entries = entries
+        self.apply_playlist()
+        self.check_start_button_state()
+    def apply_playlist(self):
+        try:
+            self.message_playlist.set_entries(self.playlist_entries, self.playlist_mode.get())
+        except (KeyError, ValueError) as e:
+            print(f"消息列表配置无效: {e}")
+            self.message_playlist.set_entries([], "sequential")
+    def update_word_filter(self, widget):
+        """解析屏蔽词文本并重建匹配自动机"""
+        self.word_filter_rules = parse_rules(widget.get("1.0", "end-1c"))
+        self.apply_word_filter()
+    def toggle_word_filter_source(self, source, enabled):
+        sources = [s for s in self.word_filter_sources if s != source]
+        if enabled:
+            sources.append(source)
+        self.word_filter_sources = sources
+        self.apply_word_filter()
+    def apply_word_filter(self):
+        self.word_filter.sources = set(self.word_filter_sources)
+        self.word_filter.set_rules(self.word_filter_rules)
+    @staticmethod
+    def format_timed_messages(messages):
+        """把定时消息配置转换为设置窗口中的文本"""
+        lines = []
+        for m in messages:
+            duration = m.get('duration', 30)
+            line = f"{m['kind']} {m['when']} {int(duration) if duration == int(duration) else duration} {m.get('text', '')}"
+            lines.append(line if m.get('enabled', True) else "#" + line)
+        return "\n".join(lines)
+    def update_timed_messages(self, widget):
+        """解析定时消息文本并立即重建定时堆"""
+        messages = []
+        for line in widget.get("1.0", "end-1c").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            enabled = not line.startswith("#")
+            fields = line.lstrip("#").split(maxsplit=3)
+            try:
+                if len(fields) < 3:
+                    raise ValueError(line)
+                messages.append(TimedMessage(fields[0], fields[1], fields[3] if len(fields) > 3 else "",
+                                             float(fields[2]), enabled).to_dict())
+            except ValueError:
+                messagebox.showerror("错误", f"无效的定时消息: {line}")
+                return
+        self.timed_messages = messages
+        self.apply_timed_messages()
+    def apply_timed_messages(self):
+        try:
+            self.timed_scheduler.set_messages(self.timed_messages)
+        except (KeyError, ValueError) as e:
+            print(f"定时消息配置无效: {e}")
+            self.timed_scheduler.set_messages([])
+    @staticmethod
+    def format_avatar_params(mappings):
+        """把参数映射配置转换为设置窗口中的文本"""
+        lines = []
+        for m in mappings:
+            line = (f"{m['name']} {m['source']} {m.get('type', 'float')} {m.get('min', 0)} {m.get('max', 1)} "
+                    f"{m.get('deadband', 0)} {m.get('max_rate', 5)}")
+            lines.append(line if m.get('enabled', True) else "#" + line)
+        return "\n".join(lines)
+    def update_avatar_params(self, widget):
+        """解析参数映射文本并立即应用"""
+        mappings = []
+        for line in widget.get("1.0", "end-1c").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            fields = line.lstrip("#").split()
+            try:
+                if len(fields) < 2 or fields[1] not in PARAM_SOURCES:
+                    raise ValueError(f"未知来源: {fields[1] if len(fields) > 1 else ''}")
+                kind = fields[2] if len(fields) > 2 else "float"
+                if kind not in ("int", "float", "bool"):
+                    raise ValueError(f"未知类型: {kind}")
+                numbers = [float(x) for x in fields[3:7]]
+            except ValueError as e:
+                messagebox.showerror("错误", f"无效的参数映射: {line}\n{e}")
+                return
+            defaults = [0.0, 1.0, 0.0, 5.0]
+            numbers += defaults[len(numbers):]
+            mappings.append(ParameterMapping(fields[0], fields[1], kind, *numbers,
+                                             enabled=not line.startswith("#")).to_dict())
+        self.avatar_param_mappings = mappings
+        self.avatar_param_sink.set_mappings(mappings)
+    def toggle_avatar_params(self):
+        """切换 Avatar 参数输出"""
+        if self.avatar_params_enabled.get():
+            if not self.avatar_param_sink.start(self.collect_avatar_param_values):
+                self.avatar_params_enabled.set(False)
+                messagebox.showwarning("Avatar 参数", "上一次的参数线程仍在退出，请稍后再开启")
+        else:
+            self.avatar_param_sink.stop()
     def update_ncm_config(self, widget, field):
         """更新网易云配置"""
         try:
@@ -393,13 +836,23 @@ class SettingsMixin:
                 self.ncm_config.bar_thumb = widget.get()
             elif field == "bar_empty":
                 self.ncm_config.bar_empty = widget.get()
+            elif field == "lyric_lead":
+                self.ncm_config.lyric_lead = int(widget.get()) / 1000
             elif field == "template":
-                self.ncm_config.template = widget.get("1.0", "end-1c")
+                template = widget.get("1.0", "end-1c")
+                try:
+                    check_output_template(template)
+                except ValueError as e:
+                    messagebox.showerror("模板错误", str(e))
+                    return
+                self.ncm_config.template = template
                 # 立即应用模板变化
                 self.update_status()
         except ValueError:
             if field == "bar_width":
                 messagebox.showerror("错误", "进度条宽度必须是数字")
+            elif field == "lyric_lead":
+                messagebox.showerror("错误", "歌词提前量必须是数字")
     def launch_netease(self):
         """启动网易云音乐"""
         path = self.ncm_path.get() if self.ncm_path.get() else None
@@ -500,6 +953,11 @@ class SettingsMixin:
             self.disabled_sorting_label = None
     def save_template_string(self):
         template = self.template_text.get("1.0", "end-1c")
+        try:
+            compile_template(template)
+        except TemplateError as e:
+            messagebox.showerror("模板错误", str(e))
+            return
         self.template_string.set(template)
         self.save_config()
         messagebox.showinfo("提示", "模板字符串已保存!")
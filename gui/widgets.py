@@ -345,7 +345,11 @@ class WidgetsMixin:
             ("heart_rate", "手环/心率:"),
             ("cpu_usage", "CPU 使用率:"),
             ("ram_usage", "RAM 使用率:"),
-            ("gpu_usage", "GPU 使用率:")
+            ("gpu_usage", "GPU 使用率:"),
+            ("osc_stats", "OSC 发送:"),
+            ("frame_timing", "数据采集:"),
+            ("lyric_align", "歌词对齐:"),
+            ("power_mode", "运行模式:")
         ]
 
         for i, (key, text) in enumerate(debug_items):
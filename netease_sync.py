@@ -321,7 +321,8 @@ def netease_thread(
                             daemon=True,
                         ).start()
 
-                await asyncio.sleep(0.3)
+                # 轮询间隔可在运行中调整（省电模式下放慢）
+                await asyncio.sleep(cfg.poll_interval)
             except websockets.exceptions.ConnectionClosed:
                 await asyncio.sleep(1)
                 try:
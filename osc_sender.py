@@ -1,12 +1,22 @@
 """OSC 发送线程与消息格式化逻辑。"""
 
+import bisect
+import string
 import threading
 import time
 
-from pythonosc import udp_client
-
+from chatbox import ChatboxArbiter, ChatboxRateLimiter, ChatboxSendFilter
 from config import Config, SharedState
 from netease_sync import CallbackProtocol
+from osc_transport import CHATBOX_INPUT, OscTransport
+from text_layout import truncate_graphemes
+from word_filter import WordFilter
+
+# 网易云歌词在聊天框仲裁中的来源名与优先级（低于界面手动消息）
+NETEASE_PRODUCER = "netease"
+NETEASE_PRIORITY = 0
+# 没有歌词行即将切换时的状态轮询间隔（秒）
+POLL_INTERVAL = 0.3
 
 
 def get_lyric(lyrics, pos):
@@ -25,65 +35,294 @@ def get_lyric(lyrics, pos):
     return lyrics[idx][1], lyrics[idx + 1][1] if idx + 1 < len(lyrics) else ""
 
 
-def format_output(cfg: Config, state, lyrics, song_key, title_limit=20, artist_limit=25):
-    # 统一拼装最终发给 VRChat 的文本。
-    c, d, w = state.cur, state.dur, cfg.bar_width
-    pos = int(w * c / d) if d else 0
-    thumb = cfg.bar_thumb
-    if thumb:
-        bar = cfg.bar_filled * pos + thumb + cfg.bar_empty * (w - pos)
-    else:
-        bar = cfg.bar_filled * pos + cfg.bar_empty * (w - pos)
+def next_lyric_time(lyrics, pos):
+    """返回 pos 之后下一行歌词的开始时间，没有下一行时返回 None。"""
+    idx = bisect.bisect_right(lyrics, pos, key=lambda line: line[0])
+    return lyrics[idx][0] if idx < len(lyrics) else None
+
+
+def next_output_change(cfg: Config, state, lyrics, pos=None):
+    """估算 format_output 的显示内容距离下一次变化的秒数；暂停或无法预测时返回 None。
+
+    pos 为外推后的播放位置（秒，可带小数），缺省使用 state.cur。
+    """
+    if not (state.play and state.song):
+        return None
+    pos = state.cur if pos is None else pos
+    template = cfg.template
+    delays = []
+    if "{time}" in template:
+        # 播放时间按整秒显示
+        delays.append(1 - pos % 1)
+    if "{bar}" in template and state.dur and cfg.bar_width:
+        step = int(cfg.bar_width * pos / state.dur)
+        boundary = (step + 1) * state.dur / cfg.bar_width
+        if boundary <= state.dur:
+            delays.append(boundary - pos)
+    if lyrics and not state.lyric1 and ("{lyric1}" in template or "{lyric2}" in template):
+        t = next_lyric_time(lyrics, pos)
+        if t is not None:
+            delays.append(t - pos)
+    return max(0.0, min(delays)) if delays else None
 
-    l1, l2 = state.lyric1, state.lyric2
-    if not l1 and lyrics and song_key == f"{state.song}-{state.artist}":
-        l1, l2 = get_lyric(lyrics, c)
-    l1, l2 = l1 or "纯音乐，请欣赏", l2 or ""
 
-    limited_song = state.song[:title_limit]
-    limited_artist = state.artist[:artist_limit]
+# format_output 模板可用的字段，顺序即渲染时取值的下标
+_OUTPUT_FIELDS = ("song", "artist", "bar", "time", "lyric1", "lyric2")
+# 模板格式错误时使用的兜底格式
+_FALLBACK = object()
 
+
+def _compile_output_template(template):
+    # 把字段名换成位置下标，得到只需一次 str.format(*values) 的格式串；含未知字段或下标/属性访问时
+    # 返回 None，由 str.format(**kwargs) 逐次处理；模板本身格式错误时返回 _FALLBACK。
     try:
-        return cfg.template.format(
-            song=limited_song,
-            artist=limited_artist,
-            bar=bar,
-            time=f"{c // 60}:{c % 60:02d}/{d // 60}:{d % 60:02d}",
-            lyric1=l1,
-            lyric2=l2,
-        )
-    except Exception:
-        return f"🎵 {limited_song} - {limited_artist}\n{bar}\n{l1}"
+        parsed = list(string.Formatter().parse(template))
+    except ValueError:
+        return _FALLBACK
+    out = []
+    for literal, field, spec, conversion in parsed:
+        out.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if field not in _OUTPUT_FIELDS or "{" in (spec or ""):
+            return None
+        out.append("{%d%s%s}" % (_OUTPUT_FIELDS.index(field), f"!{conversion}" if conversion else "",
+                                 f":{spec}" if spec else ""))
+    return "".join(out)
+
+
+def check_output_template(template):
+    """编辑时校验网易云输出模板，有问题时抛出 ValueError（说明原因），而不是发送时静默退回默认格式。"""
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise ValueError(f"模板格式错误: {e}") from None
+    for _, field, spec, _ in parsed:
+        if field is None:
+            continue
+        base = field.split(".")[0].split("[")[0]
+        if base not in _OUTPUT_FIELDS:
+            raise ValueError(f"未知字段 {{{field}}}，可用字段: {', '.join(_OUTPUT_FIELDS)}")
+        if spec:
+            try:
+                format("示例", spec)
+            except ValueError as e:
+                raise ValueError(f"{{{field}}} 的格式说明 '{spec}' 无效: {e}") from None
+
+
+class OutputFormatter:
+    """预编译的网易云聊天框输出：模板格式串、全部进度条帧和每首歌的字符串。
+
+    模板和进度条设置变化时才重新编译；切歌时才重新截断歌名并生成整首歌的时间字符串。
+    每次 format 只做 播放位置 → 进度条帧/时间字符串 的查表和一次按位置格式化。编译结果整体替换，可在多个线程间共用。
+    """
+
+    def __init__(self):
+        self._compiled = (None, (), None)
+        self._song = (None, "", "", "", ())
+
+    def _plan(self, cfg):
+        key = (cfg.template, cfg.bar_width, cfg.bar_filled, cfg.bar_thumb, cfg.bar_empty)
+        compiled = self._compiled
+        if compiled[0] != key:
+            w = max(0, cfg.bar_width)
+            thumb = cfg.bar_thumb
+            bars = tuple(cfg.bar_filled * p + thumb + cfg.bar_empty * (w - p) for p in range(w + 1))
+            compiled = self._compiled = (key, bars, _compile_output_template(cfg.template))
+        return compiled
+
+    def _song_strings(self, state, title_limit, artist_limit, word_filter=None):
+        music_filter = word_filter if word_filter is not None and word_filter.enabled("music") else None
+        key = (state.song, state.artist, state.dur, title_limit, artist_limit,
+               music_filter.version if music_filter else None)
+        cached = self._song
+        if cached[0] != key:
+            d = state.dur
+            duration = f"/{d // 60}:{d % 60:02d}"
+            song, artist = state.song, state.artist
+            if music_filter:
+                # 先过滤完整的歌名再截断，屏蔽词不会因为被截断而漏掉
+                song, artist = music_filter.filter(song), music_filter.filter(artist)
+            cached = self._song = (
+                key,
+                # 按字素截断，不会拆开表情序列或组合符号
+                truncate_graphemes(song, title_limit, ""),
+                truncate_graphemes(artist, artist_limit, ""),
+                f"{state.song}-{state.artist}",
+                tuple(f"{c // 60}:{c % 60:02d}{duration}" for c in range(int(d) + 1)),
+            )
+        return cached
+
+    def format(self, cfg: Config, state, lyrics, song_key, title_limit=20, artist_limit=25, lyric_pos=None,
+               word_filter=None):
+        _, bars, plan = self._plan(cfg)
+        _, song, artist, own_key, times = self._song_strings(state, title_limit, artist_limit, word_filter)
+        c, d, w = state.cur, state.dur, len(bars) - 1
+        bar = bars[min(max(int(w * c / d), 0), w)] if d else bars[0]
+        if c.__class__ is int and 0 <= c < len(times):
+            time_str = times[c]
+        else:
+            time_str = f"{c // 60}:{c % 60:02d}/{d // 60}:{d % 60:02d}"
+
+        l1, l2 = state.lyric1, state.lyric2
+        if not l1 and lyrics and song_key == own_key:
+            l1, l2 = get_lyric(lyrics, c if lyric_pos is None else lyric_pos)
+        if word_filter is not None and word_filter.enabled("lyrics"):
+            l1, l2 = word_filter.filter(l1), word_filter.filter(l2)
+        l1, l2 = l1 or "纯音乐，请欣赏", l2 or ""
+
+        values = (song, artist, bar, time_str, l1, l2)
+        if plan is None:
+            try:
+                return cfg.template.format(**dict(zip(_OUTPUT_FIELDS, values)))
+            except Exception:
+                pass
+        elif plan is not _FALLBACK:
+            try:
+                return plan.format(*values)
+            except (ValueError, TypeError):
+                pass
+        return f"🎵 {song} - {artist}\n{bar}\n{l1}"
+
+
+_FORMATTER = OutputFormatter()
+
+
+def format_output(cfg: Config, state, lyrics, song_key, title_limit=20, artist_limit=25, lyric_pos=None,
+                  word_filter=None):
+    # 统一拼装最终发给 VRChat 的文本；lyric_pos 为查歌词用的位置（可含提前量），缺省用 state.cur。
+    # word_filter 按字段过滤：歌名/歌手用"音乐信息"开关，歌词用"歌词"开关，模板中的固定文字不过滤。
+    return _FORMATTER.format(cfg, state, lyrics, song_key, title_limit, artist_limit, lyric_pos, word_filter)
+
+
+class LyricAligner:
+    """外推播放位置，让聊天框发送对齐到歌词行切换的时刻。
+
+    网页只提供整秒的播放位置，这里以"观察到秒数跳变的时刻"为锚点外推出小数位置；
+    lead 为提前发送的秒数，用来抵消网络和 VRChat 显示的延迟。
+    """
+
+    def __init__(self, lead=0.3):
+        self.lead = lead
+        self._anchor = None
+        self._line = None
+        self.lines = 0
+        self.error_total = 0.0
+        self.error_max = 0.0
+
+    def position(self, state, last_update, now=None):
+        """返回外推后的播放位置（秒，带小数）。"""
+        now = time.time() if now is None else now
+        if self._anchor is None or self._anchor[0] != (state.song, state.cur):
+            # 秒数跳变（或换歌、拖动进度）时重新取锚点
+            self._anchor = ((state.song, state.cur), last_update or now)
+        pos = state.cur + max(0.0, now - self._anchor[1])
+        return min(pos, state.dur) if state.dur else pos
+
+    @staticmethod
+    def timed(state, lyrics, song_key):
+        """当前歌曲是否有可用的时间轴歌词（网页自带歌词行时以网页为准）。"""
+        return bool(lyrics) and not state.lyric1 and song_key == f"{state.song}-{state.artist}"
+
+    def line_index(self, lyrics, pos):
+        return bisect.bisect_right(lyrics, pos + self.lead, key=lambda line: line[0]) - 1
+
+    def line_changed(self, lyrics, pos):
+        """提前 lead 秒后所在的歌词行与上次发送时不同则返回 True，并记录对齐误差。
+
+        只有顺序进入下一行时才计入误差；首次取行、拖动进度或换歌不算。
+        """
+        idx = self.line_index(lyrics, pos)
+        if idx == self._line:
+            return False
+        advanced = self._line is not None and idx == self._line + 1
+        self._line = idx
+        if advanced:
+            # 误差 = 发送时刻（已加提前量）相对歌词行真实开始时间的偏差，正数表示偏晚
+            error = abs(pos + self.lead - lyrics[idx][0])
+            self.lines += 1
+            self.error_total += error
+            self.error_max = max(self.error_max, error)
+        return True
+
+    def until_next_line(self, lyrics, pos):
+        """距离下一行需要发送的时刻（已减去 lead）还有多少秒；没有下一行时返回 None。"""
+        t = next_lyric_time(lyrics, pos + self.lead)
+        return None if t is None else max(0.0, t - self.lead - pos)
+
+    def reset(self):
+        self._anchor = None
+        self._line = None
+
+    def stats(self):
+        return {
+            "lines": self.lines,
+            "avg_error_ms": self.error_total / self.lines * 1000 if self.lines else 0.0,
+            "max_error_ms": self.error_max * 1000,
+        }
 
 
 def osc_thread(
-    cfg: Config, shared: SharedState, stop_event: threading.Event, cb: CallbackProtocol
+    cfg: Config,
+    shared: SharedState,
+    stop_event: threading.Event,
+    cb: CallbackProtocol,
+    arbiter: ChatboxArbiter | None = None,
+    aligner: LyricAligner | None = None,
+    word_filter: WordFilter | None = None,
 ):
-    # 后台轮询共享状态，并按节流间隔发送 OSC。
-    osc = None
+    # 独立运行网易云歌词发送的入口（不经过 GUI）：GUI 只启动 netease_thread 同步状态，
+    # 歌词由 MessageMixin.get_formatted_music_info 拼进自己的消息，不会调用本函数。
+    # 后台轮询共享状态，把文本作为 "netease" 来源交给聊天框仲裁器：
+    # 有时间轴歌词时在每行开始前 lead 秒发送，其余内容按 refresh_interval 周期刷新。
+    # 不传 arbiter 时自建传输线程、限流器和仲裁器，传入时与调用方共用同一个聊天框出口。
+    own_transport = arbiter is None
+    if own_transport:
+        transport = OscTransport(cfg.osc_ip, cfg.osc_port)
+        transport.set_rate_limiter(
+            CHATBOX_INPUT, ChatboxRateLimiter(cfg.chatbox_burst, cfg.chatbox_refill_interval)
+        )
+        transport.start()
+        arbiter = ChatboxArbiter(transport, send_filter=ChatboxSendFilter(keepalive=cfg.chatbox_keepalive))
+    arbiter.register(NETEASE_PRODUCER, NETEASE_PRIORITY, notify=False)
+    aligner = aligner or LyricAligner(cfg.lyric_lead)
     last_osc = 0
     while not stop_event.is_set():
+        if own_transport:
+            # 配置中的地址可随时修改，仲裁器热更新目标
+            arbiter.set_target(cfg.osc_ip, cfg.osc_port)
+        aligner.lead = cfg.lyric_lead
         with shared.lock:
             state = shared.data.copy()
             lyrics = list(shared.lyrics)
             song_key = shared.song_key
             last_update = shared.last_update
 
-        if state.play and state.song and last_update > 0:
-            elapsed = time.time() - last_update
-            state.cur = min(int(state.cur + elapsed), state.dur) if state.dur else state.cur
-
+        wait = POLL_INTERVAL
         if state.play and state.song:
-            out = format_output(cfg, state, lyrics, song_key)
+            pos = aligner.position(state, last_update)
+            state.cur = int(pos)
+            timed = aligner.timed(state, lyrics, song_key)
+            line_changed = timed and aligner.line_changed(lyrics, pos)
             now = time.time()
-            if now - last_osc >= cfg.refresh_interval:
-                if osc is None:
-                    osc = udp_client.SimpleUDPClient(cfg.osc_ip, cfg.osc_port)
-                osc.send_message("/chatbox/input", [out, True, False])
+            if line_changed or now - last_osc >= cfg.refresh_interval:
+                lyric_pos = pos + aligner.lead if timed else None
+                out = format_output(cfg, state, lyrics, song_key, lyric_pos=lyric_pos, word_filter=word_filter)
+                # 内容没变时由仲裁器只在保活时间到期前补发一次，避免刷屏。
+                arbiter.submit(NETEASE_PRODUCER, out)
                 last_osc = now
                 cb.cb_output(out)
                 cb.cb_song(f"播放：{state.song} - {state.artist}")
+            if timed:
+                until = aligner.until_next_line(lyrics, pos)
+                if until is not None:
+                    wait = min(wait, until)
         else:
+            aligner.reset()
+            arbiter.release(NETEASE_PRODUCER)
             if state.song:
                 cb.cb_song(f"暂停：{state.song}")
-        time.sleep(0.3)
+        stop_event.wait(wait)
+    arbiter.release(NETEASE_PRODUCER)
+    if own_transport:
+        arbiter.transport.stop()
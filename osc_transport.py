@@ -0,0 +1,522 @@
+"""OSC 底层传输：聊天框与 Avatar 参数报文编码、UDP 收发。"""
+
+import math
+import select
+import socket
+import struct
+import threading
+import time
+
+CHATBOX_INPUT = "/chatbox/input"
+
+
+def _osc_pad(n):
+    # OSC 字符串以 \0 结尾并补齐到 4 字节边界。
+    return (n + 4) & ~3
+
+
+def _osc_string(s):
+    data = s.encode("utf-8")
+    return data + b"\0" * (_osc_pad(len(data)) - len(data))
+
+
+class ChatboxEncoder:
+    """单字符串 OSC 消息（如 /chatbox/input）的预分配编码器。"""
+
+    def __init__(self, address=CHATBOX_INPUT, immediate=True, notify=None, capacity=1024):
+        # 地址与类型标签只在构造时编码一次，之后每次只写入文本部分。
+        tags = ",s" + ("T" if immediate else "F")
+        if notify is not None:
+            tags += "T" if notify else "F"
+        self.header = _osc_string(address) + _osc_string(tags)
+        self._offset = len(self.header)
+        self._buf = bytearray(self._offset + capacity)
+        self._buf[: self._offset] = self.header
+        self._view = memoryview(self._buf)
+
+    def encode(self, text):
+        """把文本写入复用缓冲区，返回指向完整报文的 memoryview（下次 encode 前有效）。"""
+        data = text.encode("utf-8")
+        padded = _osc_pad(len(data))
+        end = self._offset + padded
+        if end > len(self._buf):
+            self._grow(end)
+        # "Ns" 格式会自动用 \0 填满剩余字节，正好完成 OSC 字符串补齐。
+        struct.pack_into(f"{padded}s", self._buf, self._offset, data)
+        return self._view[:end]
+
+    def _grow(self, size):
+        # 超长文本极少出现，按两倍扩容后重建视图。
+        self._view.release()
+        new_buf = bytearray(max(size, len(self._buf) * 2))
+        new_buf[: self._offset] = self.header
+        self._buf = new_buf
+        self._view = memoryview(self._buf)
+
+
+class ValueEncoder:
+    """单个 int/float/bool OSC 消息（如 /avatar/parameters/<name>）的编码器。"""
+
+    _INT_TAG = _osc_string(",i")
+    _FLOAT_TAG = _osc_string(",f")
+    _TRUE = _osc_string(",T")
+    _FALSE = _osc_string(",F")
+    # OSC 的 i 为 32 位有符号整数，f 为 32 位浮点数
+    INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+    FLOAT_MAX = 3.4028234663852886e38
+
+    def __init__(self, address):
+        self._address = _osc_string(address)
+
+    @classmethod
+    def validate(cls, value):
+        """检查值能否编码为 OSC 的 bool/int32/float32，不能时抛出 TypeError 或 ValueError。"""
+        if isinstance(value, bool):
+            return
+        if isinstance(value, int):
+            if not cls.INT_RANGE[0] <= value <= cls.INT_RANGE[1]:
+                raise ValueError(f"整数 {value} 超出 OSC int32 范围")
+            return
+        if isinstance(value, float):
+            if math.isfinite(value) and abs(value) > cls.FLOAT_MAX:
+                raise ValueError(f"浮点数 {value} 超出 OSC float32 范围")
+            return
+        raise TypeError(f"OSC 参数只支持 bool/int/float，收到 {type(value).__name__}")
+
+    def encode(self, value):
+        # bool 是 int 的子类，必须先判断。
+        if isinstance(value, bool):
+            return self._address + (self._TRUE if value else self._FALSE)
+        if isinstance(value, int):
+            return self._address + self._INT_TAG + struct.pack(">i", value)
+        return self._address + self._FLOAT_TAG + struct.pack(">f", value)
+
+
+class OscTarget:
+    """一个 OSC 发送目标，各自有启用开关、地址过滤和错误计数。"""
+
+    # 解析失败后的重试间隔，避免不可达的主机名反复发起解析。
+    RESOLVE_RETRY = 10.0
+
+    def __init__(self, ip, port, enabled=True, address_filter=()):
+        self.ip = ip
+        self.port = port
+        self.enabled = enabled
+        # 地址前缀过滤，空表示接收全部地址。
+        self.address_filter = tuple(address_filter)
+        self.addr = None
+        self._resolve_after = 0.0
+        self._resolving = False
+        self._lock = threading.Lock()
+        # 解析结束（无论成败）时调用，OscTransport 借此唤醒等待中的 I/O 线程
+        self.on_resolved = None
+        self.sent = 0
+        self.errors = 0
+        # 创建目标时（在调用方线程）就开始解析，第一条消息发出前通常已经完成
+        self._start_lookup()
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d.get("ip", "127.0.0.1"),
+            int(d.get("port", 9000)),
+            d.get("enabled", True),
+            d.get("filter", ()),
+        )
+
+    def to_dict(self):
+        return {
+            "ip": self.ip,
+            "port": self.port,
+            "enabled": self.enabled,
+            "filter": list(self.address_filter),
+        }
+
+    def accepts(self, address):
+        if not self.enabled:
+            return False
+        return not self.address_filter or address.startswith(self.address_filter)
+
+    def resolve(self):
+        """返回可直接 sendto 的地址；尚未解析完成或解析失败时返回 None，从不阻塞调用线程。"""
+        if self.addr is None:
+            self._start_lookup()
+        return self.addr
+
+    @property
+    def resolving(self):
+        """主机名正在解析中；此时发往该目标的报文应留在槽位里等待，而不是丢弃。"""
+        return self._resolving
+
+    def _start_lookup(self):
+        # 数字 IP 直接使用；主机名交给单独的解析线程，I/O 线程只读取已完成的结果。
+        with self._lock:
+            if self.addr is not None or self._resolving or time.monotonic() < self._resolve_after:
+                return
+            try:
+                socket.inet_aton(self.ip)
+            except OSError:
+                self._resolving = True
+            else:
+                self.addr = (self.ip, self.port)
+                return
+        threading.Thread(target=self._lookup, daemon=True).start()
+
+    def _lookup(self):
+        try:
+            addr = (socket.gethostbyname(self.ip), self.port)
+        except OSError as e:
+            print(f"OSC 目标解析失败 {self.ip}: {e}")
+            addr = None
+        with self._lock:
+            if addr is None:
+                self.errors += 1
+                self._resolve_after = time.monotonic() + self.RESOLVE_RETRY
+            else:
+                self.addr = addr
+            self._resolving = False
+        callback = self.on_resolved
+        if callback is not None:
+            callback()
+
+    def stats(self):
+        return {
+            "target": f"{self.ip}:{self.port}",
+            "enabled": self.enabled,
+            "sent": self.sent,
+            "errors": self.errors,
+        }
+
+
+class OscTransport:
+    """专用的 OSC I/O 线程，把每个报文分发给所有匹配的目标。"""
+
+    def __init__(self, ip, port, max_addresses=32):
+        self.max_addresses = max_addresses
+        self._cond = threading.Condition()
+        self._pending = {}
+        # 第一个目标固定为主目标（osc_ip/osc_port），其后是额外目标。
+        self._primary = self._attach(OscTarget(ip, port))
+        self._targets = [self._primary]
+        self._encoders = {}
+        # 地址 -> 限流器（如聊天框令牌桶），没有令牌时待发内容留在槽位中继续合并。
+        self._limiters = {}
+        self._sock = None
+        self._thread = None
+        self._running = False
+        # 统计数据只在锁内更新，stats() 返回快照。
+        self._submitted = 0
+        self._sent = 0
+        self._replaced = 0
+        self._rejected = 0
+        self._errors = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # 非阻塞发送：某个目标的发送缓冲区满时直接计错，不拖慢其他目标。
+            self._sock.setblocking(False)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def set_target(self, ip, port):
+        """更换主目标；主机名在后台解析线程中解析，调用方和 I/O 线程都不会被 DNS 阻塞。
+
+        解析完成前发往该目标的内容留在槽位中等待，不会被丢弃。
+        """
+        with self._cond:
+            if (self._primary.ip, self._primary.port) != (ip, port):
+                self._primary = self._attach(OscTarget(ip, port))
+                self._targets = [self._primary] + self._targets[1:]
+
+    def set_extra_targets(self, targets):
+        """替换额外目标列表，参数为 OscTarget 或配置字典。"""
+        extra = [self._attach(t if isinstance(t, OscTarget) else OscTarget.from_dict(t)) for t in targets]
+        with self._cond:
+            self._targets = [self._primary] + extra
+
+    def _attach(self, target):
+        target.on_resolved = self._wake
+        return target
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def set_rate_limiter(self, address, limiter):
+        """为地址设置限流器（需提供 reserve() 与 record_deferral()），None 表示取消限流。"""
+        with self._cond:
+            if limiter is None:
+                self._limiters.pop(address, None)
+            else:
+                self._limiters[address] = limiter
+            self._cond.notify()
+
+    def submit(self, text, address=CHATBOX_INPUT, notify=None):
+        """提交待发送文本；同一地址尚未发出的旧文本会被新文本替换。返回是否被接收。"""
+        return self._enqueue(address, text, notify)
+
+    def submit_value(self, address, value):
+        """提交 int/float/bool 单值消息（如 Avatar 参数），同样按地址只保留最新值。
+
+        无法编码的值（类型不符或超出 int32/float32 范围）在调用方线程抛出异常，不会进入发送队列。
+        """
+        ValueEncoder.validate(value)
+        return self._enqueue(address, value, None)
+
+    def _enqueue(self, address, payload, notify):
+        with self._cond:
+            self._submitted += 1
+            previous = self._pending.get(address)
+            if previous is not None:
+                self._replaced += 1
+            elif len(self._pending) >= self.max_addresses:
+                self._rejected += 1
+                return False
+            # 被限流推迟的槽位保留最初的推迟时间，合并后的新内容继承等待时长。
+            deferred_since = previous[3] if previous is not None else None
+            self._pending[address] = (payload, notify, time.perf_counter(), deferred_since)
+            self._cond.notify()
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._pending),
+                "submitted": self._submitted,
+                "sent": self._sent,
+                "dropped": self._replaced + self._rejected,
+                "replaced": self._replaced,
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "avg_latency_ms": self._latency_total / self._sent * 1000 if self._sent else 0.0,
+                "max_latency_ms": self._latency_max * 1000,
+                "targets": [t.stats() for t in self._targets],
+            }
+
+    def _take_ready(self):
+        # 在锁内取出可以立即发送的槽位；被限流或目标主机名仍在解析的留在原处，返回最短等待时间。
+        # 等解析时不设超时：解析结束会通过 on_resolved 唤醒。
+        batch, wait = {}, None
+        for address, entry in list(self._pending.items()):
+            if any(t.accepts(address) and t.resolve() is None and t.resolving for t in self._targets):
+                continue
+            limiter = self._limiters.get(address)
+            delay = limiter.reserve() if limiter else 0.0
+            if delay > 0:
+                if entry[3] is None:
+                    self._pending[address] = entry[:3] + (time.perf_counter(),)
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            del self._pending[address]
+            if entry[3] is not None:
+                limiter.record_deferral(time.perf_counter() - entry[3])
+            batch[address] = entry
+        return batch, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    batch, wait = self._take_ready()
+                    if batch:
+                        break
+                    self._cond.wait(wait)
+                targets = self._targets
+
+            for address, (payload, notify, submitted_at, _) in batch.items():
+                try:
+                    matched, delivered = self._deliver(address, payload, notify, targets)
+                except Exception as e:
+                    # 单条内容出错（如无法编码的数值）只计错，I/O 线程继续处理其他地址
+                    print(f"OSC 发送失败 {address}: {e}")
+                    matched, delivered = True, False
+                latency = time.perf_counter() - submitted_at
+                with self._cond:
+                    if delivered:
+                        self._sent += 1
+                        self._latency_total += latency
+                        self._latency_max = max(self._latency_max, latency)
+                    elif matched:
+                        self._errors += 1
+
+    def _deliver(self, address, payload, notify, targets):
+        # 编码一次并发给所有匹配的目标，返回 (是否有目标匹配, 是否至少发出一份)。
+        is_text = isinstance(payload, str)
+        encoder = self._encoders.get((address, notify, is_text))
+        if encoder is None:
+            encoder = ChatboxEncoder(address, notify=notify) if is_text else ValueEncoder(address)
+            self._encoders[(address, notify, is_text)] = encoder
+        # 每个地址只编码一次，同一份报文复用给所有目标。
+        packet = encoder.encode(payload)
+        matched = delivered = False
+        for target in targets:
+            if not target.accepts(address):
+                continue
+            matched = True
+            addr = target.resolve()
+            if addr is None:
+                continue
+            try:
+                self._sock.sendto(packet, addr)
+            except OSError as e:
+                print(f"OSC 发送失败 {target.ip}:{target.port}: {e}")
+                target.errors += 1
+                continue
+            target.sent += 1
+            delivered = True
+        return matched, delivered
+
+def _read_string(data, pos):
+    end = data.index(b"\0", pos)
+    return data[pos:end].decode("utf-8", errors="replace"), pos + _osc_pad(end - pos)
+
+
+def decode_message(data):
+    """解析单条 OSC 消息，返回 (地址, 参数列表)。"""
+    address, pos = _read_string(data, 0)
+    if pos >= len(data) or data[pos:pos + 1] != b",":
+        return address, []
+    tags, pos = _read_string(data, pos)
+    args = []
+    for tag in tags[1:]:
+        if tag == "i":
+            args.append(struct.unpack_from(">i", data, pos)[0])
+            pos += 4
+        elif tag == "f":
+            args.append(struct.unpack_from(">f", data, pos)[0])
+            pos += 4
+        elif tag == "h":
+            args.append(struct.unpack_from(">q", data, pos)[0])
+            pos += 8
+        elif tag == "d":
+            args.append(struct.unpack_from(">d", data, pos)[0])
+            pos += 8
+        elif tag == "s":
+            value, pos = _read_string(data, pos)
+            args.append(value)
+        elif tag == "b":
+            size = struct.unpack_from(">i", data, pos)[0]
+            args.append(bytes(data[pos + 4:pos + 4 + size]))
+            pos += 4 + ((size + 3) & ~3)
+        elif tag == "T":
+            args.append(True)
+        elif tag == "F":
+            args.append(False)
+        elif tag in ("N", "I"):
+            args.append(None)
+        else:
+            raise ValueError(f"不支持的 OSC 类型标签: {tag}")
+    return address, args
+
+
+def decode_packet(data):
+    """解析 OSC 报文（消息或 #bundle），依次产出 (地址, 参数列表)。"""
+    if data.startswith(b"#bundle\0"):
+        pos = 16  # 跳过 "#bundle\0" 与 8 字节时间标签
+        while pos + 4 <= len(data):
+            size = struct.unpack_from(">i", data, pos)[0]
+            yield from decode_packet(data[pos + 4:pos + 4 + size])
+            pos += 4 + size
+    else:
+        yield decode_message(data)
+
+
+class OscServer:
+    """非阻塞的 OSC 接收服务，按地址表分发收到的消息。"""
+
+    def __init__(self, ip="127.0.0.1", port=9001):
+        self.ip = ip
+        self.port = port
+        # 精确地址走字典查找；以 * 结尾的地址按前缀匹配。
+        self._handlers = {}
+        self._prefix_handlers = []
+        self._sock = None
+        self._thread = None
+        self._running = False
+        self.received = 0
+        self.unhandled = 0
+        self.errors = 0
+
+    def map(self, address, handler):
+        """注册处理函数 handler(address, *args)；address 以 * 结尾时匹配该前缀下的所有地址。"""
+        if address.endswith("*"):
+            self._prefix_handlers.append((address[:-1], handler))
+        else:
+            self._handlers.setdefault(address, []).append(handler)
+
+    def clear(self):
+        self._handlers = {}
+        self._prefix_handlers = []
+
+    def start(self):
+        if not self._running:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.bind((self.ip, self.port))
+            # port 为 0 时由系统分配空闲端口，这里回填实际端口供 OSCQuery 广播。
+            self.port = self._sock.getsockname()[1]
+            self._sock.setblocking(False)
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def dispatch(self, address, args):
+        handlers = list(self._handlers.get(address, ()))
+        handlers += [h for prefix, h in self._prefix_handlers if address.startswith(prefix)]
+        if not handlers:
+            self.unhandled += 1
+        for handler in handlers:
+            try:
+                handler(address, *args)
+            except Exception as e:
+                self.errors += 1
+                print(f"OSC 处理失败 {address}: {e}")
+
+    def _run(self):
+        sock = self._sock
+        while self._running:
+            # 短超时的 select 既能立即响应报文，又能及时察觉 stop()。
+            readable, _, _ = select.select([sock], [], [], 0.2)
+            if not readable:
+                continue
+            while True:
+                try:
+                    data, _ = sock.recvfrom(65535)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    # Windows 上前一次发送触发的 ICMP 不可达会在此处报错，忽略即可。
+                    break
+                self.received += 1
+                try:
+                    for address, args in decode_packet(data):
+                        self.dispatch(address, args)
+                except (ValueError, struct.error) as e:
+                    self.errors += 1
+                    print(f"OSC 报文解析失败: {e}")
+
+    def stats(self):
+        return {"received": self.received, "unhandled": self.unhandled, "errors": self.errors}
@@ -0,0 +1,445 @@
+"""OSCQuery：HTTP 地址空间服务、mDNS 广播与 VRChat 服务发现。"""
+
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MDNS_GROUP = "224.0.0.251"
+MDNS_PORT = 5353
+OSCJSON_SERVICE = "_oscjson._tcp.local."
+OSC_SERVICE = "_osc._udp.local."
+
+_TYPE_A = 1
+_TYPE_PTR = 12
+_TYPE_TXT = 16
+_TYPE_SRV = 33
+_TYPE_ANY = 255
+_CLASS_IN = 1
+_CACHE_FLUSH = 0x8000
+_QU_BIT = 0x8000
+
+
+# ---------------------------------------------------------------------------
+# DNS 报文编解码（只实现 mDNS 服务发现需要的 A / PTR / TXT / SRV）
+# ---------------------------------------------------------------------------
+
+def _encode_name(name):
+    out = b""
+    for label in name.rstrip(".").split("."):
+        data = label.encode("utf-8")
+        out += bytes([len(data)]) + data
+    return out + b"\0"
+
+
+def _decode_name(data, pos):
+    labels = []
+    end = None
+    for _ in range(128):  # 防止恶意压缩指针形成环
+        length = data[pos]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = pos + 2
+            pos = ((length & 0x3F) << 8) | data[pos + 1]
+            continue
+        pos += 1
+        if length == 0:
+            break
+        labels.append(data[pos:pos + length].decode("utf-8", errors="replace"))
+        pos += length
+    return ".".join(labels) + ".", end if end is not None else pos
+
+
+def _record(name, rtype, rdata, ttl=120, flush=False):
+    rclass = _CLASS_IN | (_CACHE_FLUSH if flush else 0)
+    return _encode_name(name) + struct.pack(">HHIH", rtype, rclass, ttl, len(rdata)) + rdata
+
+
+def build_query(name, rtype=_TYPE_PTR, unicast=True):
+    header = struct.pack(">HHHHHH", 0, 0, 1, 0, 0, 0)
+    return header + _encode_name(name) + struct.pack(">HH", rtype, _CLASS_IN | (_QU_BIT if unicast else 0))
+
+
+def parse_packet(data):
+    """解析 DNS 报文，返回 (是否为响应, 问题列表, 记录列表)。
+
+    问题为 (name, type)；记录为 (name, type, ttl, value)，value 依类型为
+    IP 字符串、PTR 目标名、TXT 字典或 (port, target) 元组。
+    """
+    _, flags, qd, an, ns, ar = struct.unpack_from(">HHHHHH", data, 0)
+    pos = 12
+    questions = []
+    for _ in range(qd):
+        name, pos = _decode_name(data, pos)
+        qtype, _ = struct.unpack_from(">HH", data, pos)
+        pos += 4
+        questions.append((name.lower(), qtype))
+    records = []
+    for _ in range(an + ns + ar):
+        name, pos = _decode_name(data, pos)
+        rtype, _, ttl, rdlen = struct.unpack_from(">HHIH", data, pos)
+        pos += 10
+        rdata_pos, pos = pos, pos + rdlen
+        if rtype == _TYPE_A and rdlen == 4:
+            value = socket.inet_ntoa(data[rdata_pos:pos])
+        elif rtype == _TYPE_PTR:
+            value = _decode_name(data, rdata_pos)[0]
+        elif rtype == _TYPE_SRV:
+            port = struct.unpack_from(">H", data, rdata_pos + 4)[0]
+            value = (port, _decode_name(data, rdata_pos + 6)[0])
+        elif rtype == _TYPE_TXT:
+            value = {}
+            i = rdata_pos
+            while i < pos:
+                length = data[i]
+                key, _, val = data[i + 1:i + 1 + length].decode("utf-8", errors="replace").partition("=")
+                if key:
+                    value[key] = val
+                i += 1 + length
+        else:
+            continue
+        records.append((name.lower(), rtype, ttl, value))
+    return bool(flags & 0x8000), questions, records
+
+
+class ServiceInfo:
+    """解析完成的 mDNS 服务实例。"""
+
+    def __init__(self, name, host, port, address, properties=None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.address = address
+        self.properties = properties or {}
+
+    def __repr__(self):
+        return f"ServiceInfo({self.name!r}, {self.address}:{self.port})"
+
+
+def resolve_services(records, service_type):
+    """从一批记录中按 PTR → SRV/TXT → A 的链路解析出服务实例。"""
+    ptr, srv, txt, addr = [], {}, {}, {}
+    service_type = service_type.lower()
+    for name, rtype, ttl, value in records:
+        if rtype == _TYPE_PTR and name == service_type and ttl > 0:
+            ptr.append(value)
+        elif rtype == _TYPE_SRV:
+            srv[name] = value
+        elif rtype == _TYPE_TXT:
+            txt[name] = value
+        elif rtype == _TYPE_A:
+            addr[name] = value
+    services = []
+    for instance in ptr:
+        key = instance.lower()
+        if key not in srv:
+            continue
+        port, host = srv[key]
+        label = instance[: -len(service_type) - 1] if key.endswith("." + service_type) else instance
+        services.append(ServiceInfo(label, host, port, addr.get(host.lower(), "127.0.0.1"), txt.get(key)))
+    return services
+
+
+def query_services(service_type, timeout=1.0, group=MDNS_GROUP, port=MDNS_PORT):
+    """发送一次 mDNS 查询，在 timeout 内收集应答并解析服务实例。
+
+    查询从临时端口发出，按 RFC 6762 的传统单播规则，应答会直接回到本套接字。
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        sock.settimeout(timeout)
+        sock.sendto(build_query(service_type), (group, port))
+        records = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, _ = sock.recvfrom(9000)
+            except (socket.timeout, ConnectionResetError):
+                break
+            try:
+                is_response, _, recs = parse_packet(data)
+            except (IndexError, struct.error):
+                continue
+            if is_response:
+                records.extend(recs)
+        return resolve_services(records, service_type)
+    finally:
+        sock.close()
+
+
+# ---------------------------------------------------------------------------
+# mDNS 广播
+# ---------------------------------------------------------------------------
+
+class MdnsResponder:
+    """最小的 mDNS 应答器，广播本工具的服务实例。"""
+
+    def __init__(self, host_name, address="127.0.0.1", group=MDNS_GROUP, port=MDNS_PORT):
+        self.host_name = host_name.rstrip(".") + ".local."
+        self.address = address
+        self.group = group
+        self.port = port
+        # 服务实例全名 -> (服务类型, 端口, TXT 字典)
+        self._services = {}
+        self._sock = None
+        self._thread = None
+        self._running = False
+
+    def advertise(self, instance, service_type, port, properties=None):
+        self._services[f"{instance}.{service_type}".lower()] = (
+            f"{instance}.{service_type}",
+            service_type.lower(),
+            port,
+            properties or {"txtvers": "1"},
+        )
+
+    def start(self):
+        if self._running:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
+                pass
+        multicast = socket.inet_aton(self.group)[0] >= 224
+        sock.bind(("" if multicast else self.group, self.port))
+        if multicast:
+            membership = socket.inet_aton(self.group) + socket.inet_aton("0.0.0.0")
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        sock.settimeout(0.5)
+        self.port = sock.getsockname()[1]
+        self._sock = sock
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1)
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _answer(self, questions):
+        answers, additional = [], []
+        host_key = self.host_name.lower()
+        address_record = _record(self.host_name, _TYPE_A, socket.inet_aton(self.address), flush=True)
+
+        def instance_records(full_name, port, props):
+            txt = b"".join(bytes([len(e)]) + e for e in (f"{k}={v}".encode() for k, v in props.items()))
+            srv = struct.pack(">HHH", 0, 0, port) + _encode_name(self.host_name)
+            return [_record(full_name, _TYPE_SRV, srv, flush=True), _record(full_name, _TYPE_TXT, txt, flush=True)]
+
+        for qname, qtype in questions:
+            for key, (full_name, service_type, port, props) in self._services.items():
+                if qname == service_type and qtype in (_TYPE_PTR, _TYPE_ANY):
+                    answers.append(_record(service_type, _TYPE_PTR, _encode_name(full_name), ttl=4500))
+                    additional.extend(instance_records(full_name, port, props))
+                    additional.append(address_record)
+                elif qname == key and qtype in (_TYPE_SRV, _TYPE_TXT, _TYPE_ANY):
+                    answers.extend(instance_records(full_name, port, props))
+                    additional.append(address_record)
+            if qname == host_key and qtype in (_TYPE_A, _TYPE_ANY):
+                answers.append(address_record)
+        return answers, additional
+
+    def _run(self):
+        while self._running:
+            try:
+                data, src = self._sock.recvfrom(9000)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                is_response, questions, _ = parse_packet(data)
+            except (IndexError, struct.error):
+                continue
+            if is_response or not questions:
+                continue
+            answers, additional = self._answer(questions)
+            if not answers:
+                continue
+            legacy = src[1] != MDNS_PORT
+            # 传统单播查询需回显问题与报文 ID，应答直接发回源地址。
+            header = struct.pack(
+                ">HHHHHH", data[0] << 8 | data[1] if legacy else 0, 0x8400,
+                len(questions) if legacy else 0, len(answers), 0, len(additional),
+            )
+            body = b"".join(build_query(name, qtype, unicast=False)[12:] for name, qtype in questions) if legacy else b""
+            packet = header + body + b"".join(answers) + b"".join(additional)
+            try:
+                self._sock.sendto(packet, src if legacy else (self.group, self.port))
+            except OSError as e:
+                print(f"mDNS 应答失败: {e}")
+
+
+# ---------------------------------------------------------------------------
+# OSCQuery HTTP 服务
+# ---------------------------------------------------------------------------
+
+def build_address_tree(addresses):
+    """把地址列表转换为 OSCQuery 的 CONTENTS 树；以 * 结尾的地址只生成容器节点。"""
+    root = {"FULL_PATH": "/", "ACCESS": 0, "CONTENTS": {}}
+    for address in addresses:
+        container = address.endswith("*")
+        parts = [p for p in address.rstrip("*").split("/") if p]
+        node = root
+        for i, part in enumerate(parts):
+            contents = node.setdefault("CONTENTS", {})
+            path = "/" + "/".join(parts[: i + 1])
+            if part not in contents:
+                is_leaf = i == len(parts) - 1 and not container
+                contents[part] = {"FULL_PATH": path, "ACCESS": 2} if is_leaf else {
+                    "FULL_PATH": path, "ACCESS": 0, "CONTENTS": {}}
+            node = contents[part]
+    return root
+
+
+class OscQueryServer:
+    """提供 HOST_INFO 与本工具 OSC 接收地址空间的 HTTP 服务。"""
+
+    def __init__(self, name, osc_port, addresses=(), osc_ip="127.0.0.1", http_ip="127.0.0.1", http_port=0):
+        self.name = name
+        self.osc_ip = osc_ip
+        self.osc_port = osc_port
+        self.http_ip = http_ip
+        self.http_port = http_port
+        self.tree = build_address_tree(addresses)
+        self._httpd = None
+        self._thread = None
+
+    def host_info(self):
+        return {
+            "NAME": self.name,
+            "OSC_IP": self.osc_ip,
+            "OSC_PORT": self.osc_port,
+            "OSC_TRANSPORT": "UDP",
+            "EXTENSIONS": {"ACCESS": True, "VALUE": False, "DESCRIPTION": False},
+        }
+
+    def find_node(self, path):
+        node = self.tree
+        for part in (p for p in path.split("/") if p):
+            node = node.get("CONTENTS", {}).get(part)
+            if node is None:
+                return None
+        return node
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                body = server.host_info() if query == "HOST_INFO" else server.find_node(path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.http_ip, self.http_port), Handler)
+        self.http_port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+def fetch_host_info(address, port, timeout=1.0):
+    with urllib.request.urlopen(f"http://{address}:{port}/?HOST_INFO", timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+# ---------------------------------------------------------------------------
+# 带 TTL 缓存的 VRChat 发现
+# ---------------------------------------------------------------------------
+
+class VRChatDiscovery:
+    """按 TTL 缓存 VRChat 的 OSCQuery 发现结果，刷新在后台线程进行。"""
+
+    def __init__(self, ttl=60.0, timeout=1.0, group=MDNS_GROUP, port=MDNS_PORT, clock=time.monotonic):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.group = group
+        self.port = port
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._result = None
+        self._expires = 0.0
+        self._refreshing = False
+
+    def get(self, on_result=None):
+        """立即返回缓存结果（可能为 None）；缓存过期时在后台刷新，完成后调用 on_result(result)。"""
+        with self._lock:
+            result, fresh = self._result, self._clock() < self._expires
+            start = not fresh and not self._refreshing
+            if start:
+                self._refreshing = True
+        if start:
+            threading.Thread(target=self._refresh, args=(on_result,), daemon=True).start()
+        return result
+
+    def refresh(self):
+        """同步刷新并返回结果，结构为 {"name", "osc_ip", "osc_port", "http_port"}。"""
+        result = None
+        for service in query_services(OSCJSON_SERVICE, self.timeout, self.group, self.port):
+            if not service.name.lower().startswith("vrchat-client"):
+                continue
+            try:
+                info = fetch_host_info(service.address, service.port, self.timeout)
+            except (OSError, ValueError) as e:
+                print(f"OSCQuery 获取 HOST_INFO 失败: {e}")
+                continue
+            result = {
+                "name": service.name,
+                "osc_ip": info.get("OSC_IP", service.address),
+                "osc_port": int(info.get("OSC_PORT", 9000)),
+                "http_port": service.port,
+            }
+            break
+        with self._lock:
+            self._result = result
+            self._expires = self._clock() + self.ttl
+        return result
+
+    def _refresh(self, on_result):
+        try:
+            result = self.refresh()
+        except OSError as e:
+            print(f"OSCQuery 发现失败: {e}")
+            result = None
+        finally:
+            with self._lock:
+                self._refreshing = False
+        if on_result:
+            on_result(result)
+
+
+def random_instance_name(prefix="VRChat-OSC-Chat-Tool"):
+    # 多开时用随机后缀区分实例名，避免 mDNS 名称冲突。
+    return f"{prefix}-{random.randint(10000, 99999)}"
@@ -0,0 +1,99 @@
+"""消息列表：按顺序、随机或权重轮换多条消息，每条可覆盖模板与显示的附加项。"""
+
+import bisect
+import itertools
+import random
+
+from template_engine import compile_template_uncached
+
+PLAYLIST_MODES = {
+    "sequential": "顺序",
+    "shuffle": "随机（每轮打乱）",
+    "weighted": "按权重随机",
+}
+
+
+class PlaylistEntry:
+    """消息列表中的一条消息，可单独指定模板和附加项。
+
+    template 为 None 时沿用全局设置；items 为 None 时显示全部已启用的附加项，否则只显示列出的附加项。
+    自带的模板在创建条目时编译一次，保存在 compiled 中，轮换时直接使用。
+    """
+
+    def __init__(self, text, weight=1.0, template=None, items=None):
+        self.text = text
+        self.weight = weight
+        self.template = template
+        self.compiled = compile_template_uncached(template) if template else None
+        self.items = None if items is None else frozenset(items)
+        # 预处理换行转义，发送时不再重复处理
+        self.message = text.replace('\\n', '\n')
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get("text", ""), float(d.get("weight", 1.0)), d.get("template") or None, d.get("items"))
+
+    def to_dict(self):
+        d = {"text": self.text, "weight": self.weight}
+        if self.template:
+            d["template"] = self.template
+        if self.items is not None:
+            d["items"] = sorted(self.items)
+        return d
+
+
+class MessagePlaylist:
+    """在预先解析好的条目间轮换；切换只是下标递增或一次二分查找，不重新解析文本。"""
+
+    def __init__(self, entries=(), mode="sequential", rng=None):
+        self._rng = rng or random.Random()
+        self.entries = []
+        self.mode = mode
+        self._order = []
+        self._pos = 0
+        self._cumulative = []
+        self.set_entries(entries, mode)
+
+    def set_entries(self, entries, mode=None):
+        """替换条目（PlaylistEntry 或配置字典）并预先计算轮换所需的顺序与累计权重。"""
+        if mode is not None:
+            if mode not in PLAYLIST_MODES:
+                raise ValueError(f"未知的轮换模式: {mode}")
+            self.mode = mode
+        self.entries = [e if isinstance(e, PlaylistEntry) else PlaylistEntry.from_dict(e) for e in entries]
+        self._cumulative = list(itertools.accumulate(max(0.0, e.weight) for e in self.entries))
+        self._order = list(range(len(self.entries)))
+        if self.mode == "shuffle":
+            self._rng.shuffle(self._order)
+        self._pos = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def current(self):
+        """当前条目；列表为空时返回 None。"""
+        if not self.entries:
+            return None
+        return self.entries[self._order[self._pos]]
+
+    def advance(self):
+        """切换到下一条并返回它。"""
+        if not self.entries:
+            return None
+        if self.mode == "weighted" and self._cumulative[-1] > 0:
+            pick = bisect.bisect_right(self._cumulative, self._rng.random() * self._cumulative[-1])
+            self._pos = min(pick, len(self.entries) - 1)
+            return self.entries[self._pos]
+        self._pos += 1
+        if self._pos >= len(self._order):
+            self._pos = 0
+            if self.mode == "shuffle" and len(self._order) > 1:
+                last = self._order[-1]
+                self._rng.shuffle(self._order)
+                # 新一轮的第一条不与上一轮最后一条相同
+                if self._order[0] == last:
+                    self._order[0], self._order[-1] = self._order[-1], self._order[0]
+        return self.entries[self._order[self._pos]]
+
+    def reset(self):
+        self._pos = 0
@@ -0,0 +1,77 @@
+"""VRChat 在线检测：缓存进程 PID，判断 VRChat 是否在运行并统计正常/省电模式各自的时长。"""
+
+import time
+
+import psutil
+
+VRCHAT_PROCESS_NAMES = ("VRChat.exe", "VRChat")
+
+MODE_ACTIVE = "active"
+MODE_LOW_POWER = "low_power"
+
+
+class VRChatPresence:
+    """用缓存的 PID 检测 VRChat 进程，并统计正常/省电模式各自的时长。
+
+    已知 PID 时只做一次 pid_exists + 进程名校验；进程不在时最多每 scan_interval 秒遍历一次进程表。
+    """
+
+    def __init__(self, process_names=VRCHAT_PROCESS_NAMES, scan_interval=10.0, clock=time.monotonic):
+        self.process_names = {n.lower() for n in process_names}
+        self.scan_interval = scan_interval
+        self._clock = clock
+        self._pid = None
+        self._last_scan = float("-inf")
+        self.mode = None
+        self._mode_since = clock()
+        self._durations = {MODE_ACTIVE: 0.0, MODE_LOW_POWER: 0.0}
+        self.scans = 0
+
+    def _pid_alive(self):
+        try:
+            return psutil.Process(self._pid).name().lower() in self.process_names
+        except (psutil.Error, OSError):
+            return False
+
+    def _scan(self):
+        self.scans += 1
+        for proc in psutil.process_iter(["name"]):
+            name = proc.info.get("name") or ""
+            if name.lower() in self.process_names:
+                return proc.pid
+        return None
+
+    def is_running(self):
+        """VRChat 是否在运行；PID 失效后才重新遍历进程表。"""
+        if self._pid is not None:
+            if self._pid_alive():
+                return True
+            self._pid = None
+        now = self._clock()
+        if now - self._last_scan < self.scan_interval:
+            return False
+        self._last_scan = now
+        self._pid = self._scan()
+        return self._pid is not None
+
+    def poll(self):
+        """检测一次并返回当前模式；模式变化时累计上一模式的时长。"""
+        mode = MODE_ACTIVE if self.is_running() else MODE_LOW_POWER
+        if mode != self.mode:
+            now = self._clock()
+            if self.mode is not None:
+                self._durations[self.mode] += now - self._mode_since
+            self.mode = mode
+            self._mode_since = now
+        return mode
+
+    def stats(self):
+        durations = dict(self._durations)
+        if self.mode is not None:
+            durations[self.mode] += self._clock() - self._mode_since
+        return {
+            "mode": self.mode,
+            "active_s": durations[MODE_ACTIVE],
+            "low_power_s": durations[MODE_LOW_POWER],
+            "scans": self.scans,
+        }
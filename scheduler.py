@@ -0,0 +1,116 @@
+"""定时发送调度：基于 time.monotonic 的绝对截止时间，补偿发送耗时，避免周期漂移。"""
+
+import math
+import time
+
+
+class DeadlineScheduler:
+    """按绝对截止时间工作的固定周期调度器，不在每次运行后重新计时。
+
+    每次触发后截止时间按 interval 累加，而不是从"本次发送结束"重新计时；
+    触发晚于整周期时跳过错过的周期（不补发），并计入 missed。
+    """
+
+    def __init__(self, interval=3.0, min_interval=1.0, clock=time.monotonic):
+        self._clock = clock
+        self.interval = float(interval)
+        self.min_interval = min_interval
+        self.deadline = None
+        self.last_fire = 0.0
+        self.pulled = 0
+        self.deferred = 0
+        self.ticks = 0
+        self.missed = 0
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+
+    def start(self, interval=None):
+        """从当前时刻开始计时，第一个截止时间为一个周期之后。"""
+        if interval is not None:
+            self.interval = float(interval)
+        self.last_fire = self._clock()
+        self.deadline = self.last_fire + self.interval
+        self.pulled = 0
+        self.deferred = 0
+        self.ticks = 0
+        self.missed = 0
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+
+    def stop(self):
+        self.deadline = None
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    def set_interval(self, interval):
+        """修改周期：以上一个截止时间为基准重新计算下一个截止时间。"""
+        interval = float(interval)
+        if interval == self.interval or self.deadline is None:
+            self.interval = interval
+            return
+        self.deadline += interval - self.interval
+        self.interval = interval
+
+    def pull_in(self, delay):
+        """已知内容将在 delay 秒后变化时，把下一个截止时间提前到那一刻。
+
+        提前后的截止时间不早于上次触发 + min_interval，也不会晚于原定周期；返回是否提前。
+        """
+        if self.deadline is None:
+            return False
+        candidate = max(self._clock() + delay, self.last_fire + self.min_interval)
+        if candidate >= self.deadline:
+            return False
+        self.deadline = candidate
+        self.pulled += 1
+        return True
+
+    def defer(self, delay):
+        """变化在原定截止时间之后 min_interval 以内时，把截止时间推迟到变化那一刻；返回是否推迟。
+
+        否则按周期发送后最短间隔未到，会错过紧随其后的变化（如下一行歌词）。推迟不超过 min_interval。
+        """
+        if self.deadline is None:
+            return False
+        candidate = self._clock() + delay
+        if not self.deadline < candidate < self.deadline + self.min_interval:
+            return False
+        self.deadline = candidate
+        self.deferred += 1
+        return True
+
+    def remaining(self):
+        """距离下一个截止时间的秒数；未运行时返回 None。"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self._clock())
+
+    def delay_ms(self):
+        """供 root.after 使用的毫秒延迟。"""
+        remaining = self.remaining()
+        return 0 if remaining is None else int(math.ceil(remaining * 1000))
+
+    def tick(self):
+        """在定时器触发时调用：记录抖动，推进截止时间。返回本次的延迟秒数。"""
+        now = self._clock()
+        self.last_fire = now
+        lateness = max(0.0, now - self.deadline)
+        self.ticks += 1
+        self.jitter_total += lateness
+        self.jitter_max = max(self.jitter_max, lateness)
+        skipped = int(lateness // self.interval) if self.interval > 0 else 0
+        self.missed += skipped
+        self.deadline += self.interval * (skipped + 1)
+        return lateness
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "pulled": self.pulled,
+            "deferred": self.deferred,
+            "avg_jitter_ms": self.jitter_total / self.ticks * 1000 if self.ticks else 0.0,
+            "max_jitter_ms": self.jitter_max * 1000,
+        }
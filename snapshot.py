@@ -0,0 +1,63 @@
+"""数据快照：每次发送只向各数据源采集一次，发送文本、历史记录与字数估算都从同一份快照渲染。"""
+
+import time
+from types import MappingProxyType
+
+
+class ProviderFrame:
+    """每次发送采集一次的不可变数据快照，附带各数据源的采集时间与耗时。
+
+    values 为 数据源名 -> 值（文本或数值，空字符串表示本次没有内容）；captured_at 为各数据源的采集时间戳，
+    timings 为各数据源采集耗时（毫秒）。创建后不可修改，可放心在多个渲染函数之间传递。
+    """
+
+    __slots__ = ("values", "captured_at", "timings", "created")
+
+    def __init__(self, values, captured_at, timings, created):
+        object.__setattr__(self, "values", MappingProxyType(dict(values)))
+        object.__setattr__(self, "captured_at", MappingProxyType(dict(captured_at)))
+        object.__setattr__(self, "timings", MappingProxyType(dict(timings)))
+        object.__setattr__(self, "created", created)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ProviderFrame 创建后不可修改")
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def get(self, name, default=""):
+        return self.values.get(name, default)
+
+    @property
+    def total_ms(self):
+        return sum(self.timings.values())
+
+    def slowest(self):
+        """耗时最长的数据源及其毫秒数；快照为空时返回 (None, 0.0)。"""
+        if not self.timings:
+            return None, 0.0
+        name = max(self.timings, key=self.timings.get)
+        return name, self.timings[name]
+
+
+EMPTY_FRAME = ProviderFrame({}, {}, {}, 0.0)
+
+
+def capture_frame(providers, clock=time.time, timer=time.perf_counter):
+    """依次调用 providers（数据源名 -> 无参函数）并生成快照。
+
+    单个数据源抛出异常时记为空字符串，不影响其他数据源。
+    """
+    values, captured_at, timings = {}, {}, {}
+    created = clock()
+    for name, provider in providers.items():
+        start = timer()
+        try:
+            value = provider()
+        except Exception as e:
+            print(f"采集 {name} 失败: {str(e)}")
+            value = ""
+        timings[name] = (timer() - start) * 1000
+        captured_at[name] = clock()
+        values[name] = "" if value is None else value
+    return ProviderFrame(values, captured_at, timings, created)
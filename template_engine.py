@@ -0,0 +1,271 @@
+"""消息模板编译：模板在编辑时解析一次，编译为由闭包组成的渲染树，发送时只调用闭包拼接。
+
+语法：
+    {name}                      变量；未知的 {xxx} 原样保留
+    {hr:>3} {cpu:.0f}           格式说明（与 str.format 相同）
+    {name|upper|truncate(10)}   过滤器：upper、lower、strip、truncate(n)、default(文本)
+    {#name}...{/name}           区段：变量非空时才渲染其中内容
+    {^name}...{/name}           反向区段：变量为空时才渲染
+    \\n                          换行
+"""
+
+import re
+from functools import lru_cache
+
+from text_layout import truncate_graphemes
+
+# 模板中可用的变量
+TEMPLATE_VARIABLES = (
+    "message", "time", "window", "idle", "music", "hardware", "heart_rate", "scheduled",
+    "cpu", "ram", "gpu", "hr",
+)
+
+# 编辑时校验格式说明用的示例值：数值变量按数字校验，其余按文本
+_SAMPLE_VALUES = {"cpu": 12.5, "ram": 48.0, "gpu": 30.0, "hr": 88}
+
+_TAG = re.compile(r"\{([#^/]?)(\w+)(?::([^|}]*))?((?:\|[^}]*)?)\}")
+_FILTER = re.compile(r"(\w+)(?:\((.*)\))?$")
+
+
+class TemplateError(ValueError):
+    """模板语法错误，pos 为出错位置的字符下标。"""
+
+    def __init__(self, message, pos):
+        super().__init__(f"{message}（第 {pos + 1} 个字符）")
+        self.pos = pos
+
+
+def _is_empty(value):
+    return value is None or value == ""
+
+
+def _make_filter(text, pos):
+    # 返回 (过滤函数, 宽度估算函数)
+    m = _FILTER.match(text.strip())
+    if not m:
+        raise TemplateError(f"无法解析的过滤器: {text}", pos)
+    name, arg = m.group(1), m.group(2)
+    if name in ("upper", "lower", "strip"):
+        if arg is not None:
+            raise TemplateError(f"过滤器 {name} 不接受参数", pos)
+        return getattr(str, name), (lambda width: width)
+    if name == "truncate":
+        try:
+            limit = int(arg)
+        except (TypeError, ValueError):
+            raise TemplateError("truncate 需要整数参数，如 truncate(10)", pos) from None
+        return (lambda s: truncate_graphemes(s, limit)), (lambda width: min(width, limit))
+    if name == "default":
+        if arg is None:
+            raise TemplateError("default 需要参数，如 default(无)", pos)
+        return (lambda s: s or arg), (lambda width: width or len(arg))
+    raise TemplateError(f"未知的过滤器: {name}", pos)
+
+
+def _compile_variable(name, spec, filters, pos):
+    # 变量节点：取值 → 格式说明 → 过滤器；值为空时跳过格式说明，只有 default 能补上内容。
+    if spec:
+        try:
+            format(_SAMPLE_VALUES.get(name, "示例"), spec)
+        except (ValueError, TypeError) as e:
+            raise TemplateError(f"{{{name}}} 的格式说明 '{spec}' 无效: {e}", pos) from None
+    steps = [_make_filter(f, pos) for f in filters]
+    if not spec and not steps:
+        # 不带格式的变量由所在序列的骨架直接填值
+        return None, None, ("var", name)
+    fns = tuple(fn for fn, _ in steps)
+
+    def render(values):
+        value = values.get(name)
+        if _is_empty(value):
+            text = ""
+        elif spec:
+            try:
+                text = format(value, spec)
+            except (ValueError, TypeError):
+                # 运行时类型不符（如读数为 N/A）时退回原文
+                text = str(value)
+        else:
+            text = str(value)
+        for fn in fns:
+            text = fn(text)
+        return text
+
+    def measure(widths):
+        width = widths.get(name, 0)
+        for _, fn in steps:
+            width = fn(width)
+        return width
+
+    return render, measure, None
+
+
+def _compile_run(run):
+    # 连续的字面量与不带格式的变量合并为一个骨架：字面量原样放好，渲染时只填变量空位
+    skeleton = [text if kind == "lit" else "" for kind, text in run]
+    holes = tuple((i, name) for i, (kind, name) in enumerate(run) if kind == "var")
+    literal_length = sum(len(text) for kind, text in run if kind == "lit")
+    if not holes:
+        return _literal("".join(skeleton))[:2]
+
+    def render(values):
+        out = skeleton.copy()
+        for i, name in holes:
+            value = values.get(name)
+            if value is not None:
+                out[i] = value if value.__class__ is str else str(value)
+        return "".join(out)
+
+    def measure(widths):
+        return literal_length + sum(widths.get(name, 0) for _, name in holes)
+
+    return render, measure
+
+
+def _compile_sequence(nodes):
+    # nodes 中的元素为 (render, measure, plain)；plain 为 ("lit", 文本) / ("var", 变量名) 或 None
+    compiled, run = [], []
+    for render, measure, plain in nodes:
+        if plain is not None:
+            run.append(plain)
+            continue
+        if run:
+            compiled.append(_compile_run(run))
+            run = []
+        compiled.append((render, measure))
+    if run:
+        compiled.append(_compile_run(run))
+    if not compiled:
+        return _literal("")[:2]
+    if len(compiled) == 1:
+        return compiled[0]
+    renders = tuple(r for r, _ in compiled)
+    measures = tuple(m for _, m in compiled)
+
+    def render(values):
+        return "".join([r(values) for r in renders])
+
+    def measure(widths):
+        return sum(m(widths) for m in measures)
+
+    return render, measure
+
+
+def _compile_section(name, inverted, body):
+    body_render, body_measure = body
+
+    if inverted:
+        def render(values):
+            return body_render(values) if _is_empty(values.get(name)) else ""
+
+        def measure(widths):
+            return 0 if widths.get(name, 0) else body_measure(widths)
+    else:
+        def render(values):
+            return "" if _is_empty(values.get(name)) else body_render(values)
+
+        def measure(widths):
+            return body_measure(widths) if widths.get(name, 0) else 0
+
+    return render, measure, None
+
+
+def _literal(text):
+    return (lambda values: text), (lambda widths: len(text)), ("lit", text)
+
+
+class CompiledTemplate:
+    """解析一次后编译为渲染/估算闭包树的模板。
+
+    variables 为模板实际用到的变量，调用方只需采集这些数据；语法错误在编译时抛出 TemplateError。
+    """
+
+    __slots__ = ("source", "variables", "_render", "_measure")
+
+    def __init__(self, source):
+        self.source = source
+        variables = set()
+        # 栈中每层为 (区段变量名, 是否反向, 开始位置, 节点列表)；最外层变量名为 None
+        stack = [(None, False, 0, [])]
+        pos = 0
+        for m in _TAG.finditer(source):
+            prefix, name, spec, filters = m.group(1), m.group(2), m.group(3), m.group(4)
+            if name not in TEMPLATE_VARIABLES:
+                if prefix or spec is not None or filters:
+                    raise TemplateError(f"未知变量: {name}", m.start())
+                # 不带格式的未知 {xxx} 按字面量保留
+                continue
+            nodes = stack[-1][3]
+            if m.start() > pos:
+                nodes.append(_literal(source[pos:m.start()].replace('\\n', '\n')))
+            pos = m.end()
+            variables.add(name)
+            if prefix in ("#", "^"):
+                if spec is not None or filters:
+                    raise TemplateError(f"区段 {{{prefix}{name}}} 不能带格式或过滤器", m.start())
+                stack.append((name, prefix == "^", m.start(), []))
+            elif prefix == "/":
+                if len(stack) == 1 or stack[-1][0] != name:
+                    raise TemplateError(f"多余的区段结束标记 {{/{name}}}", m.start())
+                section, inverted, _, body = stack.pop()
+                stack[-1][3].append(_compile_section(section, inverted, _compile_sequence(body)))
+            else:
+                filter_list = filters[1:].split("|") if filters else []
+                nodes.append(_compile_variable(name, spec, filter_list, m.start()))
+        if len(stack) > 1:
+            name, inverted, start, _ = stack[-1]
+            raise TemplateError(f"区段 {{{'^' if inverted else '#'}{name}}} 缺少结束标记 {{/{name}}}", start)
+        if pos < len(source):
+            stack[0][3].append(_literal(source[pos:].replace('\\n', '\n')))
+        self._render, self._measure = _compile_sequence(stack[0][3])
+        self.variables = frozenset(variables)
+
+    def render(self, values):
+        """values 为 变量名 -> 值；缺失的变量渲染为空字符串。"""
+        return self._render(values)
+
+    def measure(self, widths):
+        """不渲染直接估算长度：字面量长度加各变量的宽度（widths 为 变量名 -> 字符数）。"""
+        return self._measure(widths)
+
+
+class _PlainTemplate:
+    # 语法错误的模板整段按纯文本显示
+    __slots__ = ("source", "variables", "_text")
+
+    def __init__(self, source):
+        self.source = source
+        self.variables = frozenset()
+        self._text = source.replace('\\n', '\n')
+
+    def render(self, values):
+        return self._text
+
+    def measure(self, widths):
+        return len(self._text)
+
+
+@lru_cache(maxsize=32)
+def compile_template(source):
+    """编译模板；同一模板字符串只编译一次，编辑后自然生成新的渲染计划。语法错误时抛出 TemplateError。"""
+    return CompiledTemplate(source)
+
+
+def compile_template_uncached(source):
+    """不经过缓存编译模板，语法错误时按纯文本显示；供长期持有编译结果的调用方使用（如消息列表条目），
+    条目再多也不会把全局模板挤出缓存。"""
+    try:
+        return CompiledTemplate(source)
+    except TemplateError as e:
+        print(f"模板无效，按纯文本显示: {e}")
+        return _PlainTemplate(source)
+
+
+@lru_cache(maxsize=32)
+def compile_template_lenient(source):
+    """运行时使用：模板有语法错误时（如手动修改了配置文件）按纯文本显示，而不是中断发送。"""
+    try:
+        return compile_template(source)
+    except TemplateError as e:
+        print(f"模板无效，按纯文本显示: {e}")
+        return _PlainTemplate(source)
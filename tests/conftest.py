@@ -0,0 +1,6 @@
+"""测试配置：把仓库根目录加入导入路径，测试直接导入顶层模块。"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
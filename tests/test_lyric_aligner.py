@@ -0,0 +1,50 @@
+"""歌词对齐：按界面定时发送的方式（提前/推迟截止时间）模拟一首歌，检查每行的发送时刻。"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import DeadlineScheduler
+
+osc_sender = pytest.importorskip("osc_sender")
+
+LYRICS = [(0.0, "一"), (10.0, "二"), (12.5, "三"), (14.2, "四"), (20.0, "五"), (30.0, "六")]
+MARGIN = 0.05
+
+
+def simulate(lyrics, interval=3.0, min_interval=1.5, lead=0.3, until=32.0):
+    now = [0.0]
+    scheduler = DeadlineScheduler(interval, min_interval, clock=lambda: now[0])
+    scheduler.start()
+    aligner = osc_sender.LyricAligner(lead)
+    while now[0] < until:
+        now[0] = scheduler.deadline
+        scheduler.tick()
+        # 网页只给整秒位置，秒数跳变时刻作为外推锚点
+        cur = int(now[0])
+        state = SimpleNamespace(song="歌", artist="人", cur=cur, dur=40, play=True, lyric1="", lyric2="")
+        pos = aligner.position(state, float(cur), now=now[0])
+        aligner.line_changed(lyrics, pos)
+        delay = aligner.until_next_line(lyrics, pos)
+        if delay is not None and not scheduler.pull_in(delay + MARGIN):
+            scheduler.defer(delay + MARGIN)
+    return aligner
+
+
+def test_each_line_is_sent_within_lead():
+    aligner = simulate(LYRICS)
+    stats = aligner.stats()
+    # 首次取到的第一行不计入；相邻行间隔都不短于最短发送间隔，全部按提前量对齐
+    assert stats["lines"] == len(LYRICS) - 1
+    assert stats["max_error_ms"] <= MARGIN * 1000 + 1
+
+
+def test_line_changed_ignores_first_line_and_seeks():
+    aligner = osc_sender.LyricAligner(0.0)
+    assert aligner.line_changed(LYRICS, 3.0)
+    assert not aligner.line_changed(LYRICS, 4.0)
+    # 拖动进度跳过多行
+    assert aligner.line_changed(LYRICS, 21.0)
+    assert aligner.stats()["lines"] == 0
+    assert aligner.line_changed(LYRICS, 30.5)
+    assert aligner.stats()["lines"] == 1
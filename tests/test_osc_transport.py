@@ -0,0 +1,80 @@
+"""OSC 传输：报文编解码、主机名解析期间不丢内容。"""
+
+import socket
+
+import pytest
+
+from osc_transport import ChatboxEncoder, OscTransport, ValueEncoder, decode_packet
+
+
+@pytest.fixture
+def receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(2.0)
+    yield sock
+    sock.close()
+
+
+def receive(sock):
+    return list(decode_packet(sock.recvfrom(65535)[0]))
+
+
+def test_encoders_round_trip():
+    packet = ChatboxEncoder().encode("你好 ❀")
+    assert list(decode_packet(bytes(packet))) == [("/chatbox/input", ["你好 ❀", True])]
+    encoder = ValueEncoder("/avatar/parameters/hr")
+    assert list(decode_packet(encoder.encode(88))) == [("/avatar/parameters/hr", [88])]
+    assert list(decode_packet(encoder.encode(True))) == [("/avatar/parameters/hr", [True])]
+
+
+def test_first_message_waits_for_hostname_resolution(receiver):
+    port = receiver.getsockname()[1]
+    transport = OscTransport("localhost", port)
+    transport.start()
+    try:
+        # 启动后立即提交：主机名尚未解析完成时内容留在槽位中，而不是被丢弃
+        transport.submit("m0")
+        assert receive(receiver) == [("/chatbox/input", ["m0", True])]
+        transport.set_target("127.0.0.1", port)
+        transport.set_target("localhost", port)
+        transport.submit("m1")
+        assert receive(receiver) == [("/chatbox/input", ["m1", True])]
+        assert transport.stats()["errors"] == 0
+    finally:
+        transport.stop()
+
+
+def test_bad_payload_does_not_kill_the_io_thread(receiver):
+    port = receiver.getsockname()[1]
+    transport = OscTransport("127.0.0.1", port)
+    transport.start()
+    try:
+        # 绕过 submit_value 的校验，模拟编码时才出错的内容
+        transport._enqueue("/avatar/parameters/bad", object(), None)
+        transport.submit("still alive")
+        assert receive(receiver) == [("/chatbox/input", ["still alive", True])]
+        assert transport.stats()["errors"] == 1
+    finally:
+        transport.stop()
+
+
+@pytest.mark.parametrize("value, error", [
+    (2 ** 31, ValueError),
+    (-2 ** 31 - 1, ValueError),
+    (1e39, ValueError),
+    ("88", TypeError),
+    (None, TypeError),
+])
+def test_submit_value_rejects_unencodable_values(value, error):
+    transport = OscTransport("127.0.0.1", 9000)
+    with pytest.raises(error):
+        transport.submit_value("/avatar/parameters/x", value)
+    assert transport.stats()["submitted"] == 0
+
+
+@pytest.mark.parametrize("value", [True, 0, 2 ** 31 - 1, -2 ** 31, 0.5, float("inf"), float("nan")])
+def test_submit_value_accepts_osc_values(value):
+    transport = OscTransport("127.0.0.1", 9000)
+    assert transport.submit_value("/avatar/parameters/x", value)
+    ValueEncoder("/avatar/parameters/x").encode(value)
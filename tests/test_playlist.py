@@ -0,0 +1,36 @@
+"""消息列表：条目预编译模板与轮换。"""
+
+import random
+
+from playlist import MessagePlaylist, PlaylistEntry
+from template_engine import compile_template_lenient
+
+
+def test_entry_templates_are_compiled_once_at_load():
+    entries = [{"text": f"第{i}条", "template": f"{{message}} #{i} {{time}}"} for i in range(64)]
+    entries.append({"text": "沿用全局模板"})
+    playlist = MessagePlaylist(entries)
+    compiled = [entry.compiled for entry in playlist.entries]
+    assert compiled[-1] is None
+    assert compiled[0].variables == {"message", "time"}
+    # 条目多于模板缓存容量时，轮换仍使用加载时编译好的同一个对象，也不占用全局模板缓存
+    before = compile_template_lenient.cache_info().currsize
+    for _ in range(len(entries) * 2):
+        entry = playlist.advance()
+        assert entry.compiled is compiled[playlist.entries.index(entry)]
+    assert compile_template_lenient.cache_info().currsize == before
+    assert playlist.entries[3].compiled.render({"message": "你好", "time": "[12:00]"}) == "你好 #3 [12:00]"
+
+
+def test_invalid_entry_template_renders_as_plain_text():
+    entry = PlaylistEntry("消息", template="{#music}未闭合")
+    assert entry.compiled.render({"music": "歌"}) == "{#music}未闭合"
+
+
+def test_sequential_and_weighted_rotation():
+    playlist = MessagePlaylist([{"text": "a"}, {"text": "b"}, {"text": "c"}])
+    assert [playlist.advance().text for _ in range(4)] == ["b", "c", "a", "b"]
+
+    weighted = MessagePlaylist([{"text": "a", "weight": 0}, {"text": "b", "weight": 1}], "weighted",
+                               rng=random.Random(1))
+    assert {weighted.advance().text for _ in range(20)} == {"b"}
@@ -0,0 +1,74 @@
+"""定时发送调度：绝对截止时间、错过周期与按内容变化提前。"""
+
+from scheduler import DeadlineScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make(interval=3.0, min_interval=1.0):
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(interval, min_interval, clock=clock)
+    scheduler.start()
+    return scheduler, clock
+
+
+def test_deadlines_do_not_drift():
+    scheduler, clock = make()
+    clock.now = 3.2
+    assert abs(scheduler.tick() - 0.2) < 1e-9
+    # 下一个截止时间按原周期累加，不从本次触发时刻重新计时
+    assert scheduler.deadline == 6.0
+    clock.now = 12.5
+    scheduler.tick()
+    assert scheduler.missed == 2
+    assert scheduler.deadline == 15.0
+
+
+def test_pull_in_respects_min_interval_and_period():
+    scheduler, clock = make(interval=3.0, min_interval=1.5)
+    # 变化早于最短间隔时提前到最短间隔处
+    assert scheduler.pull_in(0.2)
+    assert scheduler.deadline == 1.5
+    # 不会晚于原定截止时间
+    assert not scheduler.pull_in(5.0)
+    assert scheduler.deadline == 1.5
+    assert scheduler.pulled == 1
+
+
+def test_pull_in_then_tick_restarts_period_from_the_early_send():
+    scheduler, clock = make(interval=3.0, min_interval=1.0)
+    clock.now = 0.5
+    assert scheduler.pull_in(1.5)
+    assert scheduler.deadline == 2.0
+    clock.now = 2.0
+    assert scheduler.tick() == 0.0
+    # 提前发送后最长周期从这次发送开始重新计算
+    assert scheduler.deadline == 5.0
+    assert scheduler.pull_in(0.0)
+    assert scheduler.deadline == 3.0
+
+
+def test_pull_in_when_min_interval_equals_period_is_a_no_op():
+    scheduler, _ = make(interval=3.0, min_interval=3.0)
+    assert not scheduler.pull_in(0.2)
+    assert scheduler.deadline == 3.0
+
+
+def test_defer_moves_deadline_to_a_change_just_after_it():
+    scheduler, clock = make(interval=3.0, min_interval=1.5)
+    # 变化在截止时间之后 min_interval 以内：推迟到变化时刻
+    assert scheduler.defer(3.8)
+    assert scheduler.deadline == 3.8
+    # 更远的变化不推迟，截止时间之前的变化交给 pull_in
+    assert not scheduler.defer(6.0)
+    assert not scheduler.defer(2.0)
+    assert scheduler.stats()["deferred"] == 1
+    clock.now = 3.8
+    scheduler.tick()
+    assert scheduler.deadline == 6.8
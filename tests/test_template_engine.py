@@ -0,0 +1,93 @@
+"""消息模板：变量、格式说明、过滤器、区段与编辑时报错。"""
+
+import pytest
+
+from template_engine import TemplateError, compile_template, compile_template_lenient
+
+
+def render(source, **values):
+    return compile_template(source).render(values)
+
+
+def test_variables_and_literals():
+    template = compile_template("{time} {foo} {music}\\n结束")
+    assert template.variables == {"time", "music"}
+    # 未知的 {xxx} 原样保留，\n 转为换行，缺失的变量渲染为空
+    assert template.render({"time": "[12:00]", "music": "歌"}) == "[12:00] {foo} 歌\n结束"
+    assert template.render({}) == " {foo} \n结束"
+
+
+def test_format_specs():
+    assert render("{hr:>3}|{cpu:.0f}%", hr=88, cpu=12.56) == " 88|13%"
+    # 运行时类型不符时退回原文，值为空时跳过格式说明
+    assert render("{hr:>3}|{cpu:.0f}%", hr="N/A", cpu="") == "N/A|%"
+
+
+@pytest.mark.parametrize("source, values, expected", [
+    ("{window|upper}", {"window": "abc"}, "ABC"),
+    ("{window|lower}", {"window": "ABC"}, "abc"),
+    ("{window|strip}", {"window": "  abc "}, "abc"),
+    ("{window|truncate(5)}", {"window": "abcdefgh"}, "abcd…"),
+    ("{window|truncate(5)}", {"window": "abc"}, "abc"),
+    ("{message|default(无)}", {}, "无"),
+    ("{message|default(无)}", {"message": "有"}, "有"),
+    # 过滤器按书写顺序依次应用
+    ("{window|strip|upper|truncate(3)}", {"window": " abcdef "}, "AB…"),
+    ("{hr:03d|default(--)}", {"hr": 7}, "007"),
+])
+def test_filters(source, values, expected):
+    assert compile_template(source).render(values) == expected
+
+
+def test_truncate_keeps_graphemes_whole():
+    assert render("{music|truncate(4)}", music="ab👨‍👩‍👧cd") == "ab…"
+
+
+def test_sections():
+    template = compile_template("A{#music}[{music}{^hr}无心率{/hr}]{/music}B")
+    assert template.render({"music": "歌"}) == "A[歌无心率]B"
+    assert template.render({"music": "歌", "hr": 90}) == "A[歌]B"
+    assert template.render({"hr": 90}) == "AB"
+    assert template.render({"music": ""}) == "AB"
+    # 数值 0 不是空值
+    assert render("{#hr}心率{hr}{/hr}", hr=0) == "心率0"
+
+
+def test_measure_matches_render_length():
+    template = compile_template("A{#music}[{music}{^hr}无心率{/hr}]{/music}B{window|truncate(10)}")
+    assert template.measure({}) == 2
+    assert template.measure({"music": 5}) == 12
+    assert template.measure({"music": 5, "hr": 3}) == 9
+    assert template.measure({"window": 30}) == 12
+
+
+@pytest.mark.parametrize("source, message, pos", [
+    ("{#music}x", "缺少结束标记", 0),
+    ("x{/music}", "多余的区段结束标记", 1),
+    ("{#music}{^hr}{/music}{/hr}", "多余的区段结束标记", 13),
+    ("{#music:>3}{/music}", "不能带格式或过滤器", 0),
+    ("ab{#foo}{/foo}", "未知变量: foo", 2),
+    ("{cpu:zz}", "格式说明 'zz' 无效", 0),
+    ("{music|nope}", "未知的过滤器", 0),
+    ("{music|truncate(a)}", "truncate 需要整数参数", 0),
+    ("{music|upper(1)}", "不接受参数", 0),
+    ("{music|default}", "default 需要参数", 0),
+])
+def test_syntax_errors(source, message, pos):
+    with pytest.raises(TemplateError, match=message) as excinfo:
+        compile_template(source)
+    assert excinfo.value.pos == pos
+    assert isinstance(excinfo.value, ValueError)
+
+
+def test_compile_is_cached():
+    assert compile_template("{time}{music}") is compile_template("{time}{music}")
+
+
+def test_lenient_falls_back_to_plain_text():
+    template = compile_template_lenient("{#music}坏\\n")
+    assert template.variables == frozenset()
+    assert template.render({"music": "x"}) == "{#music}坏\n"
+    assert template.measure({}) == len("{#music}坏\n")
+    # 没有语法错误时与严格编译结果相同
+    assert compile_template_lenient("{time}") is compile_template("{time}")
@@ -0,0 +1,157 @@
+"""聊天框排版：UTF-16 长度、字素切分与截断、预算分配、分页与附加项轮播。"""
+
+import pytest
+
+from text_layout import (
+    CHATBOX_LIMIT,
+    BudgetRule,
+    ChatboxPaginator,
+    SegmentRotator,
+    allocate_budget,
+    chatbox_len,
+    split_graphemes,
+    split_pages,
+    truncate_graphemes,
+)
+
+FAMILY = "👨‍👩‍👧"
+
+
+def test_chatbox_len_counts_utf16_units():
+    assert chatbox_len("") == 0
+    assert chatbox_len("abc中文") == 5
+    # 基本平面以外的字符占两个代理单元
+    assert chatbox_len("a😀") == 3
+    assert chatbox_len(FAMILY) == 8
+
+
+def test_split_graphemes_keeps_clusters_whole():
+    text = "é🇨🇳👍🏽" + FAMILY + "a\r\nb❤️"
+    assert split_graphemes(text) == ("é", "🇨🇳", "👍🏽", FAMILY, "a", "\r\n", "b", "❤️")
+    assert "".join(split_graphemes(text)) == text
+    assert split_graphemes("") == ()
+
+
+@pytest.mark.parametrize("text, budget, ellipsis, expected", [
+    ("abc", 3, "…", "abc"),
+    ("abcd", 3, "…", "ab…"),
+    # 不会把表情拆成半个代理对
+    ("ab😀cd", 4, "…", "ab…"),
+    ("ab😀cd", 5, "…", "ab😀…"),
+    ("ab" + FAMILY, 9, "", "ab"),
+    ("abc", 1, "…", "…"),
+    ("abc", 0, "…", ""),
+    ("abcdef", 4, "", "abcd"),
+])
+def test_truncate_graphemes(text, budget, ellipsis, expected):
+    result = truncate_graphemes(text, budget, ellipsis)
+    assert result == expected
+    assert chatbox_len(result) <= max(budget, 0)
+
+
+def _joined_len(parts, separator=" "):
+    return chatbox_len(separator.join(text for _, text in parts))
+
+
+def test_allocate_budget_leaves_fitting_parts_alone():
+    parts = [("message", "你好"), ("time", "[12:00]"), ("empty", "")]
+    assert allocate_budget(parts, limit=20) == [("message", "你好"), ("time", "[12:00]")]
+
+
+def test_allocate_budget_truncates_lowest_priority_first():
+    parts = [("message", "m" * 100), ("music", "音" * 40), ("time", "[12:00]")]
+    rules = {"message": BudgetRule(10, None), "music": BudgetRule(0, 8), "time": BudgetRule(5, None)}
+    result = allocate_budget(parts, rules, limit=120)
+    assert [name for name, _ in result] == ["message", "music", "time"]
+    assert result[0] == parts[0] and result[2] == parts[2]
+    assert result[1][1].endswith("…")
+    assert _joined_len(result) == 120
+
+
+def test_allocate_budget_drops_parts_below_min_length():
+    parts = [("message", "m" * 100), ("music", "音" * 40), ("time", "[12:00]")]
+    rules = {"message": BudgetRule(10, None), "music": BudgetRule(0, 30), "time": BudgetRule(5, None)}
+    result = allocate_budget(parts, rules, limit=120)
+    # 截断后不足 min_length，整项连同分隔符去掉
+    assert result == [parts[0], parts[2]]
+    assert _joined_len(result) <= 120
+
+
+def test_allocate_budget_same_priority_trims_later_part_first():
+    parts = [("a", "a" * 10), ("b", "b" * 10)]
+    assert allocate_budget(parts, limit=15) == [("a", "a" * 10), ("b", "bbb…")]
+
+
+def test_split_pages_prefers_lines_then_words():
+    assert split_pages("第一行\n第二行", 20) == ["第一行\n第二行"]
+    assert split_pages("hello world foo", 11) == ["hello world", "foo"]
+    assert split_pages("abcdefgh", 3) == ["abc", "def", "gh"]
+    assert split_pages("ab😀😀", 4) == ["ab😀", "😀"]
+
+
+def test_paginator_pages_fit_and_rotate():
+    paginator = ChatboxPaginator(limit=20)
+    text = "hello world this is a long message that needs pages"
+    pages = paginator.paginate(text)
+    assert len(pages) == 4
+    assert all(chatbox_len(page) <= 20 for page in pages)
+    assert [page[-5:] for page in pages] == ["(1/4)", "(2/4)", "(3/4)", "(4/4)"]
+    # 同一条消息只切分一次
+    assert paginator.paginate(text) is pages
+    assert [paginator.next_page(text) for _ in range(5)] == list(pages) + [pages[0]]
+
+
+def test_paginator_short_message_is_unchanged():
+    paginator = ChatboxPaginator()
+    assert paginator.next_page("短消息") == "短消息"
+    long_text = "字" * (CHATBOX_LIMIT * 3)
+    assert all(chatbox_len(page) <= CHATBOX_LIMIT for page in paginator.paginate(long_text))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rotator_returns_everything_that_fits():
+    rotator = SegmentRotator(limit=20)
+    parts = [("a", "aaaa"), ("b", ""), ("c", "cccc")]
+    assert rotator.pack(parts) == [("a", "aaaa"), ("c", "cccc")]
+
+
+def test_rotator_keeps_pinned_and_rotates_the_rest():
+    rotator = SegmentRotator(limit=11, pinned=("message",), clock=FakeClock())
+    parts = [("message", "msg"), ("a", "aaaa"), ("b", "bbbb"), ("c", "cccc")]
+    shown = []
+    for _ in range(6):
+        packed = rotator.pack(parts)
+        names = [name for name, _ in packed]
+        assert names[0] == "message"
+        assert _joined_len(packed) <= 11
+        shown.extend(names[1:])
+    # 等权重时各片段轮流出现，次数相同
+    assert {name: shown.count(name) for name in "abc"} == {"a": 2, "b": 2, "c": 2}
+
+
+def test_rotator_weights_and_min_display():
+    clock = FakeClock()
+    rotator = SegmentRotator(limit=4, clock=clock)
+    rotator.configure("a", weight=3.0)
+    parts = [("a", "aaaa"), ("b", "bbbb")]
+    counts = {"a": 0, "b": 0}
+    for _ in range(8):
+        (name, _), = rotator.pack(parts)
+        counts[name] += 1
+    assert counts == {"a": 6, "b": 2}
+
+    rotator = SegmentRotator(limit=4, clock=clock)
+    rotator.configure("a", min_display=10.0)
+    assert rotator.pack(parts) == [("a", "aaaa")]
+    clock.now += 5
+    # 未到最短显示时间前不会被换下
+    assert rotator.pack(parts) == [("a", "aaaa")]
+    clock.now += 6
+    assert rotator.pack(parts) == [("b", "bbbb")]
@@ -0,0 +1,117 @@
+"""屏蔽词过滤：重叠匹配、屏蔽与替换、按来源开关。"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from word_filter import MASK_CHAR, AhoCorasick, WordFilter, format_rules, parse_rules
+
+# 覆盖窗口标题、歌名、歌词与中英文混排的样例：(原文, 期望结果)
+RULES = {"坏词": None, "badword": None, "Secret Project": "[保密]", "真名": "某人", "bad": "***"}
+CORPUS = (
+    ("Secret Project - Visual Studio Code", "[保密] - Visual Studio Code"),
+    ("[在听: 坏词之歌 - 某歌手]", "[在听: **之歌 - 某歌手]"),
+    ("这句歌词里有坏词也有真名", "这句歌词里有**也有某人"),
+    ("BADWORD in caps and badword in lower", "******* in caps and ******* in lower"),
+    ("bad badge", "*** ***ge"),
+    ("完全正常的一行歌词", "完全正常的一行歌词"),
+    ("👨‍👩‍👧 坏词 ❀", "👨‍👩‍👧 ** ❀"),
+)
+
+
+@pytest.mark.parametrize("text, expected", CORPUS)
+def test_corpus(text, expected):
+    assert WordFilter(RULES).filter(text) == expected
+
+
+def test_finditer_reports_every_end_position():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    found = {(start, end, matcher.words[index]) for start, end, index in matcher.finditer("ushers")}
+    # 同一位置结尾只报告最长的词："she" 覆盖了同样在 4 结尾的 "he"
+    assert found == {(1, 4, "she"), (2, 6, "hers")}
+
+
+@pytest.mark.parametrize("words, text, expected", [
+    # 重叠时取最靠左的匹配
+    (["he", "she", "hers"], "ushers", "u***rs"),
+    (["abc", "bcd"], "abcd", "***d"),
+    # 同一起点取最长的匹配
+    (["ab", "abcd"], "abcde", "****e"),
+    # 长词匹配失败后沿失败链接找到较短的词
+    (["abcde", "bcd"], "abcdx", "a***x"),
+    # 相邻但不重叠的匹配都会替换
+    (["ab", "cd"], "abcd", "****"),
+])
+def test_overlapping_patterns(words, text, expected):
+    assert WordFilter(dict.fromkeys(words)).filter(text) == expected
+
+
+def test_replacement_and_blocking():
+    word_filter = WordFilter({"abc": "X", "bcd": None, "长": "很长的替换"})
+    assert word_filter.filter("abcd") == "Xd"
+    assert word_filter.filter("xbcdx") == "x" + MASK_CHAR * 3 + "x"
+    assert word_filter.filter("长句") == "很长的替换句"
+    assert word_filter.filter("ABC") == "X"
+    assert word_filter.replaced == 4
+
+
+def test_empty_rules_and_text():
+    assert WordFilter().filter("坏词") == "坏词"
+    assert WordFilter(RULES).filter("") == ""
+    # 空词会被忽略，不会匹配到每个位置
+    assert WordFilter({"": None, "坏": None}).filter("好坏") == "好*"
+
+
+def test_per_source_flags():
+    word_filter = WordFilter(RULES, sources=("music",))
+    assert word_filter.enabled("music")
+    assert not word_filter.enabled("lyrics")
+    assert word_filter.apply("music", "坏词之歌") == "**之歌"
+    assert word_filter.apply("lyrics", "坏词之歌") == "坏词之歌"
+
+    word_filter.sources = {"lyrics"}
+    assert word_filter.apply("music", "坏词之歌") == "坏词之歌"
+    assert word_filter.apply("lyrics", "坏词之歌") == "**之歌"
+
+    # 没有规则时所有来源都视为未启用
+    assert not WordFilter(sources=("music",)).enabled("music")
+
+
+def test_set_rules_swaps_rules_and_bumps_version():
+    word_filter = WordFilter({"坏词": None})
+    version = word_filter.version
+    word_filter.set_rules({"坏词": None})
+    assert word_filter.version == version
+
+    word_filter.set_rules({"好词": "赞"})
+    assert word_filter.version == version + 1
+    assert word_filter.rules == {"好词": "赞"}
+    assert word_filter.filter("坏词好词") == "坏词赞"
+
+    word_filter.set_rules({})
+    assert not word_filter.enabled("message")
+    assert word_filter.filter("好词") == "好词"
+
+
+def test_parse_and_format_rules():
+    text = "# 注释\n坏词\n\n  真名 => 某人  \nSecret Project=>[保密]\n清空 =>\n"
+    rules = parse_rules(text)
+    assert rules == {"坏词": None, "真名": "某人", "Secret Project": "[保密]", "清空": ""}
+    assert parse_rules(format_rules(rules)) == rules
+
+
+def test_format_output_filters_each_field_by_source():
+    osc_sender = pytest.importorskip("osc_sender")
+    config = pytest.importorskip("config")
+    cfg = config.Config()
+    cfg.template = "{song} - {artist} | {lyric1} | 坏词"
+    state = SimpleNamespace(song="坏词之歌" + "长" * 30, artist="坏人", dur=200, cur=10, play=True,
+                            lyric1="这是坏词", lyric2="")
+    word_filter = WordFilter({"坏词": None, "坏人": "某人"}, sources=("music",))
+    out = osc_sender.format_output(cfg, state, [], "", title_limit=4, word_filter=word_filter)
+    # 歌名先过滤再截断；歌词未启用过滤；模板中的固定文字不过滤
+    assert out == "**之歌 - 某人 | 这是坏词 | 坏词"
+
+    word_filter.sources = {"lyrics"}
+    out = osc_sender.format_output(cfg, state, [], "", title_limit=4, word_filter=word_filter)
+    assert out == "坏词之歌 - 坏人 | 这是** | 坏词"
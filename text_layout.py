@@ -0,0 +1,317 @@
+"""聊天框文本排版：长度计算、字素切分、按字素截断、预算分配、超长消息分页与附加项轮播。"""
+
+import bisect
+import itertools
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+
+CHATBOX_LIMIT = 144
+
+_ZWJ = "\u200d"
+
+
+def chatbox_len(text):
+    """按 UTF-16 代码单元计算长度，与 VRChat 聊天框的 144 字符上限口径一致。"""
+    return len(text) + sum(1 for ch in text if ord(ch) > 0xFFFF)
+
+
+def _extends(ch):
+    # 组合附加符号、变体选择符、肤色修饰符都依附在前一个字素上。
+    code = ord(ch)
+    return (
+        unicodedata.category(ch) in ("Mn", "Me", "Mc")
+        or 0xFE00 <= code <= 0xFE0F
+        or 0x1F3FB <= code <= 0x1F3FF
+        or 0xE0020 <= code <= 0xE007F
+    )
+
+
+def _is_regional_indicator(ch):
+    return 0x1F1E6 <= ord(ch) <= 0x1F1FF
+
+
+@lru_cache(maxsize=256)
+def split_graphemes(text):
+    """把文本切分为字素簇（简化版 UAX #29），保证不会拆开代理对、ZWJ 表情序列、组合符号和国旗。"""
+    clusters = []
+    i, n = 0, len(text)
+    while i < n:
+        j = i + 1
+        if text[i] == "\r" and j < n and text[j] == "\n":
+            j += 1
+        elif _is_regional_indicator(text[i]) and j < n and _is_regional_indicator(text[j]):
+            j += 1
+        while j < n:
+            if _extends(text[j]):
+                j += 1
+            elif text[j] == _ZWJ:
+                j += 2 if j + 1 < n else 1
+            else:
+                break
+        clusters.append(text[i:j])
+        i = j
+    return tuple(clusters)
+
+
+@lru_cache(maxsize=256)
+def _grapheme_offsets(text):
+    # 每个字素簇结束处的累计 UTF-16 长度，截断时二分查找
+    return tuple(itertools.accumulate(chatbox_len(g) for g in split_graphemes(text)))
+
+
+def truncate_graphemes(text, budget, ellipsis="…"):
+    """截断到不超过 budget 个 UTF-16 单位，只在字素簇边界处切开；截断时追加 ellipsis（计入预算）。"""
+    offsets = _grapheme_offsets(text)
+    if not offsets or offsets[-1] <= budget:
+        return text
+    room = budget - chatbox_len(ellipsis)
+    if room <= 0:
+        return ellipsis[:max(0, budget)] if budget > 0 else ""
+    count = bisect.bisect_right(offsets, room)
+    return "".join(split_graphemes(text)[:count]) + ellipsis
+
+
+class BudgetRule:
+    """片段让出空间的规则：优先级低的先截断，短于 min_length 时整项去掉。
+
+    min_length 为 None 时该片段不截断，放不下时整项去掉（适合时间、心率这类短而完整的项）。
+    """
+
+    def __init__(self, priority=0, min_length=4, ellipsis="…"):
+        self.priority = priority
+        self.min_length = min_length
+        self.ellipsis = ellipsis
+
+
+DEFAULT_RULE = BudgetRule()
+
+
+def allocate_budget(parts, rules=None, limit=CHATBOX_LIMIT, separator=" "):
+    """把按显示顺序排列的 (名称, 文本) 压进 limit 个 UTF-16 单位，返回保留下来的片段（保持原顺序）。
+
+    从优先级最低的片段开始让出空间：能截断到 min_length 以上就按字素截断并加省略号，
+    否则整项去掉（连同分隔符）；超出部分分配完即停止，每个片段最多处理一次。
+    """
+    rules = rules or {}
+    parts = [(name, text) for name, text in parts if text]
+    lengths = [_grapheme_offsets(text)[-1] for _, text in parts]
+    sep_len = chatbox_len(separator)
+    overflow = sum(lengths) + sep_len * max(0, len(parts) - 1) - limit
+    if overflow <= 0:
+        return parts
+
+    result = list(parts)
+    # 同优先级时靠后的片段先让出空间
+    order = sorted(range(len(parts)), key=lambda i: (rules.get(parts[i][0], DEFAULT_RULE).priority, -i))
+    remaining = len(parts)
+    for i in order:
+        if overflow <= 0:
+            break
+        name, text = parts[i]
+        rule = rules.get(name, DEFAULT_RULE)
+        target = lengths[i] - overflow
+        if rule.min_length is not None and target >= max(rule.min_length, chatbox_len(rule.ellipsis) + 1):
+            truncated = truncate_graphemes(text, target, rule.ellipsis)
+            overflow -= lengths[i] - chatbox_len(truncated)
+            result[i] = (name, truncated)
+        else:
+            remaining -= 1
+            overflow -= lengths[i] + (sep_len if remaining else 0)
+            result[i] = None
+    return [part for part in result if part is not None]
+
+
+def _split_long(piece, budget):
+    # 单个词仍超出预算时按字素切分。
+    chunks, current, size = [], "", 0
+    for g in split_graphemes(piece):
+        g_len = chatbox_len(g)
+        if size + g_len > budget and current:
+            chunks.append(current)
+            current, size = "", 0
+        current += g
+        size += g_len
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_line(line, budget):
+    # 先按空格分词贪心装箱，词本身超长时再退回字素切分。
+    if chatbox_len(line) <= budget:
+        return [line]
+    chunks, current = [], ""
+    for word in line.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if chatbox_len(candidate) <= budget:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        if chatbox_len(word) <= budget:
+            current = word
+        else:
+            parts = _split_long(word, budget)
+            chunks.extend(parts[:-1])
+            current = parts[-1] if parts else ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_pages(text, budget):
+    """按 行 → 词 → 字素 的优先级把文本切成每页不超过 budget 的若干页。"""
+    pieces = []
+    for line in text.split("\n"):
+        pieces.extend(_split_line(line, budget))
+    pages, current = [], None
+    for piece in pieces:
+        candidate = piece if current is None else f"{current}\n{piece}"
+        if chatbox_len(candidate) <= budget:
+            current = candidate
+        else:
+            pages.append(current)
+            current = piece
+    if current is not None:
+        pages.append(current)
+    return pages
+
+
+class ChatboxPaginator:
+    """把超长的聊天框消息拆成缓存的分页，每次发送轮换一页。"""
+
+    def __init__(self, limit=CHATBOX_LIMIT, indicator=" ({page}/{total})", cache_size=32):
+        self.limit = limit
+        self.indicator = indicator
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._index = 0
+
+    def paginate(self, text):
+        """返回带页码的分页结果；同一条消息只计算一次。"""
+        pages = self._cache.get(text)
+        if pages is not None:
+            self._cache.move_to_end(text)
+            return pages
+        if chatbox_len(text) <= self.limit:
+            pages = (text,)
+        else:
+            # 页码长度取决于总页数，总页数位数变多时重新切分一次。
+            total = 9
+            while True:
+                reserve = chatbox_len(self.indicator.format(page=total, total=total))
+                raw = split_pages(text, max(1, self.limit - reserve))
+                if len(raw) <= total:
+                    break
+                total = 10 ** len(str(len(raw))) - 1
+            pages = tuple(
+                p + self.indicator.format(page=i + 1, total=len(raw)) for i, p in enumerate(raw)
+            )
+        self._cache[text] = pages
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return pages
+
+    def next_page(self, text):
+        """返回本次应发送的页；内容变化时继续沿用当前页序号，保证轮播不会总停在第一页。"""
+        pages = self.paginate(text)
+        if len(pages) == 1:
+            self._index = 0
+            return pages[0]
+        page = pages[self._index % len(pages)]
+        self._index = (self._index + 1) % len(pages)
+        return page
+
+    def reset(self):
+        self._index = 0
+
+
+class _SegmentState:
+    def __init__(self, weight, min_display):
+        self.weight = weight
+        self.min_display = min_display
+        self.text = None
+        self.length = 0
+        self.credit = 0.0
+        self.shown_since = None
+
+
+class SegmentRotator:
+    """每次发送在预算内按顺序放入尽可能多的片段，放不下的轮流替换进来。
+
+    按平滑加权轮询挑选片段，积分高者优先进入；片段进入后至少显示 min_display 秒。
+    pinned 中的片段（如用户消息）始终保留。片段长度按文本缓存，内容不变时不重复计算。
+    """
+
+    def __init__(self, limit=CHATBOX_LIMIT, pinned=(), clock=time.monotonic):
+        self.limit = limit
+        self.pinned = set(pinned)
+        self._clock = clock
+        self._segments = {}
+
+    def configure(self, name, weight=1.0, min_display=0.0):
+        seg = self._state(name)
+        seg.weight = weight
+        seg.min_display = min_display
+
+    def _state(self, name):
+        seg = self._segments.get(name)
+        if seg is None:
+            seg = self._segments[name] = _SegmentState(1.0, 0.0)
+        return seg
+
+    def _measure(self, name, text):
+        seg = self._state(name)
+        if text != seg.text:
+            seg.text = text
+            seg.length = chatbox_len(text)
+        return seg
+
+    def pack(self, parts, separator=" "):
+        """parts 为按显示顺序排列的 (名称, 文本)；返回本次放得下的片段，保持原顺序。"""
+        now = self._clock()
+        parts = [(name, text) for name, text in parts if text]
+        segs = {name: self._measure(name, text) for name, text in parts}
+        sep_len = chatbox_len(separator)
+        if sum(seg.length for seg in segs.values()) + sep_len * max(0, len(segs) - 1) <= self.limit:
+            for seg in segs.values():
+                if seg.shown_since is None:
+                    seg.shown_since = now
+            return parts
+
+        # 固定片段 → 未到最短显示时间的片段 → 按积分从高到低
+        def rank(item):
+            index, (name, _) = item
+            seg = segs[name]
+            if name in self.pinned:
+                return (0, 0.0, index)
+            if seg.shown_since is not None and now - seg.shown_since < seg.min_display:
+                return (1, 0.0, index)
+            return (2, -seg.credit, index)
+
+        chosen, used = set(), 0
+        for index, (name, _) in sorted(enumerate(parts), key=rank):
+            cost = segs[name].length + (sep_len if chosen else 0)
+            if used + cost <= self.limit or (name in self.pinned and not chosen):
+                chosen.add(name)
+                used += cost
+
+        # 平滑加权轮询：所有参与轮播的片段积分 += weight，本次入选且已显示够最短时间的片段
+        # 平分扣除总权重，长期来看各片段的出现次数与权重成正比
+        rotating = [name for name in segs if name not in self.pinned]
+        total = sum(segs[name].weight for name in rotating)
+        released = [name for name in rotating if name in chosen and (
+            segs[name].shown_since is None or now - segs[name].shown_since >= segs[name].min_display)]
+        for name in rotating:
+            seg = segs[name]
+            seg.credit += seg.weight
+            if name in released:
+                seg.credit -= total / len(released)
+        for name, seg in segs.items():
+            if name not in chosen:
+                seg.shown_since = None
+            elif seg.shown_since is None:
+                seg.shown_since = now
+        return [(name, text) for name, text in parts if name in chosen]
@@ -0,0 +1,150 @@
+"""定时消息：指定时刻发送、周期性显示与倒计时，按下一次触发时间存放在最小堆中。"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta
+
+# 支持的定时消息类型
+TIMED_KINDS = {
+    "at": "每天在指定时刻显示（时间格式 HH:MM）",
+    "every": "每隔若干分钟显示一次",
+    "countdown": "倒计时到指定时间（格式 YYYY-MM-DDTHH:MM），文本中的 {remaining} 替换为剩余时间",
+}
+
+_START, _END, _REFRESH = 0, 1, 2
+
+
+def format_remaining(seconds):
+    """把剩余秒数格式化为 X天X小时X分，精确到分钟（不足一分钟按一分钟显示）。"""
+    minutes = max(0, int(-(-seconds // 60)))
+    days, rest = divmod(minutes, 24 * 60)
+    hours, mins = divmod(rest, 60)
+    if days:
+        return f"{days}天{hours}小时{mins}分"
+    if hours:
+        return f"{hours}小时{mins}分"
+    return f"{mins}分"
+
+
+class TimedMessage:
+    """一条定时消息：每日定点、固定周期重复或倒计时。"""
+
+    def __init__(self, kind, when, text, duration=30.0, enabled=True):
+        if kind not in TIMED_KINDS:
+            raise ValueError(f"未知的定时类型: {kind}")
+        self.kind = kind
+        self.when = when
+        self.text = text
+        self.duration = duration
+        self.enabled = enabled
+        if kind == "at":
+            self._at = datetime.strptime(when, "%H:%M").time()
+        elif kind == "every":
+            self._period = float(when) * 60
+            if self._period <= 0:
+                raise ValueError(f"无效的间隔: {when}")
+        else:
+            self._target = datetime.strptime(when, "%Y-%m-%dT%H:%M").timestamp()
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["kind"], str(d["when"]), d.get("text", ""), float(d.get("duration", 30)),
+                   d.get("enabled", True))
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "when": self.when,
+            "text": self.text,
+            "duration": self.duration,
+            "enabled": self.enabled,
+        }
+
+    def next_start(self, now):
+        """返回 now 之后（含 now）的下一次开始显示时间；不会再触发时返回 None。"""
+        if self.kind == "at":
+            today = datetime.fromtimestamp(now).date()
+            start = datetime.combine(today, self._at)
+            if start.timestamp() < now:
+                start += timedelta(days=1)
+            return start.timestamp()
+        if self.kind == "every":
+            # 以当天零点为基准对齐，例如每 15 分钟在 :00 :15 :30 :45 显示
+            midnight = datetime.combine(datetime.fromtimestamp(now).date(), datetime.min.time()).timestamp()
+            periods = -(-(now - midnight) // self._period)
+            return midnight + periods * self._period
+        if now >= self._target:
+            return None
+        return now if self.duration <= 0 else max(now, self._target - self.duration)
+
+    def render(self, now):
+        if self.kind == "countdown":
+            return self.text.replace("{remaining}", format_remaining(self._target - now))
+        return self.text
+
+
+class TimedMessageScheduler:
+    """按触发时间排列的开始/结束/刷新事件小根堆，轮询时只弹出已到期的事件。
+
+    每个事件是 (触发时间, 序号, 类型, 消息)；poll() 只处理堆顶已到期的事件，不会扫描全部条目。
+    """
+
+    def __init__(self, messages=(), clock=time.time):
+        self._clock = clock
+        self._seq = itertools.count()
+        self._heap = []
+        self._active = {}
+        self.messages = []
+        self.set_messages(messages)
+
+    def set_messages(self, messages):
+        """替换全部定时消息（TimedMessage 或配置字典），重新建堆。"""
+        now = self._clock()
+        self.messages = [m if isinstance(m, TimedMessage) else TimedMessage.from_dict(m) for m in messages]
+        self._heap = []
+        self._active = {}
+        for m in self.messages:
+            if m.enabled:
+                self._push_start(m, now)
+        heapq.heapify(self._heap)
+
+    def _push(self, at, kind, message):
+        heapq.heappush(self._heap, (at, next(self._seq), kind, message))
+
+    def _push_start(self, message, now):
+        start = message.next_start(now)
+        if start is not None:
+            self._push(start, _START, message)
+
+    def _push_refresh(self, message, now):
+        # 倒计时按整分钟变化，下一次刷新在剩余时间跨过分钟边界时
+        remaining = message._target - now
+        step = remaining % 60 or 60
+        if remaining - step > 0:
+            self._push(now + step, _REFRESH, message)
+
+    def poll(self, now=None):
+        """处理所有已到期的事件，返回当前应显示的文本列表（按开始先后）。"""
+        now = self._clock() if now is None else now
+        while self._heap and self._heap[0][0] <= now:
+            at, _, kind, message = heapq.heappop(self._heap)
+            if kind == _START:
+                if message.kind == "countdown":
+                    end = message._target
+                    self._push_refresh(message, now)
+                else:
+                    end = at + message.duration
+                    # 下一次开始至少在本次之后一秒，避免同一时刻重复触发
+                    self._push_start(message, max(at + 1, end))
+                self._active[id(message)] = message
+                self._push(end, _END, message)
+            elif kind == _END:
+                self._active.pop(id(message), None)
+            elif id(message) in self._active:
+                self._push_refresh(message, now)
+        return [m.render(now) for m in self._active.values()]
+
+    def next_deadline(self):
+        """下一个事件的时间戳；没有待处理事件时返回 None。"""
+        return self._heap[0][0] if self._heap else None
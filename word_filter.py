@@ -0,0 +1,154 @@
+"""屏蔽词过滤：屏蔽词与替换词在列表变化时构建一次 Aho-Corasick 自动机，匹配耗时只与文本长度线性相关。"""
+
+# 可单独开关过滤的内容来源
+FILTER_SOURCES = {
+    "window": "窗口标题",
+    "music": "音乐信息（歌名/歌手）",
+    "lyrics": "歌词",
+    "message": "消息内容",
+}
+
+MASK_CHAR = "*"
+
+
+def parse_rules(text):
+    """解析设置窗口中的文本：每行一条，"词" 表示屏蔽（替换为 *），"词 => 替换" 表示替换；# 开头为注释。"""
+    rules = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        word, sep, replacement = line.partition("=>")
+        word = word.strip()
+        if word:
+            rules[word] = replacement.strip() if sep else None
+    return rules
+
+
+def format_rules(rules):
+    return "\n".join(word if rep is None else f"{word} => {rep}" for word, rep in rules.items())
+
+
+class AhoCorasick:
+    """多模式匹配器：带失败链接的字典树，每个词表只构建一次。
+
+    匹配时每个字符只做常数次状态转移，与词表大小无关；英文字母不区分大小写。
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self._goto = [{}]
+        self._fail = [0]
+        # 每个状态上以该状态结尾的最长词的长度与序号；0 表示无
+        self._out = [(0, -1)]
+        for index, word in enumerate(self.words):
+            self._add(word.lower(), index)
+        self._link()
+
+    def _add(self, word, index):
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append((0, -1))
+            state = nxt
+        if len(word) > self._out[state][0]:
+            self._out[state] = (len(word), index)
+
+    def _link(self):
+        # 广度优先补全失败链接，并把失败链上更长的输出合并到当前状态
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[nxt][0] == 0:
+                    self._out[nxt] = self._out[self._fail[nxt]]
+
+    def finditer(self, text):
+        """产出 (开始, 结束, 词序号)，按结束位置先后；同一位置结尾只取最长的词，不同匹配可能互相重叠。"""
+        folded = text.lower()
+        if len(folded) != len(text):
+            # 少数字符小写后长度会变，此时按原文匹配以保证下标一致
+            folded = text
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            length, index = out[state]
+            if length:
+                yield i + 1 - length, i + 1, index
+
+
+class WordFilter:
+    """屏蔽词/替换词过滤器，可按内容来源分别开关。
+
+    规则变化时重建自动机并整体替换，GUI 线程与歌词线程可以共用同一个实例。
+    """
+
+    def __init__(self, rules=None, sources=()):
+        self.sources = set(sources)
+        self.replaced = 0
+        # 规则每变化一次加一，调用方可据此判断缓存的过滤结果是否过期
+        self.version = 0
+        self._rules = {}
+        # (自动机, 各词的替换文本)，整体替换保证两者始终配套
+        self._compiled = (None, [])
+        self.set_rules(rules or {})
+
+    def set_rules(self, rules):
+        """rules 为 词 -> 替换文本；替换文本为 None 时用 * 遮盖。"""
+        rules = {word: rep for word, rep in rules.items() if word}
+        if rules == self._rules and self._compiled[0] is not None:
+            return
+        matcher = AhoCorasick(rules) if rules else None
+        self._rules = rules
+        self._compiled = (matcher, list(rules.values()))
+        self.version += 1
+
+    @property
+    def rules(self):
+        return dict(self._rules)
+
+    def enabled(self, source):
+        return self._compiled[0] is not None and source in self.sources
+
+    def filter(self, text):
+        """替换文本中所有命中的词；重叠时取最靠左、其次最长的那个。"""
+        matcher, replacements = self._compiled
+        if matcher is None or not text:
+            return text
+        matches = sorted(matcher.finditer(text), key=lambda m: (m[0], -m[1]))
+        out, last = [], 0
+        for match in matches:
+            if match[0] >= last:
+                out.append(match)
+                last = match[1]
+        if not out:
+            return text
+        self.replaced += len(out)
+        pieces, pos = [], 0
+        for start, end, index in out:
+            pieces.append(text[pos:start])
+            rep = replacements[index]
+            pieces.append(MASK_CHAR * (end - start) if rep is None else rep)
+            pos = end
+        pieces.append(text[pos:])
+        return "".join(pieces)
+
+    def apply(self, source, text):
+        """来源已启用过滤时返回过滤后的文本，否则原样返回。"""
+        return self.filter(text) if self.enabled(source) else text